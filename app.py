@@ -1,7 +1,7 @@
 import os
 from datetime import timedelta
 
-from celery import Celery
+import click
 from flask import Flask
 from flask_smorest import Api
 from flask_jwt_extended import JWTManager
@@ -14,17 +14,20 @@ from resources.user import blp as UserBlueprint
 from resources.project import blp as ProjectBlueprint
 from resources.task import blp as TaskBlueprint
 from resources.notifications import blp as NotificationBlueprint
+from resources.stats import blp as StatsBlueprint
 from blocklist import BLOCKLIST
-
-
-def make_celery(app):
-    celery = Celery(
-        app.import_name,
-        broker=app.config['CELERY_BROKER_URL'],
-        backend=app.config['CELERY_RESULT_BACKEND']
-    )
-    celery.conf.update(app.config)
-    return celery
+from search import ensure_search_indexes
+from deletion import purge_pending_deletions
+from archiving import DEFAULT_ARCHIVE_AFTER_DAYS, archive_finished_projects
+from stats import rebuild_project_stats
+from forecast import forecast_active_projects
+from lifecycle import sweep_project_statuses
+from reconcile import reconcile_counters
+from deadlines import normalize_deadlines, scan_overdue
+from reminders import send_weekly_reminders
+from jobs import init_celery
+from migrations import migrate_submission_bodies, upgrade_schema
+from models import ProjectModel
 
 
 def create_app(db_url=None, blueprint_name=None):
@@ -52,6 +55,8 @@ def create_app(db_url=None, blueprint_name=None):
     app.config['CELERY_BROKER_URL'] = 'redis://localhost:6379/0'
     app.config['CELERY_RESULT_BACKEND'] = 'redis://localhost:6379/0'
     app.config['CELERY_ALWAYS_EAGER'] = True
+    # FINISHED projects older than this are moved to the archive tables
+    app.config["ARCHIVE_AFTER_DAYS"] = int(os.getenv("ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS))
 
     jwt = JWTManager(app)
 
@@ -87,11 +92,13 @@ def create_app(db_url=None, blueprint_name=None):
         api.register_blueprint(ProjectBlueprint, name=blueprint_name + '_project')
         api.register_blueprint(TaskBlueprint, name=blueprint_name + '_task')
         api.register_blueprint(NotificationBlueprint, name=blueprint_name + '_notification')
+        api.register_blueprint(StatsBlueprint, name=blueprint_name + '_stats')
     else:
         api.register_blueprint(UserBlueprint)
         api.register_blueprint(ProjectBlueprint)
         api.register_blueprint(TaskBlueprint)
         api.register_blueprint(NotificationBlueprint)
+        api.register_blueprint(StatsBlueprint)
 
     # Флаг для отслеживания, была ли уже выполнена инициализация базы данных
     initialized = False
@@ -102,16 +109,81 @@ def create_app(db_url=None, blueprint_name=None):
         if not initialized:
             with app.app_context():
                 db.create_all()
+                ensure_search_indexes(db.engine)
             initialized = True
 
+    @app.cli.command("upgrade-schema")
+    def upgrade():
+        # Run after every update: adds the tables, columns and indexes create_all() leaves out
+        for column in upgrade_schema():
+            print(f"Added {column}")
+
+    @app.cli.command("migrate-submission-bodies")
+    def migrate_bodies():
+        # One-off: compresses the text of submissions made before it was stored apart
+        print(f"Moved the text of {migrate_submission_bodies()} submissions")
+
+    @app.cli.command("purge-deleted-projects")
+    def purge_deleted_projects():
+        # Finishes deletions the Celery worker never picked up (e.g. the broker was down)
+        for project_id in purge_pending_deletions():
+            print(f"Purged project {project_id}")
+
+    @app.cli.command("archive-projects")
+    def archive_projects():
+        for project_id in archive_finished_projects():
+            print(f"Archived project {project_id}")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats():
+        # Backfills the statistics rollups for projects created before they existed
+        for project_id in db.session.execute(db.select(ProjectModel.id)).scalars().all():
+            rebuild_project_stats(project_id)
+        db.session.commit()
+
+    @app.cli.command("forecast-projects")
+    def forecast_projects():
+        # Nightly: refreshes the deadline forecast of every active project
+        forecast_active_projects()
+
+    @app.cli.command("sweep-statuses")
+    def sweep_statuses():
+        # Same job Celery beat runs every minute
+        for transition, count in sweep_project_statuses().items():
+            print(f"{transition}: {count}")
+
+    @app.cli.command("reconcile-counters")
+    @click.option("--full", is_flag=True, help="Recompute every row, not only those changed since the last run")
+    def reconcile(full):
+        # Fixes progress and user counters that drifted from the submissions and memberships
+        for name, count in reconcile_counters(full=full).items():
+            print(f"{name}: {count}")
+
+    @app.cli.command("scan-overdue")
+    def scan_overdue_deadlines():
+        # Same job Celery beat runs every ten minutes
+        for transition, count in scan_overdue().items():
+            print(f"{transition}: {count}")
+
+    @app.cli.command("normalize-deadlines")
+    def normalize():
+        # Converts deadlines stored as text before they were typed timestamps; upgrade-schema runs it too
+        for table, count in normalize_deadlines().items():
+            print(f"{table}: {count} unparseable deadlines cleared")
+
+    @app.cli.command("send-reminders")
+    def send_reminders():
+        # Same job Celery beat runs on Friday mornings; translators already reminded this week are skipped
+        print(f"Reminded {send_weekly_reminders()} translators")
+
     # setup_admin(app)
     mail = Mail(app)
 
     # Подключение и настройка Celery
-    celery = make_celery(app)
+    init_celery(app)
 
     return app
 
 
 app = create_app()
-celery = make_celery(app)
+celery = init_celery(app)
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from db import db
+from models import ProjectModel
+from models.archive import ARCHIVE_TABLES
+from models.notifications import NotificationModel, NotificationUserModel
+from models.project import ProjectCreatorsModel, ProjectEditorsModel, ProjectTasksModel, ProjectTranslatorsModel
+from models.sequence import CodeSequenceModel
+from models.task import SubmissionBodyModel, SubmissionChunkModel, SubmissionSegmentModel, TaskModel, \
+    TaskResponsiblesModel, TaskSubmissionModel
+from resources.notifications import forget_unseen_notifications
+from stats import clear_project_stats
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_BATCH_SIZE = 50
+
+
+def archivable_projects(older_than_days=None, limit=ARCHIVE_BATCH_SIZE):
+    if older_than_days is None:
+        older_than_days = current_app.config.get("ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    return db.session.execute(
+        select(ProjectModel.id).where(
+            ProjectModel.status == "FINISHED",
+            func.coalesce(ProjectModel.ended_at, ProjectModel.started_at) < cutoff,
+            ProjectModel.is_template.is_(False),
+            ProjectModel.deleted_at.is_(None),
+        ).order_by(ProjectModel.id).limit(limit)
+    ).scalars().all()
+
+
+def _project_rows(project_id):
+    # (model, criteria) for every row that belongs to the project, parents first
+    task_ids = db.session.execute(
+        select(ProjectTasksModel.task_id).where(ProjectTasksModel.project_id == project_id)
+    ).scalars().all()
+    submission_ids = select(TaskSubmissionModel.id).where(TaskSubmissionModel.task_id.in_(task_ids))
+    notification_ids = select(NotificationModel.id).where(NotificationModel.project_id == project_id)
+
+    return [
+        (ProjectModel, ProjectModel.id == project_id),
+        (TaskModel, TaskModel.id.in_(task_ids)),
+        (ProjectTasksModel, ProjectTasksModel.project_id == project_id),
+        (TaskResponsiblesModel, TaskResponsiblesModel.task_id.in_(task_ids)),
+        (TaskSubmissionModel, TaskSubmissionModel.task_id.in_(task_ids)),
+        (SubmissionBodyModel, SubmissionBodyModel.submission_id.in_(submission_ids)),
+        (SubmissionChunkModel, SubmissionChunkModel.submission_id.in_(submission_ids)),
+        (SubmissionSegmentModel, SubmissionSegmentModel.submission_id.in_(submission_ids)),
+        (ProjectEditorsModel, ProjectEditorsModel.project_id == project_id),
+        (ProjectTranslatorsModel, ProjectTranslatorsModel.project_id == project_id),
+        (ProjectCreatorsModel, ProjectCreatorsModel.project_id == project_id),
+        (NotificationModel, NotificationModel.project_id == project_id),
+        (NotificationUserModel, NotificationUserModel.notification_id.in_(notification_ids)),
+    ]
+
+
+def archive_project(project_id):
+    """Move a project and everything that belongs to it into the archive tables.
+
+    Rows are copied with INSERT ... SELECT and then deleted, all in one transaction, so a
+    project is either fully hot or fully archived.
+    """
+    rows = _project_rows(project_id)
+    # The statistics are only served for live projects
+    clear_project_stats(project_id)
+    forget_unseen_notifications(dict(rows)[NotificationUserModel])
+
+    for model, criteria in rows:
+        hot = model.__table__
+        names = [column.name for column in hot.columns]
+        db.session.execute(insert(ARCHIVE_TABLES[hot]).from_select(names, select(hot).where(criteria)))
+
+    for model, criteria in reversed(rows):
+        db.session.execute(delete(model).where(criteria).execution_options(synchronize_session=False))
+
+    db.session.execute(delete(CodeSequenceModel).where(CodeSequenceModel.scope == f"tasks:{project_id}"))
+    db.session.commit()
+
+
+def archive_finished_projects(older_than_days=None):
+    archived = []
+    while True:
+        project_ids = archivable_projects(older_than_days)
+        if not project_ids:
+            return archived
+        for project_id in project_ids:
+            archive_project(project_id)
+        archived.extend(project_ids)
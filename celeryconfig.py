@@ -1,2 +1,44 @@
+from celery.schedules import crontab
+
 broker_url = 'redis://localhost:6379/0'
-result_backend = 'redis://localhost:6379/0'
\ No newline at end of file
+result_backend = 'redis://localhost:6379/0'
+# Every task is fire-and-forget; nothing waits on a result
+task_ignore_result = True
+
+# Run with `celery -A app beat`; every job works on all due projects at once
+beat_schedule = {
+    'sweep-project-statuses': {
+        'task': 'jobs.run_status_sweep',
+        'schedule': 60.0,
+    },
+    'purge-deleted-projects': {
+        'task': 'jobs.run_deletion_purge',
+        'schedule': crontab(minute=15),
+    },
+    'archive-projects': {
+        'task': 'jobs.run_archiving',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'forecast-projects': {
+        'task': 'jobs.run_forecasts',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'reconcile-counters': {
+        'task': 'jobs.run_reconciliation',
+        'schedule': crontab(minute='*/30'),
+    },
+    # Catches what the incremental runs cannot see, e.g. removed members and cleared notifications
+    'reconcile-counters-full': {
+        'task': 'jobs.run_reconciliation',
+        'schedule': crontab(hour=4, minute=0),
+        'kwargs': {'full': True},
+    },
+    'scan-overdue': {
+        'task': 'jobs.run_overdue_scan',
+        'schedule': crontab(minute='*/10'),
+    },
+    'weekly-reminders': {
+        'task': 'jobs.run_weekly_reminders',
+        'schedule': crontab(day_of_week='fri', hour=9, minute=0),
+    },
+}
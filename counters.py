@@ -0,0 +1,42 @@
+from collections import defaultdict
+
+from sqlalchemy import bindparam, case, event, update
+
+from db import db
+
+PENDING_KEY = "counter_deltas"
+
+
+def increment(model, row_id, column, delta=1, maximum=None):
+    """Add ``delta`` to ``model.column`` of row ``row_id`` when the session commits.
+
+    Nothing is loaded: the deltas of a transaction are summed and written right before the
+    commit as ``UPDATE ... SET column = column + :delta``, one statement per column, so
+    concurrent requests never overwrite each other's increments. ``maximum`` caps the value,
+    as for progress percentages.
+    """
+    if not delta:
+        return
+    pending = db.session.info.setdefault(PENDING_KEY, defaultdict(lambda: defaultdict(int)))
+    pending[(model.__table__, column, maximum)][row_id] += delta
+
+
+@event.listens_for(db.session, "before_commit")
+def _flush_counters(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    for (table, column, maximum), deltas in pending.items():
+        value = table.c[column] + bindparam("delta")
+        if maximum is not None:
+            value = case((value > maximum, maximum), else_=value)
+        session.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values({column: value}),
+            [{"row_id": row_id, "delta": delta} for row_id, delta in deltas.items()],
+        )
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_counters(session):
+    session.info.pop(PENDING_KEY, None)
@@ -1,3 +1,54 @@
+from datetime import datetime, time, timezone
+from email.utils import parsedate_to_datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DateTime, TypeDecorator
+from sqlalchemy.dialects import postgresql, sqlite
 
 db = SQLAlchemy()
+
+
+def to_utc(value):
+    """Normalize a datetime, date or ISO 8601 string to an aware UTC datetime.
+
+    Naive values are taken to be UTC already and a bare date means midnight UTC of that day.
+    Strings may also be HTTP dates, which is how Flask serializes datetimes to JSON. Raises
+    ValueError for any other string.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            value = parsedate_to_datetime(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    # Timezone-aware DateTime stored in UTC, see to_utc for what it accepts
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_utc(value)
+
+    def process_result_value(self, value, dialect):
+        # SQLite does not keep the offset
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
+def insert_ignore(model, **values):
+    # INSERT that is a no-op when the row already exists, e.g. when two requests create it at once
+    dialect = db.session.get_bind(mapper=model).dialect.name
+
+    if dialect == "sqlite":
+        db.session.execute(sqlite.insert(model).values(**values).on_conflict_do_nothing())
+    elif dialect == "postgresql":
+        db.session.execute(postgresql.insert(model).values(**values).on_conflict_do_nothing())
+    else:
+        db.session.execute(model.__table__.insert().values(**values))
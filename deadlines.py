@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, inspect, or_, select, text, update
+
+from db import db, to_utc, UTCDateTime
+from deletion import deleted_task_ids
+from models import ProjectModel
+from models.archive import ARCHIVE_TABLES
+from models.project import ProjectTasksModel
+from models.task import TaskModel, TaskSubmissionModel
+from resources.notifications import send_notifications_bulk
+
+# Unfinished tasks due within this window are flagged before the deadline actually passes
+AT_RISK_WINDOW = timedelta(days=1)
+
+# Formats deadlines were written in while the column was free-form text, besides ISO 8601
+LEGACY_DEADLINE_FORMATS = ("%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y")
+
+
+def scan_overdue(now=None, at_risk=AT_RISK_WINDOW):
+    """Mark unfinished work whose deadline is near or past MAY BE DELAYED.
+
+    Tasks due within ``at_risk`` go to MAY BE DELAYED and back once their deadline is moved or
+    they are done. Submissions still in review when their task's deadline has passed are marked
+    MAY BE DELAYED, which keeps them in the review queue, and their translators notified. Every
+    step is one range query over the deadline index, so a scan costs the same however many rows
+    it touches. Returns the number of rows per transition.
+    """
+    now = to_utc(now or datetime.utcnow())
+    live = TaskModel.id.not_in(deleted_task_ids())
+    late = and_(TaskModel.deadline < now + at_risk, TaskModel.progress < 100)
+    recovered = or_(TaskModel.deadline.is_(None), TaskModel.deadline >= now + at_risk, TaskModel.progress >= 100)
+
+    changed = {}
+    for old_status, new_status, condition in (("IN PROGRESS", "MAY BE DELAYED", late),
+                                              ("MAY BE DELAYED", "IN PROGRESS", recovered)):
+        result = db.session.execute(
+            update(TaskModel)
+            .where(TaskModel.status == old_status, condition, live)
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+        changed[f"tasks {old_status} -> {new_status}"] = result.rowcount
+
+    delayed = db.session.execute(
+        select(TaskSubmissionModel.id, TaskSubmissionModel.translator_id, ProjectModel.id, ProjectModel.name)
+        .join(TaskModel, TaskModel.id == TaskSubmissionModel.task_id)
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id)
+        .join(ProjectModel, ProjectModel.id == ProjectTasksModel.project_id)
+        .where(TaskSubmissionModel.status == "IN VERIFYING", TaskModel.deadline < now,
+               ProjectModel.deleted_at.is_(None))
+    ).all()
+    if delayed:
+        # Submissions reviewed since the select are left alone and not notified
+        flagged = set(db.session.execute(
+            update(TaskSubmissionModel)
+            .where(TaskSubmissionModel.id.in_([row[0] for row in delayed]),
+                   TaskSubmissionModel.status == "IN VERIFYING")
+            .values(status="MAY BE DELAYED")
+            .returning(TaskSubmissionModel.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        delayed = [row for row in delayed if row[0] in flagged]
+        send_notifications_bulk([
+            {"user_id": translator_id, "project_id": project_id, "project_name": project_name,
+             "status": "DELAYED", "msg": "Your work is delayed"}
+            for _, translator_id, project_id, project_name in delayed
+        ])
+    changed["submissions IN VERIFYING -> MAY BE DELAYED"] = len(delayed)
+    db.session.commit()
+
+    return changed
+
+
+def parse_legacy_deadline(value):
+    # None when the value is not a date in any format the API used to accept
+    try:
+        return to_utc(value)
+    except (TypeError, ValueError):
+        pass
+    for fmt in LEGACY_DEADLINE_FORMATS:
+        try:
+            return to_utc(datetime.strptime(value.strip(), fmt))
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_deadlines():
+    """Rewrite deadlines stored as free-form text as UTC timestamps, then type and index the columns.
+
+    Also run by upgrade_schema. Values that cannot be parsed are cleared. Returns the number of
+    cleared values per table.
+    """
+    cleared = normalize_deadline_columns(db.session.connection())
+    db.session.commit()
+    return cleared
+
+
+def normalize_deadline_columns(connection):
+    # normalize_deadlines without the commit, so upgrade_schema can run it as a backfill. Values
+    # already normalized parse to themselves, so running it again changes nothing
+    tables = [ProjectModel.__table__, TaskModel.__table__]
+    tables += [ARCHIVE_TABLES[table] for table in tables]
+    postgres = connection.dialect.name == "postgresql"
+    inspector = inspect(connection)
+
+    cleared = {}
+    for table in tables:
+        # Raw SQL, so the values are read as stored and not through UTCDateTime
+        rows = connection.execute(text(f"SELECT id, deadline FROM {table.name} WHERE deadline IS NOT NULL")).all()
+        values = [{"row_id": row_id, "deadline": parse_legacy_deadline(raw)} for row_id, raw in rows]
+        if values:
+            connection.execute(
+                text(f"UPDATE {table.name} SET deadline = :deadline WHERE id = :row_id")
+                .bindparams(bindparam("deadline", type_=UTCDateTime)),
+                values,
+            )
+        cleared[table.name] = sum(value["deadline"] is None for value in values)
+
+        deadline_type = next(column["type"] for column in inspector.get_columns(table.name)
+                             if column["name"] == "deadline")
+        if postgres and not getattr(deadline_type, "timezone", False):
+            connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN deadline "
+                                    f"TYPE TIMESTAMP WITH TIME ZONE USING deadline::timestamptz"))
+        for index in table.indexes:
+            if "deadline" in index.columns:
+                index.create(connection, checkfirst=True)
+
+    return cleared
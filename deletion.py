@@ -0,0 +1,168 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+from db import db
+from models import ProjectModel
+from models.notifications import NotificationModel, NotificationUserModel
+from models.project import ProjectCreatorsModel, ProjectDeletionModel, ProjectEditorsModel, ProjectTasksModel, \
+    ProjectTranslatorsModel
+from models.sequence import CodeSequenceModel
+from models.stats import ProjectDailyStatsModel, ProjectForecastModel, ProjectStatsModel, TaskStatsModel
+from models.archive import archived_submission_segments
+from models.task import SegmentModel, SubmissionBodyModel, SubmissionChunkModel, SubmissionSegmentModel, TaskModel, \
+    TaskResponsiblesModel, TaskSubmissionModel
+from resources.notifications import forget_unseen_notifications
+
+DELETE_BATCH_SIZE = 500
+
+MEMBER_MODELS = (ProjectEditorsModel, ProjectTranslatorsModel, ProjectCreatorsModel)
+
+
+def live_project_or_404(project_id):
+    return ProjectModel.query.filter_by(id=project_id, deleted_at=None).first_or_404()
+
+
+def deleted_task_ids():
+    # Tasks of projects waiting to be purged; the set is small because purging is quick
+    return select(ProjectTasksModel.task_id) \
+        .join(ProjectModel, ProjectModel.id == ProjectTasksModel.project_id) \
+        .where(ProjectModel.deleted_at.is_not(None))
+
+
+def mark_project_deleted(project):
+    """Hide ``project`` from the API and record a pending deletion for the purge job.
+
+    Only two rows are written, so this is cheap enough to run inside the request.
+    """
+    project.deleted_at = datetime.utcnow()
+    db.session.add(ProjectDeletionModel(project_id=project.id, total_rows=_count_rows(project.id)))
+
+
+def _count_rows(project_id):
+    task_ids = select(ProjectTasksModel.task_id).where(ProjectTasksModel.project_id == project_id)
+    submission_ids = select(TaskSubmissionModel.id).where(TaskSubmissionModel.task_id.in_(task_ids))
+    notification_ids = select(NotificationModel.id).where(NotificationModel.project_id == project_id)
+
+    counts = [
+        select(func.count()).where(NotificationModel.project_id == project_id),
+        select(func.count()).where(NotificationUserModel.notification_id.in_(notification_ids)),
+        select(func.count()).where(TaskSubmissionModel.task_id.in_(task_ids)),
+        select(func.count()).where(SubmissionBodyModel.submission_id.in_(submission_ids)),
+        select(func.count()).where(SubmissionChunkModel.submission_id.in_(submission_ids)),
+        select(func.count()).where(SubmissionSegmentModel.submission_id.in_(submission_ids)),
+        select(func.count()).where(TaskResponsiblesModel.task_id.in_(task_ids)),
+        # tasks and their project_tasks links
+        select(func.count() * 2).where(ProjectTasksModel.project_id == project_id),
+    ] + [select(func.count()).where(model.project_id == project_id) for model in MEMBER_MODELS]
+
+    return sum(db.session.execute(select(*[c.scalar_subquery() for c in counts])).one()) + 1
+
+
+def _delete(model, *criteria):
+    stmt = delete(model).where(*criteria).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
+
+
+def _purge_notifications(project_id, batch_size):
+    ids = db.session.execute(
+        select(NotificationModel.id).where(NotificationModel.project_id == project_id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    forget_unseen_notifications(NotificationUserModel.notification_id.in_(ids))
+    return _delete(NotificationUserModel, NotificationUserModel.notification_id.in_(ids)) + \
+        _delete(NotificationModel, NotificationModel.id.in_(ids))
+
+
+def _purge_segments(submission_ids):
+    hashes = select(SubmissionSegmentModel.segment_hash).where(SubmissionSegmentModel.submission_id.in_(submission_ids))
+    hashes = db.session.execute(hashes.distinct()).scalars().all()
+    deleted = _delete(SubmissionSegmentModel, SubmissionSegmentModel.submission_id.in_(submission_ids))
+
+    # Segments are shared, so only those no other revision (live or archived) uses go.
+    # They are not part of total_rows and not counted.
+    if hashes:
+        unused = (~select(SubmissionSegmentModel.segment_hash)
+                  .where(SubmissionSegmentModel.segment_hash == SegmentModel.hash).exists(),
+                  ~select(archived_submission_segments.c.segment_hash)
+                  .where(archived_submission_segments.c.segment_hash == SegmentModel.hash).exists())
+        # Segments a submission is linking right now are locked (segments.lock_segments) and kept.
+        # The others are locked here, then checked again, so no link can be added in between
+        purgeable = db.session.execute(
+            select(SegmentModel.hash).where(SegmentModel.hash.in_(hashes), *unused).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if purgeable:
+            _delete(SegmentModel, SegmentModel.hash.in_(purgeable), *unused)
+    return deleted
+
+
+def _purge_tasks(project_id, batch_size):
+    task_ids = select(ProjectTasksModel.task_id).where(ProjectTasksModel.project_id == project_id)
+
+    # Submissions first: a single task may have many of them. Newest first, so a revision
+    # is never deleted before the resubmissions that point to it
+    submission_ids = db.session.execute(
+        select(TaskSubmissionModel.id).where(TaskSubmissionModel.task_id.in_(task_ids))
+        .order_by(TaskSubmissionModel.id.desc()).limit(batch_size)
+    ).scalars().all()
+    if submission_ids:
+        return _delete(SubmissionChunkModel, SubmissionChunkModel.submission_id.in_(submission_ids)) + \
+            _delete(SubmissionBodyModel, SubmissionBodyModel.submission_id.in_(submission_ids)) + \
+            _purge_segments(submission_ids) + \
+            _delete(TaskSubmissionModel, TaskSubmissionModel.id.in_(submission_ids))
+
+    ids = db.session.execute(task_ids.limit(batch_size)).scalars().all()
+    if not ids:
+        return 0
+
+    _delete(TaskStatsModel, TaskStatsModel.task_id.in_(ids))
+    return _delete(TaskResponsiblesModel, TaskResponsiblesModel.task_id.in_(ids)) + \
+        _delete(ProjectTasksModel, ProjectTasksModel.project_id == project_id, ProjectTasksModel.task_id.in_(ids)) + \
+        _delete(TaskModel, TaskModel.id.in_(ids))
+
+
+def _purge_project(project_id):
+    deleted = sum(_delete(model, model.project_id == project_id) for model in MEMBER_MODELS)
+    # Task code counter, see reserve_task_codes
+    _delete(CodeSequenceModel, CodeSequenceModel.scope == f"tasks:{project_id}")
+    for model in (ProjectDailyStatsModel, ProjectStatsModel, ProjectForecastModel):
+        _delete(model, model.project_id == project_id)
+    return deleted + _delete(ProjectModel, ProjectModel.id == project_id)
+
+
+def purge_project_batch(project_id, batch_size=DELETE_BATCH_SIZE):
+    """Delete the next batch of rows of a deleted project and commit.
+
+    Every call is one short transaction touching at most about ``batch_size`` rows per table, so
+    other writers are never locked out for long. Returns True while there is work left.
+    """
+    deletion = db.session.get(ProjectDeletionModel, project_id)
+    if deletion is None or deletion.status == "DONE":
+        return False
+
+    deleted = _purge_notifications(project_id, batch_size) or _purge_tasks(project_id, batch_size)
+    done = not deleted
+    if done:
+        deleted = _purge_project(project_id)
+
+    deletion.deleted_rows += deleted
+    deletion.status = "DONE" if done else "RUNNING"
+    if done:
+        deletion.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    return not done
+
+
+def purge_pending_deletions(batch_size=DELETE_BATCH_SIZE):
+    project_ids = db.session.execute(
+        select(ProjectDeletionModel.project_id).where(ProjectDeletionModel.status != "DONE")
+    ).scalars().all()
+
+    for project_id in project_ids:
+        while purge_project_batch(project_id, batch_size):
+            pass
+
+    return project_ids
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from db import db
+from models import ProjectModel
+from models.project import ProjectTasksModel
+from models.stats import ProjectForecastModel, TaskStatsModel
+from models.task import TaskModel, TaskResponsiblesModel, TaskSubmissionModel
+
+FORECAST_SIMULATIONS = 5000
+HISTORY_DAYS = 90
+MAX_HORIZON_DAYS = 730
+
+
+def throughput_history(today=None):
+    """Daily approved pages of every translator over the last HISTORY_DAYS, dated by their review.
+
+    Days without approved work count as zero, from the translator's first active day up to
+    yesterday (today is not over yet), so the samples reflect real pace rather than only
+    productive days. ``None`` holds the pooled history of everyone, used for tasks nobody is
+    assigned to.
+    """
+    today = today or date.today()
+    start = today - timedelta(days=HISTORY_DAYS)
+
+    day = func.date(TaskSubmissionModel.reviewed_at)
+    rows = db.session.execute(
+        select(TaskSubmissionModel.translator_id, day, func.sum(TaskSubmissionModel.pages_done))
+        .where(TaskSubmissionModel.status == "APPROVED",
+               TaskSubmissionModel.reviewed_at >= datetime.combine(start, datetime.min.time()),
+               TaskSubmissionModel.reviewed_at < datetime.combine(today, datetime.min.time()))
+        .group_by(TaskSubmissionModel.translator_id, day)
+    ).all()
+
+    by_translator = defaultdict(dict)
+    for translator_id, day, pages in rows:
+        by_translator[translator_id][date.fromisoformat(str(day))] = pages or 0
+
+    history = {}
+    for translator_id, days in by_translator.items():
+        first = min(days)
+        samples = np.zeros((today - first).days, dtype=np.int32)
+        for day, pages in days.items():
+            samples[(day - first).days] = pages
+        history[translator_id] = samples
+
+    if history:
+        history[None] = np.concatenate(list(history.values()))
+    return history
+
+
+def project_workloads(project_id):
+    # Remaining pages per translator; a task shared by several translators is split evenly
+    rows = db.session.execute(
+        select(TaskModel.id, TaskModel.pages, func.coalesce(TaskStatsModel.pages_approved, 0),
+               TaskResponsiblesModel.user_id)
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id)
+        .outerjoin(TaskStatsModel, TaskStatsModel.task_id == TaskModel.id)
+        .outerjoin(TaskResponsiblesModel, TaskResponsiblesModel.task_id == TaskModel.id)
+        .where(ProjectTasksModel.project_id == project_id)
+    ).all()
+
+    tasks = defaultdict(list)
+    remaining = {}
+    for task_id, pages, approved, user_id in rows:
+        remaining[task_id] = max((pages or 0) - approved, 0)
+        tasks[task_id].append(user_id)
+
+    workloads = defaultdict(float)
+    for task_id, translators in tasks.items():
+        for translator_id in translators:
+            workloads[translator_id] += remaining[task_id] / len(translators)
+    return workloads
+
+
+def _days_to_finish(pages, samples, simulations, rng):
+    # Bootstrap: every simulated day draws a day of the translator's own history
+    mean = samples.mean() if samples is not None and len(samples) else 0
+    if mean <= 0:
+        return np.full(simulations, np.inf)
+
+    # Simulated a day at a time with a running total per run, so memory stays at one value per
+    # run; stops as soon as every run has finished
+    done = np.zeros(simulations)
+    days = np.full(simulations, np.inf)
+    for day in range(1, MAX_HORIZON_DAYS + 1):
+        done += rng.choice(samples, size=simulations)
+        days[np.isinf(days) & (done >= pages)] = day
+        if not np.isinf(days).any():
+            break
+    return days
+
+
+def simulate_completion_days(workloads, history, simulations=FORECAST_SIMULATIONS, rng=None):
+    """Simulated number of days until the last translator finishes, one value per run.
+
+    Translators work in parallel, so a run ends with the slowest of them. Runs that do not
+    finish within MAX_HORIZON_DAYS are infinite.
+    """
+    rng = rng or np.random.default_rng()
+    completion = np.zeros(simulations)
+
+    for translator_id, pages in workloads.items():
+        if pages <= 0:
+            continue
+        samples = history.get(translator_id)
+        if samples is None or not samples.any():
+            samples = history.get(None)
+        completion = np.maximum(completion, _days_to_finish(pages, samples, simulations, rng))
+
+    return completion
+
+
+def _quantile_date(days, q, today):
+    value = np.quantile(days, q, method="inverted_cdf")
+    return None if np.isinf(value) else today + timedelta(days=int(value))
+
+
+def forecast_project(project, history, simulations=FORECAST_SIMULATIONS, rng=None, today=None):
+    today = today or date.today()
+    workloads = project_workloads(project.id)
+    days = simulate_completion_days(workloads, history, simulations, rng)
+    deadline = project.deadline.date() if project.deadline else None
+
+    forecast = db.session.get(ProjectForecastModel, project.id) or ProjectForecastModel(project_id=project.id)
+    forecast.computed_at = datetime.utcnow()
+    forecast.simulations = simulations
+    forecast.remaining_pages = round(sum(workloads.values()))
+    forecast.deadline = deadline
+    forecast.on_time_probability = float(np.mean(days <= (deadline - today).days)) if deadline else None
+    forecast.p50_date = _quantile_date(days, 0.5, today)
+    forecast.p90_date = _quantile_date(days, 0.9, today)
+    db.session.add(forecast)
+    return forecast
+
+
+def forecast_active_projects(simulations=FORECAST_SIMULATIONS, seed=None):
+    # The throughput history is loaded once and shared by every project
+    history = throughput_history()
+    rng = np.random.default_rng(seed)
+
+    projects = ProjectModel.query.filter(
+        ProjectModel.status != "FINISHED",
+        ProjectModel.is_template.is_(False),
+        ProjectModel.deleted_at.is_(None),
+    ).all()
+    for project in projects:
+        forecast_project(project, history, simulations, rng)
+    db.session.commit()
+
+    return [project.id for project in projects]
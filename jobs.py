@@ -0,0 +1,67 @@
+from celery import Celery, Task
+from flask import has_app_context
+
+from archiving import archive_finished_projects
+from deadlines import scan_overdue
+from deletion import purge_pending_deletions
+from forecast import forecast_active_projects
+from lifecycle import sweep_project_statuses
+from reconcile import reconcile_counters
+from reminders import send_weekly_reminders
+
+
+class AppContextTask(Task):
+    # Workers have no Flask app context; tasks called directly inside a request reuse the current one
+    def __call__(self, *args, **kwargs):
+        if has_app_context() or self.app.flask_app is None:
+            return self.run(*args, **kwargs)
+        with self.app.flask_app.app_context():
+            return self.run(*args, **kwargs)
+
+
+# The one Celery app shared by every module that defines tasks; periodic jobs are in celeryconfig
+celery = Celery(__name__, task_cls=AppContextTask)
+celery.config_from_object("celeryconfig")
+celery.flask_app = None
+
+
+def init_celery(app):
+    celery.flask_app = app
+    celery.conf.update(broker_url=app.config["CELERY_BROKER_URL"],
+                       result_backend=app.config["CELERY_RESULT_BACKEND"])
+    return celery
+
+
+@celery.task
+def run_status_sweep():
+    return sweep_project_statuses()
+
+
+@celery.task
+def run_deletion_purge():
+    return purge_pending_deletions()
+
+
+@celery.task
+def run_archiving():
+    return archive_finished_projects()
+
+
+@celery.task
+def run_forecasts():
+    return forecast_active_projects()
+
+
+@celery.task
+def run_reconciliation(full=False):
+    return reconcile_counters(full=full)
+
+
+@celery.task
+def run_overdue_scan():
+    return scan_overdue()
+
+
+@celery.task
+def run_weekly_reminders():
+    return send_weekly_reminders()
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import not_, update
+
+from db import db
+from models import ProjectModel
+
+# How long a new project stays NEW before it is considered started
+NEW_PROJECT_GRACE = timedelta(minutes=5)
+
+
+def sweep_project_statuses(now=None):
+    """Move every due project to its next status: NEW -> IN PROGRESS -> MAY BE DELAYED -> FINISHED.
+
+    Each transition is one set-based UPDATE over the status index, so a sweep costs the same
+    whether it touches no projects or thousands. Returns the number of projects per transition.
+    """
+    now = now or datetime.utcnow()
+
+    overdue = ProjectModel.deadline < now
+
+    transitions = [
+        (("NEW",), "IN PROGRESS", ProjectModel.started_at <= now - NEW_PROJECT_GRACE, {}),
+        (("IN PROGRESS", "MAY BE DELAYED"), "FINISHED", ProjectModel.progress >= 100, {"ended_at": now}),
+        (("IN PROGRESS",), "MAY BE DELAYED", overdue, {}),
+        # The deadline was moved
+        (("MAY BE DELAYED",), "IN PROGRESS", not_(overdue), {}),
+    ]
+
+    changed = {}
+    for old_statuses, new_status, condition, values in transitions:
+        result = db.session.execute(
+            update(ProjectModel)
+            .where(ProjectModel.status.in_(old_statuses), condition,
+                   ProjectModel.is_template.is_(False), ProjectModel.deleted_at.is_(None))
+            .values(status=new_status, **values)
+            .execution_options(synchronize_session=False)
+        )
+        changed[f"{'/'.join(old_statuses)} -> {new_status}"] = result.rowcount
+    db.session.commit()
+
+    return changed
@@ -0,0 +1,142 @@
+from flask import jsonify
+from flask_smorest import abort
+from marshmallow import fields
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import load_only, selectinload, with_expression
+
+from models import ProjectModel, TaskModel
+from models.archive import ArchivedProjectModel, ArchivedTaskSubmissionModel
+from models.project import ProjectTasksModel, ProjectTranslatorsModel
+from models.task import TaskSubmissionModel, TaskResponsiblesModel
+from schemas import ProjectSummarySchema, TaskSummarySchema, ReadProjectSchema, ReadTaskSchema
+
+VIEW_SCHEMAS = {
+    ProjectModel: {"full": ReadProjectSchema, "summary": ProjectSummarySchema},
+    TaskModel: {"full": ReadTaskSchema, "summary": TaskSummarySchema},
+    # Archived projects have no count expressions, so only the full view
+    ArchivedProjectModel: {"full": ReadProjectSchema},
+}
+
+# Serialized fields that are backed by lazily loaded relationships instead of a column
+RELATIONSHIP_FIELDS = {
+    TaskSubmissionModel: {"text": [("body", "chunks"), ("segments", "segment")]},
+    ArchivedTaskSubmissionModel: {"text": [("body", "chunks"), ("segments", "segment")]},
+}
+
+
+def _project_counts():
+    return {
+        "task_count": select(func.count(ProjectTasksModel.task_id))
+        .where(ProjectTasksModel.project_id == ProjectModel.id)
+        .scalar_subquery(),
+        "translator_count": select(func.count(ProjectTranslatorsModel.user_id))
+        .where(ProjectTranslatorsModel.project_id == ProjectModel.id)
+        .scalar_subquery(),
+        "submission_count": select(func.count(TaskSubmissionModel.id))
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskSubmissionModel.task_id)
+        .where(ProjectTasksModel.project_id == ProjectModel.id)
+        .scalar_subquery(),
+    }
+
+
+def _task_counts():
+    return {
+        "translator_count": select(func.count(TaskResponsiblesModel.user_id))
+        .where(TaskResponsiblesModel.task_id == TaskModel.id)
+        .scalar_subquery(),
+        "submission_count": select(func.count(TaskSubmissionModel.id))
+        .where(TaskSubmissionModel.task_id == TaskModel.id)
+        .scalar_subquery(),
+    }
+
+
+def eager_options(model, schema):
+    """Build the selectinload graph for every relationship ``schema`` serializes.
+
+    Each relationship level costs one extra SELECT ... WHERE id IN (...) for the
+    whole result set, so dumping N rows takes a fixed number of queries.
+    """
+    relationships = inspect(model).relationships
+    options = []
+
+    for name, field in schema.fields.items():
+        if name in RELATIONSHIP_FIELDS.get(model, {}):
+            options.extend(_relationship_path_loader(model, path) for path in RELATIONSHIP_FIELDS[model][name])
+            continue
+
+        nested = field.inner if isinstance(field, fields.List) else field
+        if not isinstance(nested, fields.Nested) or name not in relationships:
+            continue
+
+        related = relationships[name].mapper.class_
+        loader = selectinload(getattr(model, name))
+        nested_options = eager_options(related, nested.schema)
+        options.append(loader.options(*nested_options) if nested_options else loader)
+
+    return options
+
+
+def _relationship_path_loader(model, path):
+    loader = None
+    for name in path:
+        attribute = getattr(model, name)
+        loader = selectinload(attribute) if loader is None else loader.selectinload(attribute)
+        model = inspect(model).relationships[name].mapper.class_
+    return loader
+
+
+def _view_options(model, counts, view, only, always=()):
+    columns = model.__table__.columns
+
+    if view == "summary":
+        names = set(only or VIEW_SCHEMAS[model]["summary"]().fields)
+        options = [with_expression(getattr(model, name), expr)
+                    for name, expr in counts().items() if name in names]
+    else:
+        options = eager_options(model, VIEW_SCHEMAS[model]["full"](only=only))
+        if not only:
+            return options
+        names = set(only)
+
+    loaded = [getattr(model, name) for name in columns.keys() if name in names or name in always]
+    options.append(load_only(model.id, *loaded))
+    return options
+
+
+def project_view_options(view, only=None):
+    return _view_options(ProjectModel, _project_counts, view, only, always=("started_at", "creator_id"))
+
+
+def task_view_options(view, only=None):
+    return _view_options(TaskModel, _task_counts, view, only)
+
+
+def archived_project_view_options(view, only=None):
+    return _view_options(ArchivedProjectModel, None, view, only, always=("started_at", "creator_id"))
+
+
+def resolve_view(model, query_args):
+    view = query_args.get("view", "full")
+    only = query_args.get("only")
+
+    if view not in VIEW_SCHEMAS[model]:
+        abort(400, message=f"The {view} view is not available here.")
+    schema_cls = VIEW_SCHEMAS[model][view]
+
+    if only:
+        unknown = set(only) - set(schema_cls().fields)
+        if unknown:
+            abort(400, message=f"Unknown fields for the {view} view: {', '.join(sorted(unknown))}.")
+
+    return view, only
+
+
+def view_schema(model, view, only, many=False):
+    return VIEW_SCHEMAS[model][view](many=many, only=only)
+
+
+def dump_view(model, view, only, data, many=True):
+    # The default representation is left to the endpoint's @blp.response schema
+    if view == "full" and not only:
+        return data
+    return jsonify(view_schema(model, view, only, many=many).dump(data))
@@ -0,0 +1,165 @@
+import zlib
+from datetime import datetime
+
+from sqlalchemy import func, insert, inspect, literal, select, text, update
+
+from db import db
+from deadlines import normalize_deadline_columns
+from models import ProjectModel
+from models.archive import ARCHIVE_TABLES
+from models.notifications import NotificationModel, NotificationUserModel
+from models.project import ProjectEditorsModel, ProjectTasksModel
+from models.task import SUBMISSION_CHUNK_SIZE, SubmissionBodyModel, SubmissionChunkModel, TaskModel, \
+    TaskSubmissionModel
+
+MIGRATE_BATCH_SIZE = 500
+
+# Columns added to tables that already existed, oldest first, with the SQL default given to
+# the rows already there. db.create_all() only creates missing tables, so existing databases
+# get these columns from upgrade_schema.
+ADDED_COLUMNS = [
+    (ProjectModel.__table__.c.is_template, "false"),
+    (ProjectModel.__table__.c.deleted_at, None),
+    (TaskSubmissionModel.__table__.c.submitted_at, None),
+    (TaskSubmissionModel.__table__.c.previous_id, None),
+    (TaskSubmissionModel.__table__.c.reviewed_by, None),
+    (TaskSubmissionModel.__table__.c.reviewed_at, None),
+    (NotificationModel.__table__.c.created_at, None),
+    (NotificationUserModel.__table__.c.seen, "false"),
+]
+
+
+def _live_and_archived(*models):
+    # The tables of ``models``, then their archive counterparts
+    live = [model.__table__ for model in models]
+    return [live, [ARCHIVE_TABLES[table] for table in live]]
+
+
+def backfill_submitted_at(connection):
+    # Older submissions were not dated; the start of their task is the closest known time
+    now = datetime.utcnow()
+    for tasks, submissions in _live_and_archived(TaskModel, TaskSubmissionModel):
+        started = select(tasks.c.started_at).where(tasks.c.id == submissions.c.task_id).scalar_subquery()
+        connection.execute(update(submissions).where(submissions.c.submitted_at.is_(None))
+                           .values(submitted_at=func.coalesce(started, literal(now, submissions.c.submitted_at.type))))
+
+
+def backfill_reviews(connection):
+    # Reviewers were not recorded before; a review is credited to the project's editor when the
+    # project has only one, so tasks_evaluated keeps counting it. The review time is unknown
+    # and taken to be the submission time.
+    for submissions, project_tasks, editors in _live_and_archived(TaskSubmissionModel, ProjectTasksModel,
+                                                                  ProjectEditorsModel):
+        reviewed = submissions.c.status.in_(("APPROVED", "NOT APPROVED"))
+        only_editor = select(func.min(editors.c.user_id)) \
+            .join(project_tasks, project_tasks.c.project_id == editors.c.project_id) \
+            .where(project_tasks.c.task_id == submissions.c.task_id) \
+            .having(func.count(func.distinct(editors.c.user_id)) == 1).scalar_subquery()
+        connection.execute(update(submissions).where(reviewed, submissions.c.reviewed_by.is_(None))
+                           .values(reviewed_by=only_editor))
+        connection.execute(update(submissions).where(reviewed, submissions.c.reviewed_at.is_(None))
+                           .values(reviewed_at=submissions.c.submitted_at))
+
+
+# Data fixes run after the columns exist, in order; every one must be safe to run again
+BACKFILLS = [
+    backfill_submitted_at,
+    backfill_reviews,
+    normalize_deadline_columns,
+]
+
+
+def _add_column(connection, column, default):
+    ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+    if default is not None:
+        ddl += f" DEFAULT {default}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    connection.execute(text(ddl))
+
+
+def upgrade_schema():
+    """Bring an existing database up to date with the models.
+
+    Creates missing tables, adds the columns of ADDED_COLUMNS to the live and archive tables
+    lacking them, creates missing indexes and runs the backfills. Safe to run again. Returns
+    the added columns as ``table.column``.
+    """
+    connection = db.session.connection()
+    db.metadata.create_all(connection)
+    inspector = inspect(connection)
+
+    added = []
+    for hot_column, default in ADDED_COLUMNS:
+        for table in (hot_column.table, ARCHIVE_TABLES.get(hot_column.table)):
+            if table is None:
+                continue
+            if hot_column.name not in {column["name"] for column in inspector.get_columns(table.name)}:
+                _add_column(connection, table.c[hot_column.name], default)
+                added.append(f"{table.name}.{hot_column.name}")
+
+    # Indexes declared on columns of tables that already existed. Indexes on columns the
+    # table does not have yet are left for the release that adds them
+    inspector.clear_cache()
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {column.name for column in index.columns} <= existing:
+                index.create(connection, checkfirst=True)
+
+    for backfill in BACKFILLS:
+        backfill(connection)
+    db.session.commit()
+
+    return added
+
+
+def _body_rows(submission_id, value):
+    raw = value.encode()
+    chunks = [{"submission_id": submission_id, "start": start, "size": len(raw[start:start + SUBMISSION_CHUNK_SIZE]),
+               "data": zlib.compress(raw[start:start + SUBMISSION_CHUNK_SIZE])}
+              for start in range(0, len(raw), SUBMISSION_CHUNK_SIZE)]
+    return {"submission_id": submission_id, "size": len(raw)}, chunks
+
+
+def migrate_submission_bodies(batch_size=MIGRATE_BATCH_SIZE):
+    """Move the inline text of older submissions into compressed, chunked bodies.
+
+    Live and archived submissions are moved in batches of ``batch_size`` with a commit after
+    each. The inline text is cleared as it is moved, so the migration can be stopped and run
+    again. Returns the number of submissions moved.
+    """
+    moved = 0
+    for submissions, bodies, chunks in _live_and_archived(TaskSubmissionModel, SubmissionBodyModel,
+                                                          SubmissionChunkModel):
+        while True:
+            rows = db.session.execute(
+                select(submissions.c.id, submissions.c.text).where(submissions.c.text.is_not(None))
+                .order_by(submissions.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            ids = [submission_id for submission_id, _ in rows]
+
+            # A body written since then is newer than the inline copy
+            has_body = set(db.session.execute(
+                select(bodies.c.submission_id).where(bodies.c.submission_id.in_(ids))
+            ).scalars())
+            body_rows, chunk_rows = [], []
+            for submission_id, value in rows:
+                if submission_id not in has_body:
+                    body, body_chunks = _body_rows(submission_id, value)
+                    body_rows.append(body)
+                    chunk_rows.extend(body_chunks)
+
+            if body_rows:
+                db.session.execute(insert(bodies), body_rows)
+            if chunk_rows:
+                db.session.execute(insert(chunks), chunk_rows)
+            db.session.execute(update(submissions).where(submissions.c.id.in_(ids)).values(text=None))
+            db.session.commit()
+            moved += len(body_rows)
+
+    return moved
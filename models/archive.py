@@ -0,0 +1,102 @@
+from sqlalchemy.orm import deferred
+
+from db import db
+from models.notifications import NotificationModel, NotificationUserModel
+from models.project import ProjectCreatorsModel, ProjectEditorsModel, ProjectModel, ProjectTasksModel, \
+    ProjectTranslatorsModel
+from models.task import ChunkedTextMixin, CompressedChunkMixin, SubmissionBodyModel, SubmissionChunkModel, \
+    SubmissionSegmentModel, SubmissionTextMixin, TaskModel, TaskResponsiblesModel, TaskSubmissionModel
+
+# Hot model -> archive table, in the order rows are copied (parents first)
+ARCHIVE_TABLES = {}
+
+
+def archive_table(model, *indexes):
+    """Create ``archived_<table>`` with the columns of ``model``'s table.
+
+    Defaults are dropped (rows are only ever copied in), and foreign keys to other archived
+    tables are redirected to their archive counterparts.
+    """
+    hot = model.__table__
+    # Including the table itself, for self-referencing keys
+    archived_names = {table.name for table in ARCHIVE_TABLES} | {hot.name}
+    columns = []
+
+    for column in hot.columns:
+        foreign_keys = []
+        for fk in column.foreign_keys:
+            table_name, column_name = fk.target_fullname.split(".")
+            if table_name in archived_names:
+                table_name = f"archived_{table_name}"
+            foreign_keys.append(db.ForeignKey(f"{table_name}.{column_name}"))
+        columns.append(db.Column(column.name, column.type, *foreign_keys,
+                                 primary_key=column.primary_key, nullable=column.nullable, index=column.index,
+                                 autoincrement=False))
+
+    table = db.Table(f"archived_{hot.name}", db.metadata, *columns, *indexes)
+    ARCHIVE_TABLES[hot] = table
+    return table
+
+
+archived_projects = archive_table(ProjectModel, db.Index('ix_archived_projects_started_at_id', 'started_at', 'id'))
+archived_tasks = archive_table(TaskModel)
+archived_project_tasks = archive_table(ProjectTasksModel)
+archived_task_responsibles = archive_table(TaskResponsiblesModel)
+archived_task_submissions = archive_table(TaskSubmissionModel)
+archived_submission_bodies = archive_table(SubmissionBodyModel)
+archived_submission_chunks = archive_table(SubmissionChunkModel)
+# Segments themselves are shared by all revisions and stay where they are
+archived_submission_segments = archive_table(SubmissionSegmentModel)
+archived_project_editors = archive_table(ProjectEditorsModel)
+archived_project_translators = archive_table(ProjectTranslatorsModel)
+archived_project_creators = archive_table(ProjectCreatorsModel)
+archived_notifications = archive_table(NotificationModel)
+archived_notification_user = archive_table(NotificationUserModel,
+                                           db.Index('ix_archived_notification_user_user_id', 'user_id'))
+
+
+class ArchivedSubmissionChunkModel(CompressedChunkMixin, db.Model):
+    __table__ = archived_submission_chunks
+
+
+class ArchivedSubmissionBodyModel(ChunkedTextMixin, db.Model):
+    __table__ = archived_submission_bodies
+
+    chunks = db.relationship('ArchivedSubmissionChunkModel', viewonly=True,
+                             order_by=archived_submission_chunks.c.start)
+
+
+class ArchivedSubmissionSegmentModel(db.Model):
+    __table__ = archived_submission_segments
+
+    segment = db.relationship('SegmentModel', viewonly=True)
+
+
+class ArchivedTaskSubmissionModel(SubmissionTextMixin, db.Model):
+    __table__ = archived_task_submissions
+
+    legacy_text = deferred(archived_task_submissions.c.text)
+
+    body = db.relationship('ArchivedSubmissionBodyModel', uselist=False, viewonly=True)
+    segments = db.relationship('ArchivedSubmissionSegmentModel', viewonly=True,
+                               order_by=archived_submission_segments.c.position)
+
+
+class ArchivedTaskModel(db.Model):
+    __table__ = archived_tasks
+
+    responsibles = db.relationship('UserModel', secondary=archived_task_responsibles, viewonly=True)
+    submissions = db.relationship('ArchivedTaskSubmissionModel', viewonly=True)
+
+
+class ArchivedProjectModel(db.Model):
+    __table__ = archived_projects
+
+    editors = db.relationship('UserModel', secondary=archived_project_editors, viewonly=True)
+    translators = db.relationship('UserModel', secondary=archived_project_translators, viewonly=True)
+    tasks = db.relationship('ArchivedTaskModel', secondary=archived_project_tasks, viewonly=True,
+                            order_by=archived_tasks.c.code)
+
+
+class ArchivedNotificationModel(db.Model):
+    __table__ = archived_notifications
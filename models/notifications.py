@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from sqlalchemy.orm import relationship
 
 from db import db
@@ -7,11 +9,12 @@ class NotificationModel(db.Model):
     __tablename__ = 'notifications'
 
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False, index=True)
     project_name = db.Column(db.String, nullable=False)
     link = db.Column(db.String, nullable=True)
     status = db.Column(db.String(20), nullable=False)
     msg = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     users = relationship("NotificationUserModel", cascade="all, delete-orphan")
 
@@ -21,3 +24,14 @@ class NotificationUserModel(db.Model):
 
     notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id'), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # Set when the user clears the notification count; notifications_count counts the unseen ones
+    seen = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class ReminderLogModel(db.Model):
+    __tablename__ = 'reminder_log'
+
+    # One row per translator reminded in a week (keyed by its Monday), so a reminder is never sent twice
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    week = db.Column(db.Date, primary_key=True)
+    sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
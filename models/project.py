@@ -1,4 +1,6 @@
-from db import db
+from sqlalchemy.orm import query_expression
+
+from db import db, UTCDateTime
 from datetime import datetime
 
 
@@ -15,8 +17,11 @@ class ProjectModel(db.Model):
     ended_at = db.Column(db.DateTime, nullable=True, default=None)
     progress = db.Column(db.Float, default=0)
     number_of_pages = db.Column(db.Integer)
-    deadline = db.Column(db.String(255))
+    deadline = db.Column(UTCDateTime, index=True)
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    is_template = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Set when deletion is requested; the rows are purged in the background (see deletion.py)
+    deleted_at = db.Column(db.DateTime, nullable=True, default=None)
 
     creator = db.relationship('UserModel', backref='projects_created_by_user', secondary='project_creators')
 
@@ -26,6 +31,29 @@ class ProjectModel(db.Model):
 
     tasks = db.relationship('TaskModel', backref='projects', secondary='project_tasks')
 
+    # Filled in only by queries that ask for them (see loaders.py)
+    task_count = query_expression()
+    translator_count = query_expression()
+    submission_count = query_expression()
+
+    __table_args__ = (
+        db.Index('ix_projects_started_at_id', 'started_at', 'id'),
+        db.Index('ix_projects_status_started_at_id', 'status', 'started_at', 'id'),
+        db.Index('ix_projects_creator_id_id', 'creator_id', 'id'),
+    )
+
+
+
+class ProjectDeletionModel(db.Model):
+    __tablename__ = 'project_deletions'
+
+    # No foreign key: the row outlives the project it describes
+    project_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default="PENDING")
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True, default=None)
 
 
 class ProjectEditorsModel(db.Model):
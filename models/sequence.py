@@ -0,0 +1,8 @@
+from db import db
+
+
+class CodeSequenceModel(db.Model):
+    __tablename__ = 'code_sequences'
+
+    scope = db.Column(db.String(80), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,63 @@
+from db import db
+
+
+class SubmissionCountersMixin:
+    # Pages and submissions per review state, maintained incrementally by stats.record_submission
+    pages_submitted = db.Column(db.Integer, nullable=False, default=0)
+    pages_in_review = db.Column(db.Integer, nullable=False, default=0)
+    pages_approved = db.Column(db.Integer, nullable=False, default=0)
+    pages_rejected = db.Column(db.Integer, nullable=False, default=0)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    approved_count = db.Column(db.Integer, nullable=False, default=0)
+    rejected_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def rejection_rate(self):
+        reviewed = self.approved_count + self.rejected_count
+        return self.rejected_count / reviewed if reviewed else 0.0
+
+
+class ProjectStatsModel(SubmissionCountersMixin, db.Model):
+    __tablename__ = 'project_stats'
+
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+
+
+class TaskStatsModel(SubmissionCountersMixin, db.Model):
+    __tablename__ = 'task_stats'
+
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False, index=True)
+
+
+class ProjectDailyStatsModel(db.Model):
+    __tablename__ = 'project_daily_stats'
+
+    # Net change of each page bucket on that day; the burndown is their running sum
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    pages_submitted = db.Column(db.Integer, nullable=False, default=0)
+    pages_approved = db.Column(db.Integer, nullable=False, default=0)
+    pages_rejected = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ProjectForecastModel(db.Model):
+    __tablename__ = 'project_forecasts'
+
+    # Latest Monte Carlo completion forecast of a project (see forecast.py)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    computed_at = db.Column(db.DateTime, nullable=False)
+    simulations = db.Column(db.Integer, nullable=False)
+    remaining_pages = db.Column(db.Integer, nullable=False)
+    deadline = db.Column(db.Date, nullable=True)
+    on_time_probability = db.Column(db.Float, nullable=True)
+    p50_date = db.Column(db.Date, nullable=True)
+    p90_date = db.Column(db.Date, nullable=True)
+
+
+class ReconciliationModel(db.Model):
+    __tablename__ = 'reconciliations'
+
+    # Start of the last successful run of a reconciliation job (see reconcile.py)
+    job = db.Column(db.String(80), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=False)
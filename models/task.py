@@ -1,4 +1,8 @@
-from db import db
+import zlib
+
+from sqlalchemy.orm import deferred, query_expression
+
+from db import db, UTCDateTime
 from datetime import datetime
 
 class TaskModel(db.Model):
@@ -9,7 +13,7 @@ class TaskModel(db.Model):
     description = db.Column(db.Text)
     status = db.Column(db.String(20), default='IN PROGRESS')
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
-    deadline = db.Column(db.String(255), nullable=True)
+    deadline = db.Column(UTCDateTime, nullable=True, index=True)
     pages = db.Column(db.Integer, nullable=False)
     rejected = db.Column(db.Integer, default=0)
     progress = db.Column(db.Integer, default=0)
@@ -17,20 +21,134 @@ class TaskModel(db.Model):
     responsibles = db.relationship('UserModel', secondary='task_responsibles', back_populates='tasks')
     submissions = db.relationship('TaskSubmissionModel', back_populates='task')
 
+    # Filled in only by queries that ask for them (see loaders.py)
+    translator_count = query_expression()
+    submission_count = query_expression()
+
+
+# Uncompressed bytes per stored chunk of a submission body
+SUBMISSION_CHUNK_SIZE = 256 * 1024
+
+# Submission statuses still waiting for an editor; late ones are flagged by deadlines.scan_overdue
+AWAITING_REVIEW = ("IN VERIFYING", "MAY BE DELAYED")
+
+
+class CompressedChunkMixin:
+    # A piece of text stored zlib-compressed in ``data``
+    @property
+    def raw(self):
+        return zlib.decompress(self.data)
 
-class TaskSubmissionModel(db.Model):
+    @raw.setter
+    def raw(self, value):
+        self.size = len(value)
+        self.data = zlib.compress(value)
+
+
+class ChunkedTextMixin:
+    # Chunks are compressed independently, so a body can be written and read piece by piece
+    @property
+    def text(self):
+        return b"".join(chunk.raw for chunk in self.chunks).decode()
+
+
+class SubmissionTextMixin:
+    # Submissions keep their text in a separate, lazily loaded ``body`` row, or as segments.
+    # Older ones still have it inline until `flask migrate-submission-bodies` has run
+    @property
+    def text(self):
+        if self.body is not None:
+            return self.body.text
+        if self.segments:
+            return "".join(link.segment.text for link in self.segments)
+        return self.legacy_text
+
+
+class TaskSubmissionModel(SubmissionTextMixin, db.Model):
     __tablename__ = 'task_submissions'
+    __table_args__ = (
+        # Submission listings filter by task and status and page by id
+        db.Index('ix_task_submissions_task_id_status_id', 'task_id', 'status', 'id'),
+        # Review queue: submissions waiting for review, joined to their tasks
+        db.Index('ix_task_submissions_status_task_id', 'status', 'task_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    text = db.Column(db.String)
+    # Only read, and loaded only when a submission has no body; new text goes to ``body``
+    # (see migrations.migrate_submission_bodies)
+    legacy_text = deferred(db.Column('text', db.String, nullable=True))
     grade = db.Column(db.Integer)
     status = db.Column(db.String, default='IN PROGRESS')
     pages_done = db.Column(db.Integer)
     comment = db.Column(db.String)
     translator_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'))
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), index=True)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    reviewed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    reviewed_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Revision this one resubmits, for segmented submissions
+    previous_id = db.Column(db.Integer, db.ForeignKey('task_submissions.id'), nullable=True)
     task = db.relationship('TaskModel', back_populates='submissions')
-    translator = db.relationship('UserModel', back_populates='task_submissions')
+    translator = db.relationship('UserModel', back_populates='task_submissions', foreign_keys=[translator_id])
+    body = db.relationship('SubmissionBodyModel', uselist=False, cascade='all, delete-orphan')
+    segments = db.relationship('SubmissionSegmentModel', order_by='SubmissionSegmentModel.position',
+                               cascade='all, delete-orphan')
+
+    @SubmissionTextMixin.text.setter
+    def text(self, value):
+        if value is None:
+            self.body = None
+        elif self.body is None:
+            self.body = SubmissionBodyModel(text=value)
+        else:
+            self.body.text = value
+
+
+class SubmissionBodyModel(ChunkedTextMixin, db.Model):
+    __tablename__ = 'submission_bodies'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('task_submissions.id'), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)  # uncompressed, in bytes
+    chunks = db.relationship('SubmissionChunkModel', order_by='SubmissionChunkModel.start',
+                             cascade='all, delete-orphan')
+
+    @ChunkedTextMixin.text.setter
+    def text(self, value):
+        raw = value.encode()
+        self.size = len(raw)
+        self.chunks = [SubmissionChunkModel(start=start, raw=raw[start:start + SUBMISSION_CHUNK_SIZE])
+                       for start in range(0, len(raw), SUBMISSION_CHUNK_SIZE)]
+
+
+class SubmissionChunkModel(CompressedChunkMixin, db.Model):
+    __tablename__ = 'submission_chunks'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission_bodies.submission_id'), primary_key=True)
+    start = db.Column(db.Integer, primary_key=True)  # position of the first byte in the whole body
+    size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+
+class SegmentModel(CompressedChunkMixin, db.Model):
+    __tablename__ = 'segments'
+
+    # Content-addressed: a sentence or paragraph is stored once however many revisions contain it
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the text
+    size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        return self.raw.decode()
+
+
+class SubmissionSegmentModel(db.Model):
+    __tablename__ = 'submission_segments'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('task_submissions.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    segment_hash = db.Column(db.String(64), db.ForeignKey('segments.hash'), nullable=False, index=True)
+    segment = db.relationship('SegmentModel')
 
 
 class TaskResponsiblesModel(db.Model):
@@ -19,7 +19,8 @@ class UserModel(db.Model):
     projects_completed = db.Column(db.Integer, default=0)
     notifications_count = db.Column(db.Integer, default=0)
     tasks = db.relationship('TaskModel', secondary='task_responsibles', back_populates='responsibles')
-    task_submissions = db.relationship('TaskSubmissionModel', back_populates='translator')
+    task_submissions = db.relationship('TaskSubmissionModel', back_populates='translator',
+                                       foreign_keys='TaskSubmissionModel.translator_id')
 
     def __repr__(self):
         return f"<User id={self.id}, name={self.name}, email={self.email}, surname={self.surname}, role={self.role}, rate={self.rate}, status={self.status}>"
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+from flask_smorest import abort
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values):
+    # The cursor is an opaque token holding the sort key of the last row of a page
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if value is not None and _is_datetime(column) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        abort(400, message="Invalid pagination cursor.")
+
+
+def _is_datetime(column):
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+def _after(columns, values, descending):
+    # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+    conditions = []
+    for i, column in enumerate(columns):
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*[columns[j] == values[j] for j in range(i)], step))
+    return or_(*conditions)
+
+
+def keyset_paginate(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True):
+    """Return one page of ``query`` ordered by ``columns`` plus the cursor of the next page.
+
+    The last column must be unique (usually the primary key) so that the order is total.
+    """
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+
+    query = query.order_by(None).order_by(*[c.desc() if descending else c.asc() for c in columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return rows, next_cursor
+
+
+def check_not_paged_stream(query_args):
+    # A stream always returns every row, so paging arguments next to it are refused, not ignored
+    if query_args.get("stream") and ("limit" in query_args or "cursor" in query_args):
+        abort(400, message="stream returns every row and cannot be combined with limit or cursor.")
+
+
+def pagination_headers(next_cursor):
+    # Same header flask-smorest uses for its own pagination metadata
+    return {"X-Pagination": json.dumps({"next_cursor": next_cursor})}
@@ -0,0 +1,76 @@
+from flask import g
+from sqlalchemy import exists, select
+
+from db import db
+from models import ProjectModel
+from models.project import ProjectEditorsModel, ProjectTasksModel, ProjectTranslatorsModel
+from models.task import TaskResponsiblesModel
+
+PROJECT_ROLES = ("creator", "editor", "translator")
+
+
+def project_roles(user_id, project_id):
+    """Return the set of PROJECT_ROLES that ``user_id`` holds in ``project_id``.
+
+    All roles are answered by one query of three indexed EXISTS lookups, and the answer is
+    memoized for the rest of the request.
+    """
+    cache = g.setdefault("project_roles", {})
+    key = (user_id, project_id)
+
+    if key not in cache:
+        row = db.session.execute(select(
+            exists().where(ProjectModel.id == project_id, ProjectModel.creator_id == user_id),
+            exists().where(ProjectEditorsModel.project_id == project_id, ProjectEditorsModel.user_id == user_id),
+            exists().where(ProjectTranslatorsModel.project_id == project_id,
+                           ProjectTranslatorsModel.user_id == user_id),
+        )).one()
+        cache[key] = frozenset(role for role, present in zip(PROJECT_ROLES, row) if present)
+
+    return cache[key]
+
+
+def is_project_member(user_id, project_id, roles=PROJECT_ROLES):
+    return bool(project_roles(user_id, project_id) & set(roles))
+
+
+def can_access_project(user, project_id):
+    return user.role == "manager" or is_project_member(user.id, project_id)
+
+
+def can_access_task(user, task_id):
+    # Tasks have no members of their own; access follows the project they belong to
+    if user.role == "manager":
+        return True
+    project_ids = db.session.execute(
+        select(ProjectTasksModel.project_id).where(ProjectTasksModel.task_id == task_id)
+    ).scalars().all()
+    return any(is_project_member(user.id, project_id) for project_id in project_ids)
+
+
+def can_access_submission(user, submission):
+    return submission.translator_id == user.id or can_access_task(user, submission.task_id)
+
+
+def can_access_archived_project(user, project):
+    # Archived projects are read-only and rarely read, so the loaded relationships are good enough
+    return user.role == "manager" or project.creator_id == user.id or \
+        any(member.id == user.id for member in project.editors + project.translators)
+
+
+def is_task_responsible(user_id, task_id):
+    cache = g.setdefault("task_responsibles", {})
+    key = (user_id, task_id)
+
+    if key not in cache:
+        cache[key] = db.session.execute(select(
+            exists().where(TaskResponsiblesModel.task_id == task_id, TaskResponsiblesModel.user_id == user_id)
+        )).scalar()
+
+    return cache[key]
+
+
+def forget_membership():
+    # Call after changing assignments if the same request checks membership again
+    g.pop("project_roles", None)
+    g.pop("task_responsibles", None)
@@ -0,0 +1,172 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, select, union, update
+
+from db import db
+from models import ProjectModel, UserModel
+from models.archive import archived_project_editors, archived_project_translators, archived_projects, \
+    archived_task_responsibles, archived_task_submissions, archived_tasks
+from models.notifications import NotificationModel, NotificationUserModel
+from models.project import ProjectCreatorsModel, ProjectEditorsModel, ProjectTasksModel, ProjectTranslatorsModel
+from models.stats import ReconciliationModel
+from models.task import TaskModel, TaskResponsiblesModel, TaskSubmissionModel
+
+RECONCILE_JOB = "counters"
+RECONCILE_CHUNK_SIZE = 500
+
+
+def _capped_percent(done, total):
+    percent = done * 100.0 / total
+    return case((percent > 100, 100), else_=percent)
+
+
+def _approved_pages():
+    return select(func.coalesce(func.sum(TaskSubmissionModel.pages_done), 0)) \
+        .where(TaskSubmissionModel.status == "APPROVED")
+
+
+def _count(*queries):
+    # Sum of correlated COUNT(*) subqueries
+    return sum(select(func.count()).select_from(table).where(*criteria).scalar_subquery()
+               for table, *criteria in queries)
+
+
+def reconcile_tasks(task_ids):
+    approved = _approved_pages().where(TaskSubmissionModel.task_id == TaskModel.id).scalar_subquery()
+    db.session.execute(
+        update(TaskModel)
+        .where(TaskModel.id.in_(task_ids), TaskModel.pages != 0)
+        .values(progress=_capped_percent(approved, TaskModel.pages))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_projects(project_ids):
+    approved = _approved_pages() \
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskSubmissionModel.task_id) \
+        .where(ProjectTasksModel.project_id == ProjectModel.id).scalar_subquery()
+    db.session.execute(
+        update(ProjectModel)
+        .where(ProjectModel.id.in_(project_ids), ProjectModel.number_of_pages != 0)
+        .values(progress=_capped_percent(approved, ProjectModel.number_of_pages))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _finished_projects(projects, editors, translators):
+    # Finished projects the user created or worked on, in the live or the archive tables
+    def member(table):
+        return select(table.c.user_id).where(table.c.project_id == projects.c.id,
+                                             table.c.user_id == UserModel.id).exists()
+
+    return (projects, projects.c.status == "FINISHED", projects.c.deleted_at.is_(None),
+            or_(projects.c.creator_id == UserModel.id, member(editors), member(translators)))
+
+
+def reconcile_users(user_ids):
+    """Recompute the denormalized counters of ``user_ids``.
+
+    Archived rows count too: archiving a project must not change anyone's history. Task
+    progress has to be reconciled first, tasks_completed depends on it.
+    """
+    tasks, responsibles = TaskModel.__table__, TaskResponsiblesModel.__table__
+    completed_tasks = [
+        (responsibles.join(tasks, tasks.c.id == responsibles.c.task_id),
+         responsibles.c.user_id == UserModel.id, tasks.c.progress >= 100),
+        (archived_task_responsibles.join(archived_tasks, archived_tasks.c.id == archived_task_responsibles.c.task_id),
+         archived_task_responsibles.c.user_id == UserModel.id, archived_tasks.c.progress >= 100),
+    ]
+    projects = ProjectModel.__table__
+
+    db.session.execute(
+        update(UserModel)
+        .where(UserModel.id.in_(user_ids))
+        .values(
+            tasks_completed=_count(*completed_tasks),
+            tasks_evaluated=_count(
+                (TaskSubmissionModel.__table__, TaskSubmissionModel.reviewed_by == UserModel.id),
+                (archived_task_submissions, archived_task_submissions.c.reviewed_by == UserModel.id),
+            ),
+            projects_created=_count(
+                (projects, projects.c.creator_id == UserModel.id, projects.c.is_template.is_(False),
+                 projects.c.deleted_at.is_(None)),
+                (archived_projects, archived_projects.c.creator_id == UserModel.id),
+            ),
+            projects_completed=_count(
+                _finished_projects(projects, ProjectEditorsModel.__table__, ProjectTranslatorsModel.__table__),
+                _finished_projects(archived_projects, archived_project_editors, archived_project_translators),
+            ),
+            notifications_count=_count(
+                (NotificationUserModel.__table__, NotificationUserModel.user_id == UserModel.id,
+                 NotificationUserModel.seen.is_(False)),
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _ids(*queries):
+    return db.session.execute(union(*queries) if len(queries) > 1 else queries[0]).scalars().all()
+
+
+def changed_ids(since=None):
+    """Ids of the tasks, projects and users whose counters may have changed since ``since``.
+
+    Everything when ``since`` is None. Only changes that leave a timestamp are seen: membership
+    changes, deleted notifications and cleared counts are left to the nightly full run.
+    """
+    if since is None:
+        return (_ids(select(TaskModel.id)), _ids(select(ProjectModel.id)), _ids(select(UserModel.id)))
+
+    submissions = select(TaskSubmissionModel.task_id, TaskSubmissionModel.translator_id,
+                         TaskSubmissionModel.reviewed_by) \
+        .where(or_(TaskSubmissionModel.submitted_at >= since, TaskSubmissionModel.reviewed_at >= since)) \
+        .subquery()
+    task_ids = select(submissions.c.task_id)
+    project_ids = union(
+        select(ProjectTasksModel.project_id).where(ProjectTasksModel.task_id.in_(task_ids)),
+        select(ProjectModel.id).where(or_(ProjectModel.started_at >= since, ProjectModel.ended_at >= since,
+                                          ProjectModel.deleted_at >= since)),
+    ).subquery()
+    project_ids = select(project_ids.c[0])
+
+    users = [
+        select(submissions.c.translator_id),
+        select(submissions.c.reviewed_by),
+        select(TaskResponsiblesModel.user_id).where(TaskResponsiblesModel.task_id.in_(task_ids)),
+        select(NotificationUserModel.user_id).join(NotificationModel)
+        .where(NotificationModel.created_at >= since),
+    ] + [select(model.user_id).where(model.project_id.in_(project_ids))
+         for model in (ProjectCreatorsModel, ProjectEditorsModel, ProjectTranslatorsModel)] + [
+        select(ProjectModel.creator_id).where(ProjectModel.id.in_(project_ids)),
+    ]
+
+    user_ids = [user_id for user_id in _ids(*users) if user_id is not None]
+    return _ids(task_ids), _ids(project_ids), user_ids
+
+
+def reconcile_counters(full=False, chunk_size=RECONCILE_CHUNK_SIZE):
+    """Recompute progress and user counters from the source rows.
+
+    Only rows touched since the previous run are recomputed unless ``full`` is set, in
+    chunks of ``chunk_size`` ids with a commit after each. Returns how many of each were
+    reconciled.
+    """
+    started = datetime.utcnow()
+    state = db.session.get(ReconciliationModel, RECONCILE_JOB)
+    since = None if full or state is None else state.watermark
+    task_ids, project_ids, user_ids = changed_ids(since)
+
+    for ids, reconcile in ((task_ids, reconcile_tasks), (project_ids, reconcile_projects),
+                           (user_ids, reconcile_users)):
+        for i in range(0, len(ids), chunk_size):
+            reconcile(ids[i:i + chunk_size])
+            db.session.commit()
+
+    # Rows changed while this run was going are picked up by the next one
+    state = db.session.get(ReconciliationModel, RECONCILE_JOB) or ReconciliationModel(job=RECONCILE_JOB)
+    state.watermark = started
+    db.session.add(state)
+    db.session.commit()
+
+    return {"tasks": len(task_ids), "projects": len(project_ids), "users": len(user_ids)}
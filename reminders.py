@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from db import db
+from models import ProjectModel
+from models.notifications import ReminderLogModel
+from models.project import ProjectTasksModel
+from models.task import TaskModel, TaskResponsiblesModel
+from resources.notifications import send_notifications_bulk
+
+REMINDER_BATCH_SIZE = 500
+REMINDER_MESSAGE = "It`s Friday. Please submit your work."
+
+
+def open_assignments(week):
+    # (translator, project) of every assignment with work left, skipping translators already reminded
+    return select(TaskResponsiblesModel.user_id, ProjectModel.id, ProjectModel.name) \
+        .join(TaskModel, TaskModel.id == TaskResponsiblesModel.task_id) \
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id) \
+        .join(ProjectModel, ProjectModel.id == ProjectTasksModel.project_id) \
+        .where(TaskModel.progress < 100,
+               ProjectModel.status != "FINISHED",
+               ProjectModel.is_template.is_(False),
+               ProjectModel.deleted_at.is_(None),
+               ~select(ReminderLogModel.user_id)
+               .where(ReminderLogModel.user_id == TaskResponsiblesModel.user_id, ReminderLogModel.week == week)
+               .exists()) \
+        .order_by(TaskResponsiblesModel.user_id, ProjectModel.id)
+
+
+def _send(reminders, week, now):
+    send_notifications_bulk(reminders)
+    db.session.execute(insert(ReminderLogModel), [
+        {"user_id": reminder["user_id"], "week": week, "sent_at": now} for reminder in reminders
+    ])
+
+
+def send_weekly_reminders(today=None, batch_size=REMINDER_BATCH_SIZE):
+    """Remind every translator with open work to submit it, once per week.
+
+    Assignments are streamed from a server-side cursor and collapsed to one reminder per
+    translator, attached to the first of their projects. Reminders are written with bulk
+    inserts of ``batch_size`` rows, together with the reminder log that keeps a second run in
+    the same week from sending them again. Returns the number of translators reminded.
+    """
+    today = today or date.today()
+    week = today - timedelta(days=today.weekday())
+    now = datetime.utcnow()
+
+    reminders, sent, last_user_id = [], 0, None
+    rows = db.session.execute(open_assignments(week).execution_options(yield_per=batch_size))
+    for user_id, project_id, project_name in rows:
+        if user_id == last_user_id:
+            continue
+        last_user_id = user_id
+        reminders.append({"user_id": user_id, "project_id": project_id, "project_name": project_name,
+                          "status": "REQUIRES_REMINDER", "msg": REMINDER_MESSAGE})
+        if len(reminders) == batch_size:
+            _send(reminders, week, now)
+            sent += len(reminders)
+            reminders = []
+
+    if reminders:
+        _send(reminders, week, now)
+        sent += len(reminders)
+    db.session.commit()
+
+    return sent
@@ -1,13 +1,18 @@
+from collections import Counter
 from os import abort
 
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_smorest import Blueprint
+from sqlalchemy import func, insert, select, update
 
 from db import db
+from counters import increment
 from models import NotificationModel, ProjectModel, UserModel
+from models.archive import ArchivedNotificationModel, archived_notification_user
 from models.notifications import NotificationUserModel
-from schemas import NotificationSchema
+from schemas import NotificationSchema, NotificationListQueryArgsSchema
+from streaming import stream_json_array
 
 blp = Blueprint("notifications", __name__, description="Operations on notifications")
 
@@ -27,6 +32,7 @@ class Notification(MethodView):
             abort(403, message="You are not authorized to delete this notification")
 
         try:
+            forget_unseen_notifications(NotificationUserModel.notification_id == notification_id)
             # Удаляем уведомление из базы данных
             db.session.delete(notification)
             db.session.commit()
@@ -38,17 +44,29 @@ class Notification(MethodView):
 @blp.route("/notifications")
 class NotificationList(MethodView):
     @jwt_required()
+    @blp.arguments(NotificationListQueryArgsSchema, location='query')
     @blp.response(200, NotificationSchema(many=True))
-    def get(self):
+    def get(self, query_args):
         current_user_id = get_jwt_identity()
 
         # Получаем список уведомлений для текущего пользователя
-        notifications = NotificationModel.query \
-            .join(NotificationUserModel) \
-            .filter(NotificationUserModel.user_id == current_user_id) \
-            .all()
+        if query_args.get("archived"):
+            notifications_query = ArchivedNotificationModel.query \
+                .join(archived_notification_user,
+                      archived_notification_user.c.notification_id == ArchivedNotificationModel.id) \
+                .filter(archived_notification_user.c.user_id == current_user_id)
+        else:
+            notifications_query = NotificationModel.query \
+                .join(NotificationUserModel) \
+                .filter(NotificationUserModel.user_id == current_user_id)
+
+        if query_args.get("stream"):
+            return stream_json_array(notifications_query, NotificationSchema())
+
+        return notifications_query.all(), 200
 
-        return notifications, 200
+# Every notification is sent through send_notification or send_notifications_bulk, which keep
+# notifications_count equal to the user's unseen notifications; callers never update it themselves
 
 def send_notification(user_id, project_id, project_name, status, msg):
     # Create a new notification
@@ -59,7 +77,43 @@ def send_notification(user_id, project_id, project_name, status, msg):
     # Associate the notification with the user
     notification_user = NotificationUserModel(notification_id=notification.id, user_id=user_id)
     db.session.add(notification_user)
+    increment(UserModel, user_id, "notifications_count")
     db.session.commit()
+
+
+def send_notifications_bulk(notifications):
+    """Insert many notifications with two statements; the caller commits.
+
+    ``notifications`` is a list of dicts with the arguments of send_notification. The
+    notification counts of their users are raised on the same commit.
+    """
+    if not notifications:
+        return
+
+    ids = db.session.execute(
+        insert(NotificationModel).returning(NotificationModel.id, sort_by_parameter_order=True),
+        [{key: n[key] for key in ("project_id", "project_name", "status", "msg")} for n in notifications],
+    ).scalars().all()
+    db.session.execute(insert(NotificationUserModel), [
+        {"notification_id": notification_id, "user_id": n["user_id"]}
+        for notification_id, n in zip(ids, notifications)
+    ])
+    for user_id, count in Counter(n["user_id"] for n in notifications).items():
+        increment(UserModel, user_id, "notifications_count", count)
+
+
+def forget_unseen_notifications(*criteria):
+    # Called before the notification_user rows matching ``criteria`` are deleted or archived:
+    # the unseen ones stop counting for their users
+    rows = db.session.execute(
+        select(NotificationUserModel.user_id, func.count())
+        .where(*criteria, NotificationUserModel.seen.is_(False))
+        .group_by(NotificationUserModel.user_id)
+    ).all()
+    for user_id, count in rows:
+        increment(UserModel, user_id, "notifications_count", -count)
+
+
 @blp.route("/notifications/count", methods=["GET"])
 class NotificationCount(MethodView):
     @jwt_required()
@@ -77,6 +131,10 @@ class NotificationClear(MethodView):
             current_user_id = get_jwt_identity()
             user = UserModel.query.filter_by(id=current_user_id).first()
             user.notifications_count = 0
+            db.session.execute(update(NotificationUserModel)
+                               .where(NotificationUserModel.user_id == current_user_id,
+                                      NotificationUserModel.seen.is_(False))
+                               .values(seen=True))
             db.session.commit()
             return {"message": "Notification count cleared successfully"}, 200
         except Exception as e:
@@ -2,21 +2,33 @@ from datetime import datetime
 
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from sqlalchemy import desc
+from sqlalchemy import asc, desc, insert, literal, select
 from sqlalchemy.exc import SQLAlchemyError
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from celery import Celery
+from kombu.exceptions import OperationalError
 from db import db
+from counters import increment
 from models import ProjectModel, UserModel
+from models.archive import ArchivedProjectModel
 from models.notifications import NotificationUserModel
+from models.project import ProjectEditorsModel, ProjectTranslatorsModel, ProjectTasksModel, ProjectDeletionModel
+from models.task import TaskModel
+from jobs import celery
+from deletion import live_project_or_404, mark_project_deleted, purge_project_batch
+from loaders import project_view_options, archived_project_view_options, resolve_view, dump_view, view_schema
+from pagination import check_not_paged_stream, keyset_paginate, pagination_headers
+from permissions import can_access_project, can_access_archived_project, project_roles, forget_membership
+from search import full_text_search
+from sequences import reserve_codes
+from streaming import stream_json_array
 from resources.notifications import send_notification
 from schemas import CreateProjectSchema, UserSchema, ReadProjectSchema, UserListQueryArgsSchema, \
-    ProjectsListQueryArgsSchema
+    ProjectsListQueryArgsSchema, PaginatedViewQueryArgsSchema, ViewQueryArgsSchema, CloneProjectSchema, \
+    ProjectDeletionSchema, ProjectQueryArgsSchema
 
 blp = Blueprint("project", __name__, description="Operations on project")
 
-
-celery = Celery(__name__)
+PROJECT_CODE_SCOPE = "projects"
 
 
 @blp.route("/projects")
@@ -32,7 +44,7 @@ class ProjectList(MethodView):
             abort(403, message="Only managers can create projects.")
 
         try:
-            project_number = ProjectModel.query.count() + 1
+            project_number = reserve_codes(PROJECT_CODE_SCOPE, seed=max_project_number)
             project_code = generate_project_id(project_data['name'], project_number)
 
             project = ProjectModel(
@@ -47,77 +59,107 @@ class ProjectList(MethodView):
             )
             db.session.add(project)
             db.session.commit()
-            project_id = project.id
-            project_switch_status(project_id)
             return project, 201
         except SQLAlchemyError as e:
             db.session.rollback()
             print(e)
             abort(500, message="Failed to create project due to a database error.")
 
+    @blp.arguments(ProjectsListQueryArgsSchema, location='query')
     @blp.response(200, ReadProjectSchema(many=True))
     @jwt_required()
-    def get(self):
+    def get(self, query_args):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
-
-        if current_user.role == "manager":
-            projects_query = ProjectModel.query.order_by(desc(ProjectModel.started_at))
-        elif current_user.role in ["editor", "translator"]:
-            projects_query = ProjectModel.query.filter(
-                (ProjectModel.editors.any(id=current_user_id)) |
-                (ProjectModel.translators.any(id=current_user_id))
-            ).order_by(desc(ProjectModel.started_at))
+        # Finished projects are moved to the archive tables after a while (see archiving.py)
+        model, view_options = (ArchivedProjectModel, archived_project_view_options) if query_args.get("archived") \
+            else (ProjectModel, project_view_options)
+        view, only = resolve_view(model, query_args)
+
+        if current_user.role in ["editor", "translator"]:
+            projects_query = model.query.filter(
+                (model.editors.any(id=current_user_id)) |
+                (model.translators.any(id=current_user_id))
+            )
         else:
-            projects_query = ProjectModel.query.order_by(desc(ProjectModel.started_at))
+            projects_query = model.query
 
-        projects = projects_query.all()
-        return projects, 200
-
-
-
-@celery.task
-def project_switch_status(project_id):
-    try:
-        project = ProjectModel.query.get_or_404(project_id)
+        projects_query = projects_query.filter(model.is_template.is_(False), model.deleted_at.is_(None))
 
-        # Задаем таймаут на 5 минут (300 секунд)
-        timeout = 300
-
-        if project.status == 'NEW':
-            # Выполняем свитч через 5 минут с использованием countdown
-            project_switch_status.apply_async(args=[project_id], countdown=timeout)
-            project.status = 'IN PROGRESS'
-
-        # Сохраняем изменения в базе данных
-        db.session.commit()
-    except Exception as e:
-        # Handle exceptions here, log them or perform necessary actions
-        print("Error occurred during project switch status:", str(e))
-        db.session.rollback()
+        if query_args.get("status"):
+            projects_query = projects_query.filter(model.status == query_args["status"])
 
+        # A search is ranked by relevance unless the client explicitly asks for a date order
+        by_relevance = bool(query_args.get("filter")) and "sort_by_date" not in query_args
+        descending = query_args.get("sort_by_date", "desc") == "desc"
 
+        if query_args.get("filter"):
+            projects_query, rank = full_text_search(projects_query, model, query_args["filter"])
 
+        if by_relevance:
+            if "cursor" in query_args:
+                abort(400, message="Cursor pagination of search results requires sort_by_date.")
+            projects_query = projects_query.order_by(rank, model.id)
+        else:
+            order = desc if descending else asc
+            projects_query = projects_query.order_by(order(model.started_at), order(model.id))
+
+        projects_query = projects_query.options(*view_options(view, only))
+
+        if query_args.get("stream"):
+            check_not_paged_stream(query_args)
+            return stream_json_array(projects_query, view_schema(model, view, only))
+
+        if by_relevance and "limit" in query_args:
+            projects = projects_query.limit(query_args["limit"]).all()
+            return dump_view(model, view, only, projects), 200, pagination_headers(None)
+
+        if "limit" in query_args or "cursor" in query_args:
+            projects, next_cursor = keyset_paginate(
+                projects_query,
+                (model.started_at, model.id),
+                cursor=query_args.get("cursor"),
+                limit=query_args.get("limit"),
+                descending=descending,
+            )
+            return dump_view(model, view, only, projects), 200, pagination_headers(next_cursor)
 
+        projects = projects_query.all()
+        return dump_view(model, view, only, projects), 200
 
 
+@celery.task
+def purge_deleted_project(project_id):
+    # One batch per run, so a huge project never occupies a worker or the database for long
+    if purge_project_batch(project_id):
+        purge_deleted_project.apply_async(args=[project_id])
 
 
 @blp.route("/projects/<int:project_id>")
 class Project(MethodView):
+    @blp.arguments(ProjectQueryArgsSchema, location='query')
     @blp.response(200, ReadProjectSchema)
     @jwt_required()
-    def get(self, project_id):
+    def get(self, query_args, project_id):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
-        project = ProjectModel.query.filter_by(id=project_id).first_or_404()
+        if query_args.get("archived"):
+            view, only = resolve_view(ArchivedProjectModel, query_args)
+            project = ArchivedProjectModel.query.filter_by(id=project_id) \
+                .options(*archived_project_view_options(view, only)).first_or_404()
 
-        if current_user.role == "manager" or \
-           current_user_id == project.creator_id or \
-           current_user_id in [editor.id for editor in project.editors] or \
-           current_user_id in [translator.id for translator in project.translators]:
-            return project, 200
+            if can_access_archived_project(current_user, project):
+                return dump_view(ArchivedProjectModel, view, only, project, many=False), 200
+            abort(403, message="You are not authorized to access this project.")
+
+        view, only = resolve_view(ProjectModel, query_args)
+
+        project = ProjectModel.query.filter_by(id=project_id, deleted_at=None) \
+            .options(*project_view_options(view, only)).first_or_404()
+
+        if can_access_project(current_user, project_id):
+            return dump_view(ProjectModel, view, only, project, many=False), 200
         else:
             abort(403, message="You are not authorized to access this project.")
 
@@ -128,7 +170,7 @@ class Project(MethodView):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
         if current_user.role != "manager":
             abort(403, message="Only managers can edit projects.")
@@ -149,19 +191,40 @@ class Project(MethodView):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
         if current_user.role != "manager":
             abort(403, message="Only managers can delete projects.")
 
         try:
-            db.session.delete(project)
+            mark_project_deleted(project)
             db.session.commit()
-            return "", 204
         except SQLAlchemyError as e:
             db.session.rollback()
             abort(500, message=f"Failed to delete project: {str(e)}")
 
+        try:
+            purge_deleted_project.delay(project_id)
+        except OperationalError:
+            # Broker is down: the project stays hidden until `flask purge-deleted-projects` runs
+            pass
+
+        return "", 204
+
+
+@blp.route("/projects/<int:project_id>/deletion")
+class ProjectDeletion(MethodView):
+    @blp.response(200, ProjectDeletionSchema)
+    @jwt_required()
+    def get(self, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "manager":
+            abort(403, message="Only managers can delete projects.")
+
+        return ProjectDeletionModel.query.get_or_404(project_id)
+
 
 @blp.route("/projects/<int:project_id>/editors/<int:editor_id>")
 class ProjectEditor(MethodView):
@@ -174,17 +237,20 @@ class ProjectEditor(MethodView):
         if current_user.role != "manager":
             abort(403, message="Only managers can assign editors to projects.")
 
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
         editor = UserModel.query.get_or_404(editor_id)
         if editor.role != "editor":
             abort(400, message=f"User with ID {editor_id} is not an editor.")
 
+        if "editor" in project_roles(editor_id, project_id):
+            abort(400, message=f"Editor with ID {editor_id} is already assigned to project with ID {project_id}.")
+
         try:
             project.editors.append(editor)
+            forget_membership()
             notification_msg = f"You've been assigned as an editor to project {project.name}"
             send_notification(editor_id, project_id, project.name, "in_process", notification_msg)
-            editor.notifications_count += 1  # Increment editor's notifications count
             db.session.commit()
             return editor, 200
         except SQLAlchemyError as e:
@@ -192,26 +258,75 @@ class ProjectEditor(MethodView):
             abort(500, message=f"Failed to add editor to project: {str(e)}")
 
 
+@blp.route("/projects/<int:project_id>/clone")
+class ProjectClone(MethodView):
+    @blp.arguments(CloneProjectSchema)
+    @blp.response(201, ReadProjectSchema)
+    @jwt_required()
+    def post(self, clone_data, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "manager":
+            abort(403, message="Only managers can create projects.")
+
+        source = live_project_or_404(project_id)
+
+        try:
+            project = clone_project(source, current_user_id, **clone_data)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Failed to clone project due to a database error.")
+
+        return ProjectModel.query.filter_by(id=project.id).options(*project_view_options("full")).one(), 201
+
+
+@blp.route("/projects/templates")
+class ProjectTemplates(MethodView):
+    @blp.arguments(ViewQueryArgsSchema, location='query')
+    @blp.response(200, ReadProjectSchema(many=True))
+    @jwt_required()
+    def get(self, query_args):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "manager":
+            abort(403, message="Only managers can view project templates.")
+
+        view, only = resolve_view(ProjectModel, query_args)
+        templates = ProjectModel.query.filter(ProjectModel.is_template.is_(True), ProjectModel.deleted_at.is_(None)) \
+            .options(*project_view_options(view, only)).order_by(ProjectModel.name, ProjectModel.id).all()
+        return dump_view(ProjectModel, view, only, templates), 200
+
+
 @blp.route("/projects/user")
 class UserProjects(MethodView):
+    @blp.arguments(PaginatedViewQueryArgsSchema, location='query')
     @blp.response(200, ReadProjectSchema(many=True))
     @jwt_required()
-    def get(self):
+    def get(self, query_args):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
-
-        projects = []
+        view, only = resolve_view(ProjectModel, query_args)
 
         if current_user.role == "manager":
-            projects = ProjectModel.query.filter_by(creator_id=current_user_id).order_by(ProjectModel.id.desc()).limit(10).all()
+            projects_query = ProjectModel.query.filter_by(creator_id=current_user_id)
         elif current_user.role == "translator":
-            projects = ProjectModel.query.filter(ProjectModel.translators.any(id=current_user_id)).order_by(ProjectModel.id.desc()).limit(10).all()
+            projects_query = ProjectModel.query.filter(ProjectModel.translators.any(id=current_user_id))
         elif current_user.role == "editor":
-            projects = ProjectModel.query.filter(ProjectModel.editors.any(id=current_user_id)).order_by(ProjectModel.id.desc()).limit(10).all()
-
-        return projects, 200
-
+            projects_query = ProjectModel.query.filter(ProjectModel.editors.any(id=current_user_id))
+        else:
+            return [], 200, pagination_headers(None)
 
+        projects, next_cursor = keyset_paginate(
+            projects_query.filter(ProjectModel.is_template.is_(False), ProjectModel.deleted_at.is_(None))
+            .options(*project_view_options(view, only)),
+            (ProjectModel.id,),
+            cursor=query_args.get("cursor"),
+            limit=query_args.get("limit", 10),
+        )
+        return dump_view(ProjectModel, view, only, projects), 200, pagination_headers(next_cursor)
 
 
 def generate_project_id(name, number):
@@ -222,3 +337,47 @@ def generate_project_id(name, number):
     # Создаем идентификатор в формате "буквенные_инициалы-номер"
     project_id = f"{initials}-{number}"
     return project_id
+
+
+def max_project_number():
+    # Used once to seed the code sequence from the codes already in the database
+    numbers = (code.rsplit('-', 1)[-1] for (code,) in db.session.query(ProjectModel.code).yield_per(1000))
+    return max((int(number) for number in numbers if number.isdigit()), default=0)
+
+
+def clone_project(source, creator_id, name=None, color=None, deadline=None, as_template=False):
+    name = name or source.name
+    project = ProjectModel(
+        name=name,
+        code=generate_project_id(name, reserve_codes(PROJECT_CODE_SCOPE, seed=max_project_number)),
+        description=source.description,
+        number_of_pages=source.number_of_pages,
+        creator_id=creator_id,
+        status="NEW",
+        color=color or source.color,
+        deadline=deadline or source.deadline,
+        is_template=as_template,
+    )
+    db.session.add(project)
+    db.session.flush()
+
+    # Copy the task layout with one INSERT ... SELECT; progress, status and dates start fresh
+    task_columns = ["name", "description", "pages", "code"]
+    source_tasks = select(*[getattr(TaskModel, column) for column in task_columns]) \
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id) \
+        .where(ProjectTasksModel.project_id == source.id) \
+        .order_by(TaskModel.code)
+    task_ids = db.session.execute(
+        insert(TaskModel.__table__).from_select(task_columns, source_tasks).returning(TaskModel.id)
+    ).scalars().all()
+    if task_ids:
+        db.session.execute(insert(ProjectTasksModel.__table__),
+                           [{"project_id": project.id, "task_id": task_id} for task_id in task_ids])
+
+    for association in (ProjectEditorsModel, ProjectTranslatorsModel):
+        db.session.execute(insert(association.__table__).from_select(
+            ["project_id", "user_id"],
+            select(literal(project.id), association.user_id).where(association.project_id == source.id),
+        ))
+
+    return project
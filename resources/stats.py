@@ -0,0 +1,82 @@
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_smorest import Blueprint, abort
+
+from db import db
+from deletion import live_project_or_404
+from forecast import forecast_project, throughput_history
+from models import UserModel
+from models.stats import ProjectDailyStatsModel, ProjectForecastModel, ProjectStatsModel, TaskStatsModel
+from permissions import can_access_project
+from schemas import ProjectStatsSchema, ProjectForecastSchema, ForecastQueryArgsSchema
+from stats import burndown, task_stats_rows
+
+blp = Blueprint("stats", __name__, description="Project statistics")
+
+COUNTERS = ("pages_submitted", "pages_in_review", "pages_approved", "pages_rejected", "submission_count")
+
+
+@blp.route("/projects/<int:project_id>/stats")
+class ProjectStats(MethodView):
+    @blp.response(200, ProjectStatsSchema)
+    @jwt_required()
+    def get(self, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        project = live_project_or_404(project_id)
+
+        if not can_access_project(current_user, project_id):
+            abort(403, message="You are not authorized to access this project.")
+
+        # Everything below is read from the rollup tables kept up to date by stats.record_submission
+        stats = db.session.get(ProjectStatsModel, project_id) or ProjectStatsModel(rejected_count=0, approved_count=0)
+        daily = ProjectDailyStatsModel.query.filter_by(project_id=project_id).order_by(ProjectDailyStatsModel.day).all()
+
+        tasks = []
+        for task, task_stats in task_stats_rows(project_id):
+            task_stats = task_stats or TaskStatsModel(approved_count=0, rejected_count=0)
+            tasks.append({
+                "task_id": task.id,
+                "code": task.code,
+                "name": task.name,
+                "pages": task.pages,
+                "progress": task.progress,
+                "pages_in_review": task_stats.pages_in_review or 0,
+                "pages_approved": task_stats.pages_approved or 0,
+                "pages_rejected": task_stats.pages_rejected or 0,
+                "rejection_rate": task_stats.rejection_rate,
+            })
+
+        return {
+            "project_id": project.id,
+            "number_of_pages": project.number_of_pages,
+            "progress": project.progress,
+            **{name: getattr(stats, name) or 0 for name in COUNTERS},
+            "rejection_rate": stats.rejection_rate,
+            "tasks": tasks,
+            "burndown": burndown(project.number_of_pages, daily),
+        }, 200
+
+
+@blp.route("/projects/<int:project_id>/forecast")
+class ProjectForecast(MethodView):
+    @blp.arguments(ForecastQueryArgsSchema, location='query')
+    @blp.response(200, ProjectForecastSchema)
+    @jwt_required()
+    def get(self, query_args, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        project = live_project_or_404(project_id)
+
+        if not can_access_project(current_user, project_id):
+            abort(403, message="You are not authorized to access this project.")
+
+        # Normally computed by the nightly `flask forecast-projects` run
+        forecast = db.session.get(ProjectForecastModel, project_id)
+        if forecast is None or query_args.get("refresh"):
+            forecast = forecast_project(project, throughput_history())
+            db.session.commit()
+
+        return forecast, 200
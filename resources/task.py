@@ -1,31 +1,41 @@
-from datetime import datetime, timedelta
-from celery import Celery
+from datetime import datetime, timedelta, timezone
+from flask import Response, jsonify, request
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_smorest import Blueprint, abort
+from werkzeug.datastructures import ContentRange
+from sqlalchemy import and_, bindparam, case, func, insert, literal, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from db import db
+from sqlalchemy.orm import selectinload
+from db import db, to_utc, UTCDateTime
+from counters import increment
+from jobs import celery
+from deletion import live_project_or_404, deleted_task_ids
+from loaders import task_view_options, resolve_view, dump_view, view_schema
+from pagination import check_not_paged_stream, keyset_paginate, pagination_headers
+from permissions import can_access_project, can_access_submission, can_access_task, project_roles, \
+    is_task_responsible, forget_membership
 from models import UserModel, ProjectModel
-from models.project import ProjectTasksModel
-from models.task import TaskModel, TaskSubmissionModel
-from resources.notifications import send_notification
+from models.project import ProjectEditorsModel, ProjectTasksModel, ProjectTranslatorsModel
+from models.task import AWAITING_REVIEW, TaskModel, TaskSubmissionModel, TaskResponsiblesModel, \
+    SubmissionBodyModel, SubmissionSegmentModel
+from resources.notifications import send_notification, send_notifications_bulk
+from search import full_text_search
+from segments import diff_revisions, resolve_segments, revision_hashes
+from sequences import reserve_codes
+from stats import record_submission, record_submissions
+from streaming import stream_json_array, stream_submission_body, write_submission_body
 from schemas import (
     ReadTaskSchema, CreateTaskSchema, UserSchema, TaskSubmissionSchema,
     TaskSubmissionCheckingSchema, TaskSubmissionFilterSchema, DeadlineSchema,
-    SetTaskDeadlineSchema, TaskSubmissionSchemaSendForCorrection
+    SetTaskDeadlineSchema, TaskSubmissionSchemaSendForCorrection, ViewQueryArgsSchema,
+    TaskListQueryArgsSchema, TaskSearchQueryArgsSchema, SplitProjectSchema, BulkTranslatorAssignmentSchema,
+    BulkTranslatorAssignmentResultSchema, SegmentedSubmissionSchema, SegmentedSubmissionResultSchema, SubmissionDiffSchema,
+    BatchGradeSchema, BatchGradeResultSchema, ReviewQueueQueryArgsSchema, ReviewQueueItemSchema
 )
 
 blp = Blueprint("task", __name__, description="Operations on tasks")
 
-# Create Celery instance
-celery = Celery(__name__)
-
-# Celery settings
-celery.conf.update(
-    broker_url='redis://localhost:6379/0',
-    result_backend='redis://localhost:6379/0'
-)
-
 def next_friday():
     today = datetime.now()
     days_until_friday = (4 - today.weekday() + 7) % 7
@@ -45,25 +55,21 @@ class Task(MethodView):
         if current_user.role != "manager":
             abort(403, message="Only managers can assign tasks to projects.")
 
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
         if task_data.get('pages') is not None and project.number_of_pages is not None:
             if task_data['pages'] > project.number_of_pages / 6:
                 abort(400, message="Task pages cannot be more than 1/6 of project number of pages.")
 
-        task_count = len(project.tasks) + 1
-        new_task_code = f"{task_count}"
-
-        new_task = TaskModel(
-            code=new_task_code,
-            **task_data
-        )
-
         try:
+            new_task = TaskModel(
+                code=reserve_task_codes(project_id),
+                **task_data
+            )
             db.session.add(new_task)
-            db.session.commit()
+            db.session.flush()
 
-            project.tasks.append(new_task)
+            db.session.add(ProjectTasksModel(project_id=project_id, task_id=new_task.id))
             db.session.commit()
 
             return new_task, 201
@@ -71,12 +77,82 @@ class Task(MethodView):
             db.session.rollback()
             abort(500, message="Failed to create task due to a database error.")
 
+    @blp.arguments(TaskListQueryArgsSchema, location='query')
     @blp.response(200, ReadTaskSchema(many=True))
     @jwt_required()
-    def get(self, project_id):
-        project = ProjectModel.query.get_or_404(project_id)
-        tasks = project.tasks
-        return tasks, 200
+    def get(self, query_args, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+        view, only = resolve_view(TaskModel, query_args)
+        live_project_or_404(project_id)
+
+        if not can_access_project(current_user, project_id):
+            abort(403, message="You are not authorized to access this project.")
+
+        tasks_query = TaskModel.query.join(ProjectTasksModel) \
+            .filter(ProjectTasksModel.project_id == project_id) \
+            .options(*task_view_options(view, only)) \
+            .order_by(TaskModel.id)
+
+        if query_args.get("stream"):
+            return stream_json_array(tasks_query, view_schema(TaskModel, view, only))
+
+        return dump_view(TaskModel, view, only, tasks_query.all()), 200
+
+
+@blp.route("/task/<int:project_id>/split")
+class TaskSplit(MethodView):
+    @jwt_required()
+    @blp.arguments(SplitProjectSchema)
+    @blp.response(201, ReadTaskSchema(many=True))
+    def post(self, split_data, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "manager":
+            abort(403, message="Only managers can assign tasks to projects.")
+
+        project = live_project_or_404(project_id)
+        if not project.number_of_pages:
+            abort(400, message="Project has no number of pages to split.")
+
+        if "chunk_size" in split_data:
+            size = split_data["chunk_size"]
+            page_ranges = [(first, min(first + size - 1, project.number_of_pages))
+                           for first in range(1, project.number_of_pages + 1, size)]
+        else:
+            page_ranges = split_data["page_ranges"]
+
+        for first, last in page_ranges:
+            if last > project.number_of_pages:
+                abort(400, message=f"Page range {first}-{last} is outside of the project's {project.number_of_pages} pages.")
+            if last - first + 1 > project.number_of_pages / 6:
+                abort(400, message="Task pages cannot be more than 1/6 of project number of pages.")
+
+        try:
+            first_code = reserve_task_codes(project_id, len(page_ranges))
+            rows = [
+                {
+                    "code": first_code + i,
+                    "name": f"{split_data['name']} {first}-{last}",
+                    "description": split_data["description"],
+                    "pages": last - first + 1,
+                }
+                for i, (first, last) in enumerate(page_ranges)
+            ]
+            task_ids = db.session.execute(
+                insert(TaskModel).returning(TaskModel.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            db.session.execute(insert(ProjectTasksModel),
+                               [{"project_id": project_id, "task_id": task_id} for task_id in task_ids])
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Failed to create tasks due to a database error.")
+
+        tasks = TaskModel.query.filter(TaskModel.id.in_(task_ids)) \
+            .options(*task_view_options("full")).order_by(TaskModel.code).all()
+        return tasks, 201
 
 
 @blp.route("/task/<int:task_id>/set_deadline")
@@ -92,15 +168,10 @@ class SetTaskDeadline(MethodView):
             abort(403, message="Only managers can set deadlines.")
 
         task = TaskModel.query.get_or_404(task_id)
+        if not can_access_task(current_user, task_id):
+            abort(403, message="You are not authorized to access this task.")
 
-        # Преобразование строки в datetime
-        deadline_str = deadline_data['deadline']
-        try:
-            deadline_dt = datetime.fromisoformat(deadline_str.replace("Z", "+00:00"))
-        except ValueError:
-            abort(400, message="Invalid date format. Expected ISO 8601 format.")
-
-        task.deadline = deadline_dt
+        task.deadline = deadline_data['deadline']
         try:
             db.session.commit()
             return task, 200
@@ -128,50 +199,106 @@ class TaskTranslator(MethodView):
         if translator.role != "translator":
             abort(400, message=f"User with ID {translator_id} is not a translator.")
 
-        if translator in task.responsibles:
+        if is_task_responsible(translator_id, task_id):
             abort(400, message=f"Translator with ID {translator_id} is already assigned to task with ID {task_id}.")
 
-        send_task_assigned_notification(translator_id, project_id, task.name, ProjectModel.query.get_or_404(project_id).name)
-        send_deadline_notification(translator_id, project_id, task.name, ProjectModel.query.get_or_404(project_id).name)
-
-        user = UserModel.query.filter_by(id=translator_id).first()
-        user.notifications_count += 1
+        send_task_assigned_notification(translator_id, project_id, task.name, live_project_or_404(project_id).name)
+        send_deadline_notification(translator_id, project_id, task.name, live_project_or_404(project_id).name)
 
-        project = ProjectModel.query.get_or_404(project_id)
-        send_submission_reminder.delay(project_id, project.name, translator_id)
+        project = live_project_or_404(project_id)
 
-        if translator not in project.translators:
+        if "translator" not in project_roles(translator_id, project_id):
             project.translators.append(translator)
         task.responsibles.append(translator)
+        forget_membership()
 
         db.session.commit()
 
         return translator, 200
 
-@blp.route("/task/<int:project_id>/<int:task_id>/submissions")
-class TaskSubmission(MethodView):
+@blp.route("/task/<int:project_id>/translators")
+class TaskTranslatorsBulk(MethodView):
     @jwt_required()
-    @blp.arguments(TaskSubmissionSchema)
-    @blp.response(201, TaskSubmissionSchema)
-    def post(self, submission_data, project_id, task_id):
+    @blp.arguments(BulkTranslatorAssignmentSchema)
+    @blp.response(200, BulkTranslatorAssignmentResultSchema)
+    def post(self, assignment_data, project_id):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
-        if current_user.role != "translator":
-            abort(403, message="Only translators can submit submissions.")
+        if current_user.role != "manager":
+            abort(403, message="Only managers can assign translators to tasks.")
 
-        task = TaskModel.query.get_or_404(task_id)
-        if current_user not in task.responsibles:
-            abort(403, message="You are not assigned to this task.")
+        project = live_project_or_404(project_id)
+        pairs = list(dict.fromkeys((a["task_id"], a["translator_id"]) for a in assignment_data["assignments"]))
+        task_ids = {task_id for task_id, _ in pairs}
+        translator_ids = {translator_id for _, translator_id in pairs}
+
+        # One query per check, however many pairs there are
+        task_names = dict(db.session.query(TaskModel.id, TaskModel.name).join(ProjectTasksModel).filter(
+            ProjectTasksModel.project_id == project_id, TaskModel.id.in_(task_ids)
+        ).all())
+        missing = task_ids - set(task_names)
+        if missing:
+            abort(404, message=f"Tasks not found in this project: {', '.join(map(str, sorted(missing)))}.")
+
+        translators = set(db.session.execute(select(UserModel.id).where(
+            UserModel.id.in_(translator_ids), UserModel.role == "translator"
+        )).scalars().all())
+        invalid = translator_ids - translators
+        if invalid:
+            abort(400, message=f"Users are not translators: {', '.join(map(str, sorted(invalid)))}.")
+
+        assigned_already = set(db.session.query(TaskResponsiblesModel.task_id, TaskResponsiblesModel.user_id).filter(
+            TaskResponsiblesModel.task_id.in_(task_ids)
+        ).all())
+        new_pairs = [pair for pair in pairs if pair not in assigned_already]
+        in_project = set(db.session.execute(select(ProjectTranslatorsModel.user_id).where(
+            ProjectTranslatorsModel.project_id == project_id
+        )).scalars().all())
 
-        num_pages_done = submission_data.get("pages_done")
-        pages = task.pages
+        try:
+            if new_pairs:
+                db.session.execute(insert(TaskResponsiblesModel), [
+                    {"task_id": task_id, "user_id": translator_id} for task_id, translator_id in new_pairs
+                ])
+            new_members = sorted({translator_id for _, translator_id in new_pairs} - in_project)
+            if new_members:
+                db.session.execute(insert(ProjectTranslatorsModel), [
+                    {"project_id": project_id, "user_id": translator_id} for translator_id in new_members
+                ])
+
+            notifications = []
+            for task_id, translator_id in new_pairs:
+                task_name = task_names[task_id]
+                for status, msg in (
+                    ("task_assigned", f"You've been assigned as a translator to task {task_name} in project {project.name}"),
+                    ("choose_deadline", f"Please choose a deadline for task {task_name} in project {project.name}"),
+                ):
+                    notifications.append({"user_id": translator_id, "project_id": project_id,
+                                          "project_name": project.name, "status": status, "msg": msg})
+            send_notifications_bulk(notifications)
 
-        if num_pages_done is None or pages is None:
-            abort(400, message="Number of pages done and total pages must be provided.")
+            db.session.commit()
+            forget_membership()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Failed to assign translators due to a database error.")
 
-        if num_pages_done > pages:
-            abort(400, message="Number of pages done cannot be greater than total pages.")
+        def as_dicts(items):
+            return [{"task_id": task_id, "translator_id": translator_id} for task_id, translator_id in items]
+
+        return {"assigned": as_dicts(new_pairs), "skipped": as_dicts(p for p in pairs if p in assigned_already)}, 200
+
+
+@blp.route("/task/<int:project_id>/<int:task_id>/submissions")
+class TaskSubmission(MethodView):
+    @jwt_required()
+    @blp.arguments(TaskSubmissionSchema)
+    @blp.response(201, TaskSubmissionSchema)
+    def post(self, submission_data, project_id, task_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+        task = check_can_submit(current_user, project_id, task_id, submission_data.get("pages_done"))
 
         task_submission = TaskSubmissionModel(
             **submission_data,
@@ -179,25 +306,9 @@ class TaskSubmission(MethodView):
             translator_id=current_user_id,
             status="IN VERIFYING"
         )
+        save_submission(current_user, project_id, task, task_submission)
 
-        try:
-            project_name = ProjectModel.query.get_or_404(project_id).name
-            notification_msg = f"{current_user.name} {current_user.surname} has submitted the task {task.name} in project {project_name} for review"
-            editors = UserModel.query.filter_by(role="editor").all()
-            for editor in editors:
-                user = UserModel.query.filter_by(id=editor.id).first()
-                user.notifications_count += 1
-                send_notification(editor.id, project_id, project_name, "IN VERIFYING", notification_msg)
-
-            task.submissions.append(task_submission)
-            db.session.add(task_submission)
-            db.session.commit()
-            submit_task.delay(project_name, project_id, current_user_id, task_submission.id, task_id)
-
-            return task_submission, 201
-        except SQLAlchemyError:
-            db.session.rollback()
-            abort(500, message="Failed to create task submission")
+        return task_submission, 201
 
     @jwt_required()
     @blp.arguments(TaskSubmissionFilterSchema, location='query')
@@ -209,9 +320,149 @@ class TaskSubmission(MethodView):
         if current_user.role not in ["translator", "editor", "manager"]:
             abort(403, message="Only translators, managers, and editors can view submissions.")
 
-        submissions = TaskModel.query.get_or_404(task_id).submissions
+        if not can_access_project(current_user, project_id):
+            abort(403, message="You are not authorized to access this project.")
+
+        project_task_or_404(project_id, task_id)
+
+        # Filtered and paged in SQL, served by ix_task_submissions_task_id_status_id
+        submissions_query = TaskSubmissionModel.query.filter_by(task_id=task_id)
+        if "status" in query_args:
+            submissions_query = submissions_query.filter_by(status=query_args["status"])
+        if "translator_id" in query_args:
+            submissions_query = submissions_query.filter_by(translator_id=query_args["translator_id"])
+        # submitted_at is stored as naive UTC; the bounds may come with any offset
+        if "submitted_from" in query_args:
+            submitted_from = to_utc(query_args["submitted_from"]).replace(tzinfo=None)
+            submissions_query = submissions_query.filter(TaskSubmissionModel.submitted_at >= submitted_from)
+        if "submitted_to" in query_args:
+            submitted_to = to_utc(query_args["submitted_to"]).replace(tzinfo=None)
+            submissions_query = submissions_query.filter(TaskSubmissionModel.submitted_at < submitted_to)
+
+        include_text = query_args["include_text"]
+        if include_text:
+            submissions_query = submissions_query.options(
+                selectinload(TaskSubmissionModel.body).selectinload(SubmissionBodyModel.chunks),
+                selectinload(TaskSubmissionModel.segments).selectinload(SubmissionSegmentModel.segment))
+
+        next_cursor = None
+        if "limit" in query_args or "cursor" in query_args:
+            submissions, next_cursor = keyset_paginate(
+                submissions_query,
+                (TaskSubmissionModel.id,),
+                cursor=query_args.get("cursor"),
+                limit=query_args.get("limit"),
+                descending=False,
+            )
+        else:
+            submissions = submissions_query.order_by(TaskSubmissionModel.id).all()
+
+        if not include_text:
+            submissions = jsonify(TaskSubmissionCheckingSchema(many=True, exclude=("text",)).dump(submissions))
+        return submissions, 200, pagination_headers(next_cursor)
+
+# Tasks without a deadline come last in the review queue
+NO_DEADLINE = datetime(9999, 12, 31, tzinfo=timezone.utc)
+# Submissions sent before they were dated are the oldest of their task
+NO_SUBMISSION_TIME = datetime(1970, 1, 1)
+
+
+@blp.route("/review-queue")
+class ReviewQueue(MethodView):
+    @jwt_required()
+    @blp.arguments(ReviewQueueQueryArgsSchema, location='query')
+    @blp.response(200, ReviewQueueItemSchema(many=True))
+    def get(self, query_args):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "editor":
+            abort(403, message="Only editors have a review queue.")
+
+        # One query: waiting submissions of every live project the caller edits, most urgent first
+        due = func.coalesce(TaskModel.deadline, literal(NO_DEADLINE, UTCDateTime)).label("due")
+        # A NULL in the keyset would never compare as after the cursor, so it gets a sentinel
+        sent = func.coalesce(TaskSubmissionModel.submitted_at,
+                             literal(NO_SUBMISSION_TIME, TaskSubmissionModel.submitted_at.type)).label("sent")
+        queue = db.session.query(
+            TaskSubmissionModel.id, TaskSubmissionModel.pages_done, TaskSubmissionModel.translator_id,
+            TaskSubmissionModel.submitted_at, TaskModel.id.label("task_id"), TaskModel.code.label("task_code"),
+            TaskModel.name.label("task_name"), TaskModel.deadline.label("task_deadline"),
+            ProjectModel.id.label("project_id"), ProjectModel.name.label("project_name"), due, sent,
+        ) \
+            .join(TaskModel, TaskModel.id == TaskSubmissionModel.task_id) \
+            .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id) \
+            .join(ProjectEditorsModel, ProjectEditorsModel.project_id == ProjectTasksModel.project_id) \
+            .join(ProjectModel, ProjectModel.id == ProjectTasksModel.project_id) \
+            .filter(TaskSubmissionModel.status.in_(AWAITING_REVIEW),
+                    ProjectEditorsModel.user_id == current_user_id,
+                    ProjectModel.deleted_at.is_(None))
+
+        if "project_id" in query_args:
+            queue = queue.filter(ProjectTasksModel.project_id == query_args["project_id"])
+
+        submissions, next_cursor = keyset_paginate(
+            queue,
+            (due, sent, TaskSubmissionModel.id),
+            cursor=query_args.get("cursor"),
+            limit=query_args.get("limit"),
+            descending=False,
+        )
+        return submissions, 200, pagination_headers(next_cursor)
+
+
+@blp.route("/task/<int:project_id>/<int:task_id>/submissions/segments")
+class TaskSegmentedSubmission(MethodView):
+    @jwt_required()
+    @blp.arguments(SegmentedSubmissionSchema)
+    @blp.response(201, SegmentedSubmissionResultSchema)
+    def post(self, submission_data, project_id, task_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+        task = check_can_submit(current_user, project_id, task_id, submission_data["pages_done"])
+
+        previous_hashes = []
+        previous_id = submission_data.get("previous_id")
+        if previous_id is not None:
+            previous = TaskSubmissionModel.query.get_or_404(previous_id)
+            if previous.task_id != task_id or previous.translator_id != current_user_id:
+                abort(400, message="The previous revision must be your own submission of this task.")
+            previous_hashes = revision_hashes(previous_id)
+
+        hashes = resolve_segments(submission_data["segments"], previous_hashes)
+        task_submission = TaskSubmissionModel(
+            pages_done=submission_data["pages_done"],
+            previous_id=previous_id,
+            task_id=task_id,
+            translator_id=current_user_id,
+            status="IN VERIFYING",
+            segments=[SubmissionSegmentModel(position=i, segment_hash=h) for i, h in enumerate(hashes)],
+        )
+        save_submission(current_user, project_id, task, task_submission)
+
+        return task_submission, 201
+
+
+@blp.route("/task/submissions/<int:submission_id>/diff")
+class TaskSubmissionDiff(MethodView):
+    @jwt_required()
+    @blp.response(200, SubmissionDiffSchema)
+    def get(self, submission_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role not in ["translator", "manager", "editor"]:
+            abort(403, message="Only translators, managers and editors can view submissions.")
+
+        submission = TaskSubmissionModel.query.get_or_404(submission_id)
+        if not can_access_submission(current_user, submission):
+            abort(403, message="You are not authorized to access this submission.")
+
+        previous_hashes = revision_hashes(submission.previous_id) if submission.previous_id else []
+        operations = diff_revisions(previous_hashes, revision_hashes(submission_id))
+
+        return {"submission_id": submission_id, "previous_id": submission.previous_id, "operations": operations}, 200
 
-        return submissions, 200
 
 @blp.route("/task/submissions/<int:submission_id>")
 class SingleTaskSubmission(MethodView):
@@ -222,12 +473,73 @@ class SingleTaskSubmission(MethodView):
         current_user = UserModel.query.get(current_user_id)
 
         if current_user.role not in ["translator", "manager", "editor"]:
-            abort(403, message="Only managers and editors can view submission")
+            abort(403, message="Only translators, managers and editors can view submissions.")
 
         submission = TaskSubmissionModel.query.get_or_404(submission_id)
+        if not can_access_submission(current_user, submission):
+            abort(403, message="You are not authorized to access this submission.")
 
         return submission, 200
 
+@blp.route("/task/submissions/<int:submission_id>/body")
+class TaskSubmissionBody(MethodView):
+    @jwt_required()
+    @blp.response(204)
+    def put(self, submission_id):
+        # Raw (optionally chunked) request body, stored as it arrives instead of parsed as JSON
+        submission = TaskSubmissionModel.query.get_or_404(submission_id)
+
+        if submission.translator_id != int(get_jwt_identity()):
+            abort(403, message="You can only upload the text of your own submissions.")
+
+        if submission.status not in AWAITING_REVIEW:
+            abort(400, message="The text can only be changed while the submission is waiting for review.")
+
+        try:
+            write_submission_body(submission_id, request.stream)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Failed to store the submission text.")
+
+    @jwt_required()
+    def get(self, submission_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role not in ["translator", "manager", "editor"]:
+            abort(403, message="Only translators, managers and editors can view submissions.")
+
+        submission = TaskSubmissionModel.query.get_or_404(submission_id)
+        if not can_access_submission(current_user, submission):
+            abort(403, message="You are not authorized to access this submission.")
+
+        body = db.session.get(SubmissionBodyModel, submission_id)
+        if body is not None:
+            size = body.size
+        elif submission.legacy_text is not None:
+            # Not moved to a body yet (see migrations.migrate_submission_bodies)
+            legacy = submission.legacy_text.encode()
+            size = len(legacy)
+        else:
+            abort(404, message="The submission has no text.")
+
+        start, stop, status = 0, size, 200
+        headers = {"Accept-Ranges": "bytes"}
+
+        if request.range is not None:
+            bounds = request.range.range_for_length(size)
+            if bounds is None:
+                abort(416, message="Requested range not satisfiable.", headers={"Content-Range": f"bytes */{size}"})
+            start, stop = bounds
+            status = 206
+            headers["Content-Range"] = ContentRange("bytes", start, stop, size).to_header()
+
+        headers["Content-Length"] = str(stop - start)
+        content = stream_submission_body(submission_id, start, stop) if body is not None else legacy[start:stop]
+        return Response(content, status, headers, mimetype="text/plain")
+
+
 @blp.route("/task/<int:project_id>/<int:task_id>/submission/<int:submission_id>/grade")
 class TaskSubmissionGrade(MethodView):
     @jwt_required()
@@ -240,31 +552,42 @@ class TaskSubmissionGrade(MethodView):
         if current_user.role != "editor":
             abort(403, message="Only editors can grade submissions.")
 
-        task = TaskModel.query.join(ProjectTasksModel).filter(
-            ProjectTasksModel.project_id == project_id,
-            TaskModel.id == task_id
-        ).first_or_404()
+        if "editor" not in project_roles(current_user_id, project_id):
+            abort(403, message="You are not assigned to this project.")
 
-        submission = TaskSubmissionModel.query.get_or_404(submission_id)
-        project = ProjectModel.query.get_or_404(project_id)
+        task = project_task_or_404(project_id, task_id)
+        submission = TaskSubmissionModel.query.filter_by(id=submission_id, task_id=task_id).first_or_404()
+        project = live_project_or_404(project_id)
+        old_status = submission.status
+
+        # Unlike the batch endpoint, grading one submission may overturn its rejection: the editor
+        # picked that submission, while a batch may be built from a stale list. Checked by the
+        # UPDATE itself, so a submission graded again or by two editors at once adds its pages to
+        # the progress only once
+        approved = db.session.execute(
+            update(TaskSubmissionModel)
+            .where(TaskSubmissionModel.id == submission_id, TaskSubmissionModel.status != "APPROVED")
+            .values(status="APPROVED", reviewed_by=current_user_id, reviewed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
 
-        if task.pages != 0:
-            task_progress_increase = (submission.pages_done / task.pages) * 100
-            task.progress = min(task.progress + task_progress_increase, 100)
+        if approved:
+            if task.pages != 0:
+                task_progress_increase = (submission.pages_done / task.pages) * 100
+                increment(TaskModel, task_id, "progress", task_progress_increase, maximum=100)
 
-        if project.number_of_pages != 0:
-            project_progress_increase = (submission.pages_done / project.number_of_pages) * 100
-            project.progress = min(project.progress + project_progress_increase, 100)
+            if project.number_of_pages != 0:
+                project_progress_increase = (submission.pages_done / project.number_of_pages) * 100
+                increment(ProjectModel, project_id, "progress", project_progress_increase, maximum=100)
+
+            record_submission(project_id, task_id, submission.pages_done, old_status, "APPROVED")
 
         submission.grade = grade_data["grade"]
-        submission.status = "APPROVED"
+        db.session.refresh(submission, ["status", "reviewed_by", "reviewed_at"])
 
         try:
-            project_name = ProjectModel.query.get_or_404(project_id).name
+            project_name = live_project_or_404(project_id).name
             translators = UserModel.query.filter_by(role="translator", id=submission.translator_id).all()
-            for translator in translators:
-                user = UserModel.query.filter_by(id=translator.id).first()
-                user.notifications_count += 1
 
             notification_msg = f"{current_user.name} {current_user.surname} has graded the task {task.name} in project {project_name}. Grade: {submission.grade}"
             for translator in translators:
@@ -276,6 +599,81 @@ class TaskSubmissionGrade(MethodView):
             db.session.rollback()
             abort(500, message="Failed to update submission grade")
 
+@blp.route("/task/<int:project_id>/submissions/grade")
+class TaskSubmissionBatchGrade(MethodView):
+    @jwt_required()
+    @blp.arguments(BatchGradeSchema)
+    @blp.response(200, BatchGradeResultSchema)
+    def put(self, grade_data, project_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+
+        if current_user.role != "editor":
+            abort(403, message="Only editors can grade submissions.")
+
+        if "editor" not in project_roles(current_user_id, project_id):
+            abort(403, message="You are not assigned to this project.")
+
+        project = live_project_or_404(project_id)
+        grades = {item["submission_id"]: item["grade"] for item in grade_data["grades"]}
+
+        rows = db.session.execute(
+            select(TaskSubmissionModel.id, TaskSubmissionModel.task_id, TaskSubmissionModel.translator_id,
+                   TaskSubmissionModel.pages_done, TaskSubmissionModel.status, TaskModel.name, UserModel.role)
+            .join(TaskModel, TaskModel.id == TaskSubmissionModel.task_id)
+            .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id)
+            .outerjoin(UserModel, UserModel.id == TaskSubmissionModel.translator_id)
+            .where(ProjectTasksModel.project_id == project_id, TaskSubmissionModel.id.in_(grades))
+        ).all()
+        missing = set(grades) - {row.id for row in rows}
+        if missing:
+            abort(404, message=f"Submissions not found in this project: {', '.join(map(str, sorted(missing)))}.")
+
+        # Only submissions waiting for review are approved; the others, rejected ones included, are
+        # reported as skipped. Overturning a rejection goes through the single-grade endpoint
+        pending = {row.id: row for row in rows if row.status in AWAITING_REVIEW}
+
+        try:
+            graded = []
+            if pending:
+                # The status is checked again by the UPDATE itself, so a concurrent review of the same
+                # submission cannot approve it twice and add its pages twice
+                graded = sorted(db.session.execute(
+                    update(TaskSubmissionModel)
+                    .where(TaskSubmissionModel.id.in_(pending), TaskSubmissionModel.status.in_(AWAITING_REVIEW))
+                    .values(status="APPROVED", reviewed_by=current_user_id, reviewed_at=datetime.utcnow())
+                    .returning(TaskSubmissionModel.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all())
+            rows = [pending[submission_id] for submission_id in graded]
+
+            if rows:
+                db.session.execute(
+                    update(TaskSubmissionModel.__table__)
+                    .where(TaskSubmissionModel.id == bindparam("submission_id"))
+                    .values(grade=bindparam("grade")),
+                    [{"submission_id": row.id, "grade": grades[row.id]} for row in rows],
+                )
+                update_progress(project_id, graded)
+                record_submissions(project_id, [(row.task_id, row.pages_done, row.status, "APPROVED") for row in rows])
+
+                notifications = []
+                for row in rows:
+                    if row.role != "translator":
+                        continue
+                    notification_msg = f"{current_user.name} {current_user.surname} has graded the task {row.name} in project {project.name}. Grade: {grades[row.id]}"
+                    notifications.append({"user_id": row.translator_id, "project_id": project_id,
+                                          "project_name": project.name, "status": "APPROVED", "msg": notification_msg})
+                send_notifications_bulk(notifications)
+
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Failed to update submission grades")
+
+        return {"graded": graded, "skipped": sorted(set(grades) - set(graded))}, 200
+
+
 @blp.route("/task/<int:project_id>/<int:task_id>/submission/<int:submission_id>/reject")
 class TaskSubmissionReject(MethodView):
     @jwt_required()
@@ -288,20 +686,23 @@ class TaskSubmissionReject(MethodView):
         if current_user.role != "editor":
             abort(403, message="Only editors can reject submissions.")
 
-        task = TaskModel.query.get_or_404(task_id)
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
-        if current_user not in project.editors:
+        if "editor" not in project_roles(current_user_id, project_id):
             abort(403, message="You are not assigned to this task.")
 
-        submission = TaskSubmissionModel.query.get_or_404(submission_id)
+        task = project_task_or_404(project_id, task_id)
+        submission = TaskSubmissionModel.query.filter_by(id=submission_id, task_id=task_id).first_or_404()
+        record_submission(project_id, task_id, submission.pages_done, submission.status, "NOT APPROVED")
         submission.status = "NOT APPROVED"
         submission.comment = correction_data["comment"]
-        task.rejected += 1
+        submission.reviewed_by = current_user_id
+        submission.reviewed_at = datetime.utcnow()
+        increment(TaskModel, task_id, "rejected")
 
         try:
             comment = correction_data['comment']
-            project_name = ProjectModel.query.get_or_404(project_id).name
+            project_name = live_project_or_404(project_id).name
             notification_msg = f"{current_user.name} {current_user.surname} hasn't approved the task {task.name} in project {project.name}. Comment: {comment}"
             for translator in project.translators:
                 send_notification(translator.id, project_id, project.name, submission.status, notification_msg)
@@ -313,11 +714,18 @@ class TaskSubmissionReject(MethodView):
 
 @blp.route("/task/<int:project_id>/<int:task_id>")
 class SingleTask(MethodView):
+    @blp.arguments(ViewQueryArgsSchema, location='query')
     @blp.response(200, ReadTaskSchema)
     @jwt_required()
-    def get(self, project_id, task_id):
-        task = TaskModel.query.get_or_404(task_id)
-        return task, 200
+    def get(self, query_args, project_id, task_id):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+        view, only = resolve_view(TaskModel, query_args)
+
+        if not can_access_project(current_user, project_id):
+            abort(403, message="You are not authorized to access this project.")
+        task = project_task_or_404(project_id, task_id, *task_view_options(view, only))
+        return dump_view(TaskModel, view, only, task, many=False), 200
 
     @blp.arguments(CreateTaskSchema, location='json')
     @blp.response(200, ReadTaskSchema)
@@ -364,19 +772,70 @@ class SingleTask(MethodView):
             db.session.rollback()
             abort(500, message="Failed to delete task due to a database error.")
 
+@blp.route("/tasks/search")
+class TaskSearch(MethodView):
+    @blp.arguments(TaskSearchQueryArgsSchema, location='query')
+    @blp.response(200, ReadTaskSchema(many=True))
+    @jwt_required()
+    def get(self, query_args):
+        current_user_id = get_jwt_identity()
+        current_user = UserModel.query.get(current_user_id)
+        view, only = resolve_view(TaskModel, query_args)
+
+        tasks_query = TaskModel.query.filter(TaskModel.id.not_in(deleted_task_ids()))
+
+        if query_args.get("project_id"):
+            tasks_query = tasks_query.filter(TaskModel.id.in_(
+                db.session.query(ProjectTasksModel.task_id)
+                .filter(ProjectTasksModel.project_id == query_args["project_id"])
+            ))
+
+        if current_user.role in ["editor", "translator"]:
+            member_projects = db.session.query(ProjectModel.id).filter(
+                (ProjectModel.editors.any(id=current_user_id)) |
+                (ProjectModel.translators.any(id=current_user_id))
+            )
+            tasks_query = tasks_query.filter(TaskModel.id.in_(
+                db.session.query(ProjectTasksModel.task_id)
+                .filter(ProjectTasksModel.project_id.in_(member_projects))
+            ))
+
+        if query_args.get("status"):
+            tasks_query = tasks_query.filter(TaskModel.status == query_args["status"])
+
+        tasks_query, rank = full_text_search(tasks_query, TaskModel, query_args["q"])
+        tasks_query = tasks_query.order_by(rank, TaskModel.id).options(*task_view_options(view, only))
+
+        if query_args.get("stream"):
+            check_not_paged_stream(query_args)
+            return stream_json_array(tasks_query, view_schema(TaskModel, view, only))
+
+        if "limit" in query_args:
+            tasks_query = tasks_query.limit(query_args["limit"])
+
+        return dump_view(TaskModel, view, only, tasks_query.all()), 200
+
 @blp.route("/mytasks")
 class MyTasks(MethodView):
+    @blp.arguments(TaskListQueryArgsSchema, location='query')
     @blp.response(200, ReadTaskSchema(many=True))
     @jwt_required()
-    def get(self):
+    def get(self, query_args):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
         if current_user.role != "translator":
             abort(403, message="Only translators can access their tasks.")
 
-        tasks = TaskModel.query.join(TaskModel.responsibles).filter(UserModel.id == current_user_id).all()
-        return tasks, 200
+        view, only = resolve_view(TaskModel, query_args)
+        tasks_query = TaskModel.query.join(TaskModel.responsibles).filter(UserModel.id == current_user_id) \
+            .filter(TaskModel.id.not_in(deleted_task_ids())) \
+            .options(*task_view_options(view, only))
+
+        if query_args.get("stream"):
+            return stream_json_array(tasks_query, view_schema(TaskModel, view, only))
+
+        return dump_view(TaskModel, view, only, tasks_query.all()), 200
 
 @blp.route("/task/<int:project_id>/<int:task_id>/translator/deadline", methods=["PUT"])
 class TaskTranslatorDeadline(MethodView):
@@ -390,11 +849,11 @@ class TaskTranslatorDeadline(MethodView):
         if current_user.role != "translator":
             abort(403, message="Only translators can set deadlines for tasks.")
 
-        task = TaskModel.query.get_or_404(task_id)
-        if current_user not in task.responsibles:
+        task = project_task_or_404(project_id, task_id)
+        if not is_task_responsible(current_user_id, task_id):
             abort(403, message="You are not assigned to this task.")
 
-        project_name = ProjectModel.query.get_or_404(project_id).name
+        project_name = live_project_or_404(project_id).name
         task.deadline = deadline_data["deadline"]
         db.session.commit()
 
@@ -403,33 +862,33 @@ class TaskTranslatorDeadline(MethodView):
 @blp.route("/task/<int:project_id>/<int:task_id>/submission/<int:submission_id>/send-for-correction", methods=["POST"])
 class SendForCorrection(MethodView):
     @jwt_required()
-    def post(self, project_id, submission_id):
+    def post(self, project_id, task_id, submission_id):
         current_user_id = get_jwt_identity()
         current_user = UserModel.query.get(current_user_id)
 
-        project = ProjectModel.query.get_or_404(project_id)
+        project = live_project_or_404(project_id)
 
         if current_user.role != "editor":
             abort(403, message="Only editors can send submissions for correction.")
 
-        if current_user.id not in project.editors:
+        if "editor" not in project_roles(current_user_id, project_id):
             abort(403, message="You are not assigned in this project")
 
-        submission = TaskSubmissionModel.query.get_or_404(submission_id)
+        project_task_or_404(project_id, task_id)
+        submission = TaskSubmissionModel.query.filter_by(id=submission_id, task_id=task_id).first_or_404()
 
         if submission.errors:
             translator_id = submission.translator_id
-            project_name = ProjectModel.query.get_or_404(project_id).name
+            project_name = live_project_or_404(project_id).name
             notification_msg = f"Your submission for task {submission.task.name} in project {project_name} contains mistakes. Please review and make corrections."
             send_notification(translator_id, project_id, project_name, "REQUIRES_CORRECTION", notification_msg)
 
-            user = UserModel.query.filter_by(id=translator_id).first()
-            user.notifications_count += 1
-
             return {"message": "Submission sent for correction successfully"}, 200
         else:
             abort(400, message="Submission does not contain errors, cannot be sent for correction.")
 
+# Reminders are now sent by the weekly reminders.send_weekly_reminders job; the task stays
+# registered for messages still queued
 @celery.task
 def send_submission_reminder(translator_id, project_id, project_name):
     current_datetime = datetime.now()
@@ -437,6 +896,7 @@ def send_submission_reminder(translator_id, project_id, project_name):
     if current_datetime.weekday() == 4:
         send_notification(translator_id, project_id, project_name, 'REQUIRES_REMINDER', 'It`s Friday. Please submit your work.')
 
+# Delays are now found by deadlines.scan_overdue; the task stays registered for messages still queued
 @celery.task
 def submit_task(project_name, project_id, translator_id, submission_id, task_id):
     current_datetime = datetime.now().time()
@@ -447,6 +907,73 @@ def submit_task(project_name, project_id, translator_id, submission_id, task_id)
             send_notification(translator_id, project_id, project_name, 'DELAYED', 'Your work is delayed')
             submission.status = 'MAY BE DELAYED'
 
+def update_progress(project_id, submission_ids):
+    # Adds the pages of the given, just approved submissions to task and project progress with
+    # one UPDATE each
+    pages = func.coalesce(func.sum(TaskSubmissionModel.pages_done), 0)
+    approved = and_(TaskSubmissionModel.id.in_(submission_ids), TaskSubmissionModel.status == "APPROVED")
+
+    task_pages = select(pages).where(approved, TaskSubmissionModel.task_id == TaskModel.id).scalar_subquery()
+    task_progress = TaskModel.progress + task_pages * 100.0 / TaskModel.pages
+    db.session.execute(
+        update(TaskModel)
+        .where(TaskModel.id.in_(select(TaskSubmissionModel.task_id).where(approved)),
+               TaskModel.pages != 0)
+        .values(progress=case((task_progress > 100, 100), else_=task_progress))
+        .execution_options(synchronize_session=False)
+    )
+
+    project_pages = select(pages).where(approved).scalar_subquery()
+    project_progress = ProjectModel.progress + project_pages * 100.0 / ProjectModel.number_of_pages
+    db.session.execute(
+        update(ProjectModel)
+        .where(ProjectModel.id == project_id, ProjectModel.number_of_pages != 0)
+        .values(progress=case((project_progress > 100, 100), else_=project_progress))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def project_task_or_404(project_id, task_id, *options):
+    # Only a task of project_id, so the access checked for the project in the URL covers it
+    return TaskModel.query.join(ProjectTasksModel).filter(
+        ProjectTasksModel.project_id == project_id,
+        TaskModel.id == task_id
+    ).options(*options).first_or_404()
+
+
+def check_can_submit(current_user, project_id, task_id, num_pages_done):
+    if current_user.role != "translator":
+        abort(403, message="Only translators can submit submissions.")
+
+    task = project_task_or_404(project_id, task_id)
+    if not is_task_responsible(current_user.id, task_id):
+        abort(403, message="You are not assigned to this task.")
+
+    if num_pages_done is None or task.pages is None:
+        abort(400, message="Number of pages done and total pages must be provided.")
+
+    if num_pages_done > task.pages:
+        abort(400, message="Number of pages done cannot be greater than total pages.")
+
+    return task
+
+
+def save_submission(current_user, project_id, task, task_submission):
+    try:
+        project_name = live_project_or_404(project_id).name
+        notification_msg = f"{current_user.name} {current_user.surname} has submitted the task {task.name} in project {project_name} for review"
+        editors = UserModel.query.filter_by(role="editor").all()
+        for editor in editors:
+            send_notification(editor.id, project_id, project_name, "IN VERIFYING", notification_msg)
+
+        task.submissions.append(task_submission)
+        db.session.add(task_submission)
+        record_submission(project_id, task.id, task_submission.pages_done, None, task_submission.status)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        abort(500, message="Failed to create task submission")
+
 def send_task_assigned_notification(user_id, project_id, task_name, project_name):
     notification_msg = f"You've been assigned as a translator to task {task_name} in project {project_name}"
     send_notification(user_id, project_id, project_name, "task_assigned", notification_msg)
@@ -454,3 +981,13 @@ def send_task_assigned_notification(user_id, project_id, task_name, project_name
 def send_deadline_notification(user_id, project_id, task_name, project_name):
     notification_msg = f"Please choose a deadline for task {task_name} in project {project_name}"
     send_notification(user_id, project_id, project_name, "choose_deadline", notification_msg)
+
+def reserve_task_codes(project_id, count=1):
+    # Task codes are numbered per project; the first call seeds the sequence from existing tasks
+    def max_task_code():
+        return db.session.query(func.max(TaskModel.code)) \
+            .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id) \
+            .filter(ProjectTasksModel.project_id == project_id) \
+            .scalar() or 0
+
+    return reserve_codes(f"tasks:{project_id}", count, seed=max_task_code)
@@ -1,4 +1,16 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from webargs.fields import DelimitedList
+
+from db import to_utc
+
+
+class Deadline(fields.DateTime):
+    # ISO 8601 date or datetime, stored and returned in UTC; a bare date means midnight UTC
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            return to_utc(value)
+        except (TypeError, ValueError) as error:
+            raise self.make_error("invalid", input=value, obj_type=self.OBJ_TYPE) from error
 
 
 class UserSchema(Schema):
@@ -41,7 +53,7 @@ class LoginUserSchema(Schema):
 
 class TaskSubmissionSchema(Schema):
     id = fields.Int(dump_only=True)
-    text = fields.Str(required=True)
+    text = fields.Str(description="Large texts can be left out and uploaded to /task/submissions/<id>/body")
     pages_done = fields.Int(required=True)
     translator_id = fields.Int(dump_only=True)
     comment = fields.Str(dump_only=True)
@@ -58,11 +70,74 @@ class TaskSubmissionCheckingSchema(Schema):
     text = fields.Str(dump_only=True)
     grade = fields.Int(required=True)
     translator_id = fields.Int(dump_only=True)
+    submitted_at = fields.DateTime(dump_only=True)
     status = fields.Str(dump_only=True, validate=validate.OneOf(
         ['IN PROGRESS', 'MAY BE DELAYED', 'IN VERIFYING', 'NOT APPROVED', 'APPROVED']))
 
+class SegmentSchema(Schema):
+    text = fields.Str(description="Text of a new or changed segment, including its trailing whitespace")
+    hash = fields.Str(validate=validate.Length(equal=64),
+                      description="Hash of a segment unchanged since the previous revision")
+
+    @validates_schema
+    def validate_segment(self, data, **kwargs):
+        if ("text" in data) == ("hash" in data):
+            raise ValidationError("Provide either text or hash.")
+
+
+class SegmentedSubmissionSchema(Schema):
+    pages_done = fields.Int(required=True)
+    previous_id = fields.Int(description="Submission this revision replaces, usually a rejected one")
+    segments = fields.List(fields.Nested(SegmentSchema), required=True, validate=validate.Length(min=1))
+
+
+class SubmissionSegmentSchema(Schema):
+    segment_hash = fields.Str(dump_only=True)
+
+
+class SegmentedSubmissionResultSchema(Schema):
+    id = fields.Int(dump_only=True)
+    pages_done = fields.Int(dump_only=True)
+    translator_id = fields.Int(dump_only=True)
+    previous_id = fields.Int(dump_only=True)
+    status = fields.Str(dump_only=True)
+    segments = fields.Pluck(SubmissionSegmentSchema, "segment_hash", many=True, dump_only=True)
+
+
+class SegmentDiffSchema(Schema):
+    # One difflib opcode; segments holds the new text of inserted and replaced segments
+    op = fields.Str(dump_only=True, validate=validate.OneOf(['equal', 'insert', 'delete', 'replace']))
+    old_start = fields.Int(dump_only=True)
+    old_end = fields.Int(dump_only=True)
+    new_start = fields.Int(dump_only=True)
+    new_end = fields.Int(dump_only=True)
+    segments = fields.List(fields.Str(), dump_only=True)
+
+
+class SubmissionDiffSchema(Schema):
+    submission_id = fields.Int(dump_only=True)
+    previous_id = fields.Int(dump_only=True)
+    operations = fields.List(fields.Nested(SegmentDiffSchema), dump_only=True)
+
+
+class SubmissionGradeSchema(Schema):
+    submission_id = fields.Int(required=True)
+    grade = fields.Int(required=True)
+
+
+class BatchGradeSchema(Schema):
+    grades = fields.List(fields.Nested(SubmissionGradeSchema), required=True,
+                         validate=validate.Length(min=1, max=500))
+
+
+class BatchGradeResultSchema(Schema):
+    graded = fields.List(fields.Int(), dump_only=True)
+    skipped = fields.List(fields.Int(), dump_only=True,
+                          description="Submissions not waiting for review (approved or rejected), left unchanged")
+
+
 class SetTaskDeadlineSchema(Schema):
-    deadline = fields.String(required=True)
+    deadline = Deadline(required=True)
 
 class CreateTaskSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -76,11 +151,46 @@ class CreateTaskSchema(Schema):
     started_at = fields.String(dump_only=True)
     progress = fields.Float(default=0, dump_only=True)
     pages = fields.Integer(required=True)
-    deadline = fields.String(dump_only=True)
+    deadline = Deadline(dump_only=True)
     responsibles = fields.List(fields.Nested(UserSchema), dump_only=True)
     submissions = fields.List(fields.Nested(TaskSubmissionSchema), dump_only=True)
 
 
+class TranslatorAssignmentSchema(Schema):
+    task_id = fields.Int(required=True)
+    translator_id = fields.Int(required=True)
+
+
+class BulkTranslatorAssignmentSchema(Schema):
+    assignments = fields.List(fields.Nested(TranslatorAssignmentSchema), required=True,
+                              validate=validate.Length(min=1, max=1000))
+
+
+class BulkTranslatorAssignmentResultSchema(Schema):
+    assigned = fields.List(fields.Nested(TranslatorAssignmentSchema), dump_only=True)
+    skipped = fields.List(fields.Nested(TranslatorAssignmentSchema), dump_only=True,
+                          description="Pairs that were already assigned")
+
+
+class SplitProjectSchema(Schema):
+    chunk_size = fields.Int(validate=validate.Range(min=1),
+                            description="Split all project pages into tasks of this many pages")
+    page_ranges = fields.List(fields.List(fields.Int(validate=validate.Range(min=1)), validate=validate.Length(equal=2)),
+                              validate=validate.Length(min=1),
+                              description="Explicit [first_page, last_page] ranges, one task per range")
+    name = fields.Str(load_default="Pages", validate=validate.Length(min=1),
+                      description="Task name prefix; the page range is appended")
+    description = fields.Str(load_default="", description="Description shared by all created tasks")
+
+    @validates_schema
+    def validate_split(self, data, **kwargs):
+        if ("chunk_size" in data) == ("page_ranges" in data):
+            raise ValidationError("Provide either chunk_size or page_ranges.")
+        for first, last in data.get("page_ranges", []):
+            if first > last:
+                raise ValidationError(f"Invalid page range {first}-{last}.", "page_ranges")
+
+
 class ReadTaskSchema(Schema):
     id = fields.Int(dump_only=True)
     code = fields.Int(dump_only=True)
@@ -92,13 +202,27 @@ class ReadTaskSchema(Schema):
     started_at = fields.String(dump_only=True)
     progress = fields.Float(default=0, dump_only=True)
     pages = fields.Integer(required=True)
-    deadline = fields.String(required=False, dump_only=True)
+    deadline = Deadline(required=False, dump_only=True)
     responsibles = fields.List(fields.Nested(UserSchema), dump_only=True)
     submissions = fields.List(fields.Nested(TaskSubmissionSchema), dump_only=True)
 
 
+class TaskSummarySchema(Schema):
+    id = fields.Int(dump_only=True)
+    code = fields.Int(dump_only=True)
+    rejected = fields.Str(dump_only=True)
+    name = fields.Str(dump_only=True)
+    status = fields.Str(dump_only=True)
+    started_at = fields.String(dump_only=True)
+    progress = fields.Float(dump_only=True)
+    pages = fields.Integer(dump_only=True)
+    deadline = Deadline(dump_only=True)
+    translator_count = fields.Int(dump_only=True)
+    submission_count = fields.Int(dump_only=True)
+
+
 class DeadlineSchema(Schema):
-    deadline = fields.String(required=True)
+    deadline = Deadline(required=True)
 
 class CreateProjectSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -112,7 +236,7 @@ class CreateProjectSchema(Schema):
     progress = fields.Float(default=0, dump_only=True)
     number_of_pages = fields.Integer(required=True)
     creator_id = fields.String(dump_only=True)
-    deadline = fields.String(required=True)
+    deadline = Deadline(required=True)
     ended_at = fields.String(dump_only=True)
     editors = fields.List(fields.Nested(UserSchema), dump_only=True)
     tasks = fields.List(fields.Nested(CreateTaskSchema), dump_only=True)
@@ -129,14 +253,92 @@ class ReadProjectSchema(Schema):
     started_at = fields.String(dump_only=True)
     progress = fields.Float(default=0, dump_only=True)
     ended_at = fields.String(dump_only=True)
-    deadline = fields.String(dump_only=True)
+    deadline = Deadline(dump_only=True)
     number_of_pages = fields.Integer(dump_only=True)
+    is_template = fields.Bool(dump_only=True)
     creators = fields.List(fields.Nested(UserSchema), dump_only=True)
     editors = fields.List(fields.Nested(UserSchema), dump_only=True)
     tasks = fields.List(fields.Nested(ReadTaskSchema), dump_only=True)
     translators = fields.List(fields.Nested(UserSchema), dump_only=True)
 
 
+class ProjectSummarySchema(Schema):
+    id = fields.Int(dump_only=True)
+    code = fields.Str(dump_only=True)
+    color = fields.Str(dump_only=True)
+    name = fields.Str(dump_only=True)
+    status = fields.Str(dump_only=True)
+    started_at = fields.String(dump_only=True)
+    progress = fields.Float(dump_only=True)
+    ended_at = fields.String(dump_only=True)
+    deadline = Deadline(dump_only=True)
+    number_of_pages = fields.Integer(dump_only=True)
+    creator_id = fields.String(dump_only=True)
+    is_template = fields.Bool(dump_only=True)
+    task_count = fields.Int(dump_only=True)
+    translator_count = fields.Int(dump_only=True)
+    submission_count = fields.Int(dump_only=True)
+
+
+class CloneProjectSchema(Schema):
+    name = fields.Str(validate=validate.Length(min=1), description="Defaults to the name of the source project")
+    color = fields.Str(description="Defaults to the color of the source project")
+    deadline = Deadline(description="Defaults to the deadline of the source project")
+    as_template = fields.Bool(load_default=False, description="Save the copy as a reusable template")
+
+
+class ProjectDeletionSchema(Schema):
+    project_id = fields.Int(dump_only=True)
+    status = fields.Str(dump_only=True)
+    total_rows = fields.Int(dump_only=True)
+    deleted_rows = fields.Int(dump_only=True)
+    requested_at = fields.DateTime(dump_only=True)
+    finished_at = fields.DateTime(dump_only=True)
+
+
+class TaskStatsSchema(Schema):
+    task_id = fields.Int(dump_only=True)
+    code = fields.Int(dump_only=True)
+    name = fields.Str(dump_only=True)
+    pages = fields.Int(dump_only=True)
+    progress = fields.Float(dump_only=True)
+    pages_in_review = fields.Int(dump_only=True)
+    pages_approved = fields.Int(dump_only=True)
+    pages_rejected = fields.Int(dump_only=True)
+    rejection_rate = fields.Float(dump_only=True)
+
+
+class BurndownPointSchema(Schema):
+    day = fields.Date(dump_only=True)
+    pages_approved = fields.Int(dump_only=True)
+    remaining_pages = fields.Int(dump_only=True)
+
+
+class ProjectStatsSchema(Schema):
+    project_id = fields.Int(dump_only=True)
+    number_of_pages = fields.Int(dump_only=True)
+    progress = fields.Float(dump_only=True)
+    pages_submitted = fields.Int(dump_only=True)
+    pages_in_review = fields.Int(dump_only=True)
+    pages_approved = fields.Int(dump_only=True)
+    pages_rejected = fields.Int(dump_only=True)
+    submission_count = fields.Int(dump_only=True)
+    rejection_rate = fields.Float(dump_only=True)
+    tasks = fields.List(fields.Nested(TaskStatsSchema), dump_only=True)
+    burndown = fields.List(fields.Nested(BurndownPointSchema), dump_only=True)
+
+
+class ProjectForecastSchema(Schema):
+    project_id = fields.Int(dump_only=True)
+    computed_at = fields.DateTime(dump_only=True)
+    simulations = fields.Int(dump_only=True)
+    remaining_pages = fields.Int(dump_only=True)
+    deadline = fields.Date(dump_only=True)
+    on_time_probability = fields.Float(dump_only=True)
+    p50_date = fields.Date(dump_only=True)
+    p90_date = fields.Date(dump_only=True)
+
+
 class UpdateProjectSchema(Schema):
     id = fields.Int(dump_only=True)
     code = fields.Str(dump_only=True)
@@ -172,20 +374,94 @@ class UserRoleSchema(Schema):
     role = fields.Str(required=True, validate=validate.OneOf(["manager", "editor", "translator"]))
 
 
-class ProjectsListQueryArgsSchema(Schema):
-    filter = fields.Str(description="Filter projects by name, id, or description")
+class PaginationQueryArgsSchema(Schema):
+    limit = fields.Int(description="Page size for cursor pagination", validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(description="Value of next_cursor from the previous page")
+
+
+class ViewQueryArgsSchema(Schema):
+    view = fields.Str(description="Representation level: summary (counts only) or full (nested objects)",
+                      validate=validate.OneOf(['summary', 'full']))
+    only = DelimitedList(fields.Str(), data_key="fields", description="Comma-separated list of fields to return")
+
+
+class PaginatedViewQueryArgsSchema(PaginationQueryArgsSchema, ViewQueryArgsSchema):
+    pass
+
+
+class StreamQueryArgsSchema(Schema):
+    stream = fields.Bool(description="Stream the whole result as a JSON array instead of building it in memory; "
+                                     "cannot be combined with limit or cursor")
+
+
+class ListQueryArgsSchema(PaginatedViewQueryArgsSchema, StreamQueryArgsSchema):
+    pass
+
+
+class ReviewQueueQueryArgsSchema(PaginationQueryArgsSchema):
+    project_id = fields.Int(description="Only submissions of this project")
+
+
+class ReviewQueueItemSchema(Schema):
+    id = fields.Int(dump_only=True)
+    pages_done = fields.Int(dump_only=True)
+    translator_id = fields.Int(dump_only=True)
+    submitted_at = fields.DateTime(dump_only=True)
+    task_id = fields.Int(dump_only=True)
+    task_code = fields.Int(dump_only=True)
+    task_name = fields.Str(dump_only=True)
+    task_deadline = Deadline(dump_only=True)
+    project_id = fields.Int(dump_only=True)
+    project_name = fields.Str(dump_only=True)
+
+
+class ArchiveQueryArgsSchema(Schema):
+    archived = fields.Bool(description="Read from the archive of finished projects instead of the live data")
+
+
+class ProjectQueryArgsSchema(ViewQueryArgsSchema, ArchiveQueryArgsSchema):
+    pass
+
+
+class NotificationListQueryArgsSchema(StreamQueryArgsSchema, ArchiveQueryArgsSchema):
+    pass
+
+
+class TaskListQueryArgsSchema(ViewQueryArgsSchema, StreamQueryArgsSchema):
+    pass
+
+
+class ProjectsListQueryArgsSchema(ListQueryArgsSchema, ArchiveQueryArgsSchema):
+    filter = fields.Str(description="Full-text search over project name, description and code. "
+                                   "Results are ranked by relevance unless sort_by_date is given")
     status = fields.Str(description="Filter projects by status",
-                        validate=validate.OneOf(['IN PROGRESS', 'MAY BE DELAYED', 'FINISHED']))
+                        validate=validate.OneOf(['NEW', 'IN PROGRESS', 'MAY BE DELAYED', 'FINISHED']))
     sort_by_date = fields.Str(description="Sort projects by date", validate=validate.OneOf(['asc', 'desc']))
 
 
+class TaskSearchQueryArgsSchema(TaskListQueryArgsSchema):
+    q = fields.Str(required=True, description="Full-text search over task name and description")
+    status = fields.Str(description="Filter tasks by status",
+                        validate=validate.OneOf(['IN PROGRESS', 'FINISHED', 'MAY BE DELAYED']))
+    project_id = fields.Int(description="Only search the tasks of this project")
+    limit = fields.Int(description="Maximum number of results", validate=validate.Range(min=1, max=100))
+
+
+class ForecastQueryArgsSchema(Schema):
+    refresh = fields.Bool(description="Recompute the forecast instead of returning the nightly one")
+
+
 class UserListQueryArgsSchema(Schema):
     name = fields.Str(description="Filter users by name")
     id = fields.Int(description="Filter users by ID")
     role = fields.Str(description="Filter users by role")
 
 
-class TaskSubmissionFilterSchema(Schema):
+class TaskSubmissionFilterSchema(PaginationQueryArgsSchema):
     status = fields.Str(description="Filter submissions by status",
                         validate=validate.OneOf(
                             ['IN PROGRESS', 'MAY BE DELAYED', 'IN VERIFYING', 'NOT APPROVED', 'APPROVED']))
+    translator_id = fields.Int(description="Filter submissions by translator")
+    submitted_from = fields.DateTime(description="Only submissions sent at or after this time")
+    submitted_to = fields.DateTime(description="Only submissions sent before this time")
+    include_text = fields.Bool(load_default=True, description="Set to false to leave out the submission text")
@@ -0,0 +1,116 @@
+import re
+
+from sqlalchemy import Float, Integer, false, func, literal, literal_column, or_, text
+
+from models import ProjectModel, TaskModel
+from models.archive import ArchivedProjectModel
+
+# model -> (index name, indexed columns, bm25 column weights)
+SEARCH_INDEXES = {
+    ProjectModel: ("projects_fts", ("name", "description", "code"), (10.0, 1.0, 5.0)),
+    TaskModel: ("tasks_fts", ("name", "description"), (10.0, 1.0)),
+    # Rarely searched, so no index: falls back to ILIKE
+    ArchivedProjectModel: (None, ("name", "description", "code"), None),
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_indexes(engine):
+    """Create the full-text indexes if they are missing. Safe to call on every start."""
+    with engine.begin() as conn:
+        for model, (index, columns, _) in SEARCH_INDEXES.items():
+            table = model.__tablename__
+            if index is None:
+                continue
+            if engine.dialect.name == "sqlite":
+                _ensure_fts5(conn, table, index, columns)
+            elif engine.dialect.name == "postgresql":
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{index} ON {table} "
+                    f"USING gin ({_pg_document_sql(columns)})"
+                ))
+
+
+def _update_trigger_sql(table, index, columns):
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    # Only writes to the indexed columns re-index the row; progress and counter updates do not
+    return (
+        f"CREATE TRIGGER {index}_au AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values}); END"
+    )
+
+
+def _ensure_fts5(conn, table, index, columns):
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": index}
+    ).first()
+    if exists:
+        # Databases indexed before the update trigger was limited to the indexed columns
+        trigger = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"), {"name": f"{index}_au"}
+        ).scalar()
+        if trigger != _update_trigger_sql(table, index, columns):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {index}_au"))
+            conn.execute(text(_update_trigger_sql(table, index, columns)))
+        return
+
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+
+    # External-content FTS5 table kept in sync with the base table by triggers
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END"
+    ))
+    conn.execute(text(_update_trigger_sql(table, index, columns)))
+    conn.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+
+def _pg_document_sql(columns):
+    return "to_tsvector('simple', " + " || ' ' || ".join(f"coalesce({c}::text, '')" for c in columns) + ")"
+
+
+def _fts5_query(term):
+    # Quote every token so user input can never be parsed as FTS5 syntax; prefix-match the words
+    return " ".join('"{}"*'.format(token.replace('"', '""')) for token in _TOKEN.findall(term))
+
+
+def full_text_search(query, model, term):
+    """Restrict ``query`` to rows of ``model`` matching ``term``.
+
+    Returns the filtered query and a rank expression where smaller is more relevant.
+    """
+    index, columns, weights = SEARCH_INDEXES[model]
+    dialect = query.session.get_bind(mapper=model).dialect.name
+
+    if not _TOKEN.search(term):
+        return query.filter(false()), literal(0)
+
+    if index is not None and dialect == "sqlite":
+        matches = text(
+            f"SELECT rowid AS id, bm25({index}, {', '.join(map(str, weights))}) AS rank "
+            f"FROM {index} WHERE {index} MATCH :term"
+        ).bindparams(term=_fts5_query(term)).columns(id=Integer, rank=Float).subquery()
+        return query.join(matches, matches.c.id == model.id), matches.c.rank
+
+    if index is not None and dialect == "postgresql":
+        document = literal_column(_pg_document_sql(columns))
+        ts_query = func.plainto_tsquery("simple", term)
+        return query.filter(document.op("@@")(ts_query)), -func.ts_rank(document, ts_query)
+
+    # % and _ in the term are matched literally
+    like = "%{}%".format(re.sub(r"([\\%_])", r"\\\1", term))
+    return query.filter(or_(*[getattr(model, c).ilike(like, escape="\\") for c in columns])), literal(0)
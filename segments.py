@@ -0,0 +1,90 @@
+import difflib
+import hashlib
+import zlib
+
+from flask_smorest import abort
+from sqlalchemy import select
+
+from db import db, insert_ignore
+from models.task import SegmentModel, SubmissionSegmentModel
+
+
+def segment_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def store_segments(texts):
+    """Store the segments that are not stored yet and return the hash of every text, in order."""
+    hashes = [segment_hash(text) for text in texts]
+    new = dict(zip(hashes, texts))
+    if not new:
+        return hashes
+
+    existing = lock_segments(new)
+    for hash_, text in new.items():
+        if hash_ not in existing:
+            # Another submission may store the same segment at the same time
+            raw = text.encode()
+            insert_ignore(SegmentModel, hash=hash_, size=len(raw), data=zlib.compress(raw))
+    return hashes
+
+
+def lock_segments(hashes):
+    """Return the stored segments among ``hashes``, locked until the transaction ends.
+
+    Called before a submission links to segments: deletion._purge_segments skips locked
+    segments, so none of them is deleted while the link is being written. On SQLite, where
+    writes are serialized, there is nothing to lock.
+    """
+    if not hashes:
+        return set()
+    return set(db.session.execute(
+        select(SegmentModel.hash).where(SegmentModel.hash.in_(set(hashes))).with_for_update(read=True)
+    ).scalars())
+
+
+def revision_hashes(submission_id):
+    return db.session.execute(
+        select(SubmissionSegmentModel.segment_hash)
+        .where(SubmissionSegmentModel.submission_id == submission_id)
+        .order_by(SubmissionSegmentModel.position)
+    ).scalars().all()
+
+
+def resolve_segments(items, previous_hashes):
+    """Turn the segments of a submission into their hashes, storing the new ones.
+
+    Every item is either ``{"text": ...}`` or, for a segment unchanged since the previous
+    revision, ``{"hash": ...}``; only changed segments have to be uploaded.
+    """
+    known = set(previous_hashes)
+    reused = {item["hash"] for item in items if "hash" in item}
+    unknown = sorted(reused - known)
+    if unknown:
+        abort(400, message=f"Segments not found in the previous revision: {', '.join(unknown)}.")
+
+    # A segment unused since its revision was purged may be gone; its text has to be sent again
+    removed = sorted(reused - lock_segments(reused))
+    if removed:
+        abort(409, message=f"Segments no longer stored, send their text instead: {', '.join(removed)}.")
+
+    new_hashes = iter(store_segments([item["text"] for item in items if "text" in item]))
+    return [item["hash"] if "hash" in item else next(new_hashes) for item in items]
+
+
+def diff_revisions(old_hashes, new_hashes):
+    # Comparing hashes is enough to find what changed; only the new text is loaded
+    opcodes = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False).get_opcodes()
+    changed = {h for tag, _, _, j1, j2 in opcodes if tag in ("insert", "replace") for h in new_hashes[j1:j2]}
+    texts = {
+        segment.hash: segment.text
+        for segment in SegmentModel.query.filter(SegmentModel.hash.in_(changed))
+    } if changed else {}
+
+    operations = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        operation = {"op": tag, "old_start": i1, "old_end": i2, "new_start": j1, "new_end": j2}
+        if tag in ("insert", "replace"):
+            operation["segments"] = [texts[h] for h in new_hashes[j1:j2]]
+        operations.append(operation)
+    return operations
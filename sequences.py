@@ -0,0 +1,41 @@
+from sqlalchemy import select, update
+
+from db import db, insert_ignore
+from models.sequence import CodeSequenceModel
+
+
+def reserve_codes(scope, count=1, seed=None):
+    """Atomically reserve ``count`` consecutive numbers in ``scope`` and return the first one.
+
+    The counter row is bumped with a single UPDATE, so concurrent callers never get the same
+    number. ``seed`` is called once, when the scope has no counter yet, and must return the
+    highest number already in use.
+    """
+    first = _bump(scope, count)
+    if first is not None:
+        return first
+
+    _create(scope, seed() if seed else 0)
+    return _bump(scope, count)
+
+
+def _bump(scope, count):
+    stmt = update(CodeSequenceModel) \
+        .where(CodeSequenceModel.scope == scope) \
+        .values(last_value=CodeSequenceModel.last_value + count)
+
+    if db.session.get_bind(mapper=CodeSequenceModel).dialect.update_returning:
+        last_value = db.session.execute(stmt.returning(CodeSequenceModel.last_value)).scalar()
+    else:
+        if db.session.execute(stmt).rowcount == 0:
+            return None
+        last_value = db.session.execute(
+            select(CodeSequenceModel.last_value).where(CodeSequenceModel.scope == scope)
+        ).scalar()
+
+    return None if last_value is None else last_value - count + 1
+
+
+def _create(scope, start):
+    # Two requests may seed the same scope at once; the loser's insert is a no-op
+    insert_ignore(CodeSequenceModel, scope=scope, last_value=start)
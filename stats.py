@@ -0,0 +1,154 @@
+from datetime import date
+
+from sqlalchemy import case, delete, func, select, update
+
+from db import db, insert_ignore
+from models.project import ProjectTasksModel
+from models.stats import ProjectDailyStatsModel, ProjectForecastModel, ProjectStatsModel, TaskStatsModel
+from models.task import AWAITING_REVIEW, TaskModel, TaskSubmissionModel
+
+# Submission status -> page bucket it is counted in
+STATUS_BUCKETS = {
+    "IN VERIFYING": "in_review",
+    "MAY BE DELAYED": "in_review",
+    "APPROVED": "approved",
+    "NOT APPROVED": "rejected",
+}
+
+
+def _increment(model, key, deltas):
+    # UPDATE ... SET col = col + n is atomic, so concurrent reviews never lose an increment
+    criteria = [getattr(model, name) == value for name, value in key.items()]
+    values = {name: getattr(model, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+
+    if db.session.execute(update(model).where(*criteria).values(**values)).rowcount == 0:
+        insert_ignore(model, **key)
+        db.session.execute(update(model).where(*criteria).values(**values))
+
+
+def _submission_deltas(pages, old_status, new_status):
+    # Counter changes of one submission moving from old_status to new_status (None when new)
+    pages = pages or 0
+    old_bucket, new_bucket = STATUS_BUCKETS.get(old_status), STATUS_BUCKETS.get(new_status)
+    if old_status is not None and old_bucket == new_bucket:
+        return {}
+
+    deltas = {"pages_in_review": 0, "pages_approved": 0, "pages_rejected": 0}
+    if old_bucket:
+        deltas[f"pages_{old_bucket}"] -= pages
+    if new_bucket:
+        deltas[f"pages_{new_bucket}"] += pages
+
+    if old_status is None:
+        deltas.update(pages_submitted=pages, submission_count=1)
+    if new_bucket in ("approved", "rejected"):
+        deltas[f"{new_bucket}_count"] = 1
+    return deltas
+
+
+def _add(totals, deltas):
+    for name, delta in deltas.items():
+        totals[name] = totals.get(name, 0) + delta
+
+
+def record_submission(project_id, task_id, pages, old_status, new_status):
+    """Move ``pages`` of a submission between the rollup buckets when its status changes.
+
+    Call it in the same transaction as the status change. ``old_status`` is None for a new
+    submission.
+    """
+    record_submissions(project_id, [(task_id, pages, old_status, new_status)])
+
+
+def record_submissions(project_id, changes):
+    """Batch version of record_submission for ``(task_id, pages, old_status, new_status)`` tuples.
+
+    Changes are summed first, so every rollup row is updated once however many submissions
+    touch it.
+    """
+    project_totals, task_totals = {}, {}
+    for task_id, pages, old_status, new_status in changes:
+        deltas = _submission_deltas(pages, old_status, new_status)
+        _add(project_totals, deltas)
+        _add(task_totals.setdefault(task_id, {}), deltas)
+
+    _increment(ProjectStatsModel, {"project_id": project_id}, project_totals)
+    for task_id, totals in task_totals.items():
+        _increment(TaskStatsModel, {"task_id": task_id, "project_id": project_id}, totals)
+    _increment(ProjectDailyStatsModel, {"project_id": project_id, "day": date.today()}, {
+        name: project_totals.get(name, 0) for name in ("pages_submitted", "pages_approved", "pages_rejected")
+    })
+
+
+def burndown(number_of_pages, daily_rows):
+    remaining = number_of_pages or 0
+    series = []
+    for row in daily_rows:
+        remaining -= row.pages_approved
+        series.append({"day": row.day, "pages_approved": row.pages_approved, "remaining_pages": remaining})
+    return series
+
+
+def clear_project_stats(project_id):
+    for model in (TaskStatsModel, ProjectDailyStatsModel, ProjectStatsModel, ProjectForecastModel):
+        db.session.execute(delete(model).where(model.project_id == project_id))
+
+
+def rebuild_project_stats(project_id):
+    """Recompute the rollups of one project from its submissions.
+
+    Only needed for data created before the rollups existed. Their review dates are unknown,
+    so all of their pages land on today in the burndown.
+    """
+    clear_project_stats(project_id)
+
+    pages = func.coalesce(TaskSubmissionModel.pages_done, 0)
+
+    def in_status(status, value):
+        statuses = status if isinstance(status, tuple) else (status,)
+        return func.coalesce(func.sum(case((TaskSubmissionModel.status.in_(statuses), value), else_=0)), 0)
+
+    rows = db.session.execute(
+        select(
+            TaskSubmissionModel.task_id,
+            func.coalesce(func.sum(pages), 0),
+            in_status(AWAITING_REVIEW, pages),
+            in_status("APPROVED", pages),
+            in_status("NOT APPROVED", pages),
+            func.count(),
+            in_status("APPROVED", 1),
+            in_status("NOT APPROVED", 1),
+        )
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskSubmissionModel.task_id)
+        .where(ProjectTasksModel.project_id == project_id)
+        .group_by(TaskSubmissionModel.task_id)
+    ).all()
+
+    columns = ("pages_submitted", "pages_in_review", "pages_approved", "pages_rejected",
+               "submission_count", "approved_count", "rejected_count")
+    totals = dict.fromkeys(columns, 0)
+    for task_id, *values in rows:
+        counters = dict(zip(columns, values))
+        db.session.add(TaskStatsModel(task_id=task_id, project_id=project_id, **counters))
+        for name, value in counters.items():
+            totals[name] += value
+
+    db.session.add(ProjectStatsModel(project_id=project_id, **totals))
+    if totals["pages_submitted"]:
+        db.session.add(ProjectDailyStatsModel(project_id=project_id, day=date.today(),
+                                              pages_submitted=totals["pages_submitted"],
+                                              pages_approved=totals["pages_approved"],
+                                              pages_rejected=totals["pages_rejected"]))
+
+
+def task_stats_rows(project_id):
+    # Per-task progress comes from tasks.progress, the counters from task_stats; no aggregation
+    return db.session.execute(
+        select(TaskModel, TaskStatsModel)
+        .join(ProjectTasksModel, ProjectTasksModel.task_id == TaskModel.id)
+        .outerjoin(TaskStatsModel, TaskStatsModel.task_id == TaskModel.id)
+        .where(ProjectTasksModel.project_id == project_id)
+        .order_by(TaskModel.code)
+    ).all()
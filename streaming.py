@@ -0,0 +1,77 @@
+import zlib
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import delete, insert, select, update
+
+from db import db
+from models.task import SUBMISSION_CHUNK_SIZE, SubmissionBodyModel, SubmissionChunkModel
+
+STREAM_BATCH_SIZE = 200
+
+
+def stream_json_array(query, schema, batch_size=STREAM_BATCH_SIZE):
+    """Stream ``query`` as a JSON array, serializing one row at a time.
+
+    Rows are fetched from a server-side cursor in batches of ``batch_size``, so memory
+    use does not grow with the size of the result and the first bytes go out immediately.
+    """
+    def generate():
+        yield "["
+        separator = ""
+        for row in query.yield_per(batch_size):
+            yield separator + current_app.json.dumps(schema.dump(row))
+            separator = ","
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def write_submission_body(submission_id, stream, chunk_size=SUBMISSION_CHUNK_SIZE):
+    """Replace the body of a submission with the bytes read from ``stream``.
+
+    The stream is read and stored one chunk at a time, so only about ``chunk_size`` bytes
+    are held in memory whatever the size of the upload. The caller commits.
+    """
+    db.session.execute(delete(SubmissionChunkModel).where(SubmissionChunkModel.submission_id == submission_id))
+    db.session.execute(delete(SubmissionBodyModel).where(SubmissionBodyModel.submission_id == submission_id))
+    db.session.execute(insert(SubmissionBodyModel).values(submission_id=submission_id, size=0))
+
+    size = 0
+    buffer = bytearray()
+    while True:
+        data = stream.read(chunk_size - len(buffer))
+        if data:
+            buffer += data
+        if buffer and (len(buffer) == chunk_size or not data):
+            db.session.execute(insert(SubmissionChunkModel).values(
+                submission_id=submission_id, start=size, size=len(buffer), data=zlib.compress(bytes(buffer))
+            ))
+            size += len(buffer)
+            buffer.clear()
+        if not data:
+            break
+
+    db.session.execute(update(SubmissionBodyModel).where(SubmissionBodyModel.submission_id == submission_id)
+                       .values(size=size))
+    return size
+
+
+def stream_submission_body(submission_id, start, stop):
+    # Bytes start..stop-1 of the body; only the chunks overlapping the range are read, one at a time
+    chunks = db.session.execute(
+        select(SubmissionChunkModel.start, SubmissionChunkModel.size)
+        .where(SubmissionChunkModel.submission_id == submission_id,
+               SubmissionChunkModel.start < stop,
+               SubmissionChunkModel.start + SubmissionChunkModel.size > start)
+        .order_by(SubmissionChunkModel.start)
+    ).all()
+
+    def generate():
+        for chunk_start, chunk_size in chunks:
+            data = db.session.execute(
+                select(SubmissionChunkModel.data).where(SubmissionChunkModel.submission_id == submission_id,
+                                                        SubmissionChunkModel.start == chunk_start)
+            ).scalar_one()
+            yield zlib.decompress(data)[max(start - chunk_start, 0):stop - chunk_start]
+
+    return stream_with_context(generate())
@@ -0,0 +1,28 @@
+import pytest
+
+from db import db
+from models import UserModel, ProjectModel
+
+
+@pytest.fixture
+def new_project():
+    """Build the manager's project most tests start from and add it to the session.
+
+    Called inside an app context; the caller adds tasks and commits. ``editor`` and
+    ``translator`` make editor123 and translator123 members, other keyword arguments override
+    the project's fields.
+    """
+    def build(editor=False, translator=False, **fields):
+        manager = UserModel.query.filter_by(username='manager123').first()
+        values = dict(name='Test Project', code='TES-1', description='Test project description', color='red',
+                      number_of_pages=60, deadline='2030-01-01', creator_id=manager.id)
+        values.update(fields)
+        project = ProjectModel(**values)
+        if editor:
+            project.editors.append(UserModel.query.filter_by(username='editor123').first())
+        if translator:
+            project.translators.append(UserModel.query.filter_by(username='translator123').first())
+        db.session.add(project)
+        return project
+
+    return build
@@ -0,0 +1,90 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from sqlalchemy import inspect
+
+from db import db
+from models import ProjectModel
+from models.notifications import NotificationUserModel
+from models.task import TaskSubmissionModel
+from app import create_app
+from migrations import migrate_submission_bodies, upgrade_schema
+
+# Database created by the first release, before any column was added
+LEGACY_DATABASE = Path(__file__).parent.parent / "instance" / "data.db"
+
+
+@pytest.fixture
+def app(tmp_path):
+    path = tmp_path / "data.db"
+    shutil.copy(LEGACY_DATABASE, path)
+    app = create_app(db_url=f"sqlite:///{path}")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def columns(table):
+    return {column["name"] for column in inspect(db.engine).get_columns(table)}
+
+
+def test_upgrade_schema(app):
+    with app.app_context():
+        projects = db.session.execute(db.text("SELECT COUNT(*) FROM projects")).scalar()
+        assert "is_template" not in columns("projects")
+        db.session.execute(db.text("INSERT INTO task_submissions (id, text, status, pages_done, task_id) "
+                                   "VALUES (1, 'Legacy text', 'IN VERIFYING', 1, 1), (2, 'Reviewed', 'APPROVED', 1, 1)"))
+        db.session.execute(db.text("INSERT INTO project_editors (project_id, user_id) VALUES (4, 4)"))
+        db.session.execute(db.text("UPDATE projects SET deadline = '31.12.2030' WHERE id = 1"))
+        db.session.commit()
+
+        added = upgrade_schema()
+        assert {"projects.is_template", "projects.deleted_at"} <= set(added)
+        assert {"is_template", "deleted_at"} <= columns("projects")
+        assert {"submitted_at", "previous_id", "reviewed_by", "reviewed_at"} <= columns("task_submissions")
+        assert ProjectModel.query.filter_by(is_template=False).count() == projects
+        assert db.session.query(NotificationUserModel).filter_by(seen=True).count() == 0
+
+        # Undated submissions take the start of their task
+        assert db.session.execute(db.text(
+            "SELECT s.submitted_at = t.started_at FROM task_submissions s JOIN tasks t ON t.id = s.task_id"
+        )).scalar()
+
+        # A review goes to the project's only editor
+        reviewed = db.session.get(TaskSubmissionModel, 2)
+        assert reviewed.reviewed_by == 4
+        assert reviewed.reviewed_at == reviewed.submitted_at
+        assert db.session.get(TaskSubmissionModel, 1).reviewed_by is None
+
+        # Deadlines written as free-form text are normalized
+        assert db.session.get(ProjectModel, 1).deadline.isoformat() == '2030-12-31T00:00:00+00:00'
+
+        # Nothing left to do the second time
+        assert upgrade_schema() == []
+
+
+def test_migrate_submission_bodies(app):
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(db.text("INSERT INTO task_submissions (id, text, status, pages_done, task_id) "
+                                   "VALUES (1, 'Legacy text', 'IN VERIFYING', 1, 1), (2, :text, 'APPROVED', 1, 1)"),
+                           {"text": "Long text. " * 50000})
+        db.session.commit()
+
+        # Readable before the migration, but not loaded with the submission
+        submission = db.session.get(TaskSubmissionModel, 1)
+        assert 'legacy_text' not in submission.__dict__
+        assert submission.text == 'Legacy text'
+        db.session.expire_all()
+
+        assert migrate_submission_bodies(batch_size=1) == 2
+        for submission_id, text in ((1, 'Legacy text'), (2, "Long text. " * 50000)):
+            submission = db.session.get(TaskSubmissionModel, submission_id)
+            assert submission.legacy_text is None
+            assert submission.body.size == len(text)
+            assert submission.text == text
+        assert len(db.session.get(TaskSubmissionModel, 2).body.chunks) == 3
+
+        assert migrate_submission_bodies() == 0
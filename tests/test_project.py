@@ -1,10 +1,20 @@
+import json
 from datetime import datetime
 
 import pytest
+from sqlalchemy import event, text
 from flask_jwt_extended import create_access_token
 from db import db
-from models import UserModel
+from models import UserModel, ProjectModel, TaskModel
+from models.notifications import NotificationModel, NotificationUserModel
+from models.task import TaskSubmissionModel
+from deletion import purge_project_batch
+from archiving import archive_finished_projects
+from lifecycle import sweep_project_statuses
 from app import create_app
+from permissions import project_roles, is_project_member
+from search import ensure_search_indexes
+from sequences import reserve_codes
 
 
 @pytest.fixture
@@ -41,6 +51,13 @@ def access_token_manager(app):
         return access_token
 
 
+@pytest.fixture
+def access_token_translator(app):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        return create_access_token(identity=translator.id)
+
+
 def test_create_project(client, access_token_manager):
     headers = {'Authorization': f'Bearer {access_token_manager}'}
     data = {
@@ -122,3 +139,409 @@ def test_get_user_projects(client, access_token_manager):
     response = client.get('/projects/user', headers=headers)
     assert response.status_code == 200
     assert len(response.json) == 0  # Assuming there are no projects initially
+
+
+def test_get_projects_cursor_pagination(client, access_token_manager, app):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        for i in range(5):
+            db.session.add(ProjectModel(name=f'Project {i}', code=f'PRO-{i + 1}', description='Test project description',
+                                        color='red', number_of_pages=60, deadline='2030-01-01', creator_id=manager.id))
+        db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/projects?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json) <= 2
+        seen.extend(project['id'] for project in response.json)
+        cursor = json.loads(response.headers['X-Pagination'])['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+    assert len(set(seen)) == 5
+
+    response = client.get('/projects/user?limit=3', headers=headers)
+    assert [project['id'] for project in response.json] == [5, 4, 3]
+
+
+def test_get_projects_invalid_cursor(client, access_token_manager):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    response = client.get('/projects?cursor=not-a-cursor', headers=headers)
+    assert response.status_code == 400
+
+
+def test_get_projects_summary_view(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(translator=True)
+        task = TaskModel(name='Test Task', description='Test task', pages=5, code=1)
+        task.submissions.append(TaskSubmissionModel(text='text', pages_done=2, translator_id=translator.id))
+        project.tasks.append(task)
+        db.session.commit()
+
+    response = client.get('/projects?view=summary', headers=headers)
+    assert response.status_code == 200
+    summary = response.json[0]
+    assert 'tasks' not in summary
+    assert summary['task_count'] == 1
+    assert summary['translator_count'] == 1
+    assert summary['submission_count'] == 1
+
+    response = client.get('/projects?view=summary&fields=id,task_count', headers=headers)
+    assert response.json == [{'id': summary['id'], 'task_count': 1}]
+
+    response = client.get('/projects?view=summary&fields=tasks', headers=headers)
+    assert response.status_code == 400
+
+
+def test_get_projects_query_count_is_constant(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    def add_projects(count):
+        with app.app_context():
+            translator = UserModel.query.filter_by(username='translator123').first()
+            for i in range(count):
+                project = new_project(editor=True, translator=True, code=f'TES-{ProjectModel.query.count() + 1}')
+                for code in range(1, 4):
+                    task = TaskModel(name='Test Task', description='Test task', pages=5, code=code)
+                    task.responsibles.append(translator)
+                    task.submissions.append(TaskSubmissionModel(text='text', pages_done=1, translator_id=translator.id))
+                    project.tasks.append(task)
+            db.session.commit()
+
+    def count_queries():
+        statements = []
+        with app.app_context():
+            engine = db.engine
+
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                response = client.get('/projects', headers=headers)
+            finally:
+                event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        assert response.status_code == 200
+        return len(statements), response.json
+
+    client.get('/projects', headers=headers)  # first request runs create_all
+    add_projects(2)
+    few_queries, few = count_queries()
+    add_projects(8)
+    many_queries, many = count_queries()
+
+    assert len(few) == 2 and len(many) == 10
+    assert all(len(project['tasks']) == 3 for project in many)
+    assert all(len(task['submissions']) == 1 for project in many for task in project['tasks'])
+    assert few_queries == many_queries
+
+
+def test_get_projects_stream(client, access_token_manager, app):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        for i in range(3):
+            project = ProjectModel(name=f'Project {i}', code=f'PRO-{i + 1}', description='Test project description',
+                                   color='red', number_of_pages=60, deadline='2030-01-01', creator_id=manager.id)
+            project.tasks.append(TaskModel(name='Test Task', description='Test task', pages=5, code=1))
+            db.session.add(project)
+        db.session.commit()
+
+    response = client.get('/projects?stream=true', headers=headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert json.loads(response.get_data()) == client.get('/projects', headers=headers).json
+
+    # A stream is never paged
+    assert client.get('/projects?stream=true&limit=1', headers=headers).status_code == 400
+
+
+def test_search_projects(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    client.get('/projects', headers=headers)  # first request creates the search index
+
+    with app.app_context():
+        projects = [
+            ('Harry Potter', 'A boy wizard', 'HAR-1', 'FINISHED'),
+            ('War and Peace', 'Russian novel about Napoleon', 'WAR-2', 'NEW'),
+            ('Potter notes', 'Notes on wizard pottery', 'POT-3', 'NEW'),
+        ]
+        for name, description, code, status in projects:
+            new_project(name=name, code=code, description=description, status=status)
+        db.session.commit()
+
+    response = client.get('/projects?filter=potter', headers=headers)
+    assert response.status_code == 200
+    # The name match is weighted higher than the description match
+    assert [project['code'] for project in response.json] == ['HAR-1', 'POT-3']
+
+    response = client.get('/projects?filter=wizard&status=NEW', headers=headers)
+    assert [project['code'] for project in response.json] == ['POT-3']
+
+    response = client.get('/projects?filter=napol', headers=headers)
+    assert [project['code'] for project in response.json] == ['WAR-2']
+
+    response = client.get('/projects?filter="OR', headers=headers)
+    assert response.status_code == 200
+    assert response.json == []
+
+    with app.app_context():
+        project = ProjectModel.query.filter_by(code='WAR-2').first()
+        project.name = 'Anna Karenina'
+        db.session.commit()
+
+    assert client.get('/projects?filter=peace', headers=headers).json == []
+    assert len(client.get('/projects?filter=anna', headers=headers).json) == 1
+
+    # An index created with the old catch-all update trigger gets the one limited to the indexed columns
+    with app.app_context():
+        db.session.execute(text("DROP TRIGGER projects_fts_au"))
+        db.session.execute(text("CREATE TRIGGER projects_fts_au AFTER UPDATE ON projects BEGIN SELECT 1; END"))
+        db.session.commit()
+        ensure_search_indexes(db.engine)
+        trigger = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'projects_fts_au'")).scalar()
+        assert 'AFTER UPDATE OF name, description, code ON projects' in trigger
+
+
+def test_project_codes_are_not_reused(client, access_token_manager, app):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        db.session.add(ProjectModel(name='Old Project', code='OLD-7', description='Test project description',
+                                    color='red', number_of_pages=60, deadline='2030-01-01', creator_id=manager.id))
+        db.session.commit()
+
+    data = {
+        'name': 'Test Project',
+        'description': 'Test project description',
+        'number_of_pages': 60,
+        'deadline': '2030-01-01',
+        'color': 'red',
+    }
+    first = client.post('/projects', json=data, headers=headers).json
+    client.delete(f"/projects/{first['id']}", headers=headers)
+    second = client.post('/projects', json=data, headers=headers).json
+
+    assert first['code'] == 'TES-8'
+    assert second['code'] == 'TES-9'
+
+
+def test_reserve_code_block(app):
+    with app.app_context():
+        assert reserve_codes('test', seed=lambda: 41) == 42
+        assert reserve_codes('test', count=10) == 43
+        assert reserve_codes('test') == 53
+        assert reserve_codes('other') == 1
+
+
+def test_project_access_requires_membership(client, access_token_translator, app, new_project):
+    translator_headers = {'Authorization': f'Bearer {access_token_translator}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project()
+        db.session.commit()
+        project_id = project.id
+
+        with app.test_request_context():
+            assert project_roles(manager.id, project_id) == {'creator'}
+            assert not is_project_member(translator.id, project_id)
+
+    assert client.get(f'/projects/{project_id}', headers=translator_headers).status_code == 403
+    assert client.get(f'/task/{project_id}', headers=translator_headers).status_code == 403
+
+    with app.app_context():
+        project = ProjectModel.query.get(project_id)
+        project.translators.append(UserModel.query.filter_by(username='translator123').first())
+        db.session.commit()
+
+    assert client.get(f'/projects/{project_id}', headers=translator_headers).status_code == 200
+    assert client.get(f'/task/{project_id}', headers=translator_headers).status_code == 200
+
+
+def test_clone_project_as_template(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        project = new_project(editor=True, translator=True, status='IN_PROGRESS')
+        project.tasks.append(TaskModel(name='Part 1', description='Test task', pages=30, code=1, status='COMPLETED'))
+        project.tasks.append(TaskModel(name='Part 2', description='Test task', pages=30, code=2))
+        db.session.commit()
+        project_id = project.id
+
+    response = client.post(f'/projects/{project_id}/clone', json={'name': 'Template', 'as_template': True},
+                           headers=headers)
+    assert response.status_code == 201
+    template = response.json
+    assert template['id'] != project_id
+    assert template['is_template'] is True
+    assert template['status'] == 'NEW'
+    assert template['color'] == 'red'
+    assert [(task['name'], task['code'], task['status']) for task in template['tasks']] == \
+           [('Part 1', 1, 'IN PROGRESS'), ('Part 2', 2, 'IN PROGRESS')]
+    assert [editor['username'] for editor in template['editors']] == ['editor123']
+
+    listed = client.get('/projects', headers=headers).json
+    assert [p['id'] for p in listed] == [project_id]
+    assert [p['id'] for p in client.get('/projects/templates', headers=headers).json] == [template['id']]
+
+    response = client.post(f'/projects/{template["id"]}/clone', json={'deadline': '2031-01-01'}, headers=headers)
+    assert response.status_code == 201
+    assert response.json['is_template'] is False
+    assert response.json['name'] == 'Template'
+    assert response.json['deadline'] == '2031-01-01T00:00:00+00:00'
+
+    with app.app_context():
+        clone = ProjectModel.query.get(response.json['id'])
+        assert len(clone.tasks) == 2
+        assert [t.username for t in clone.translators] == ['translator123']
+        assert ProjectModel.query.get(project_id).tasks[0].status == 'COMPLETED'
+
+
+def test_delete_project_purges_in_batches(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(translator=True)
+        for code in range(1, 6):
+            task = TaskModel(name=f'Part {code}', description='Test task', pages=12, code=code)
+            task.responsibles.append(translator)
+            task.submissions.append(TaskSubmissionModel(text='Text', translator_id=translator.id))
+            project.tasks.append(task)
+        db.session.flush()
+        notification = NotificationModel(project_id=project.id, project_name=project.name, status='NEW', msg='Hi')
+        notification.users.append(NotificationUserModel(user_id=translator.id))
+        db.session.add(notification)
+        db.session.commit()
+        project_id = project.id
+
+    response = client.delete(f'/projects/{project_id}', headers=headers)
+    assert response.status_code == 204
+
+    # Hidden right away, purged later
+    assert client.get(f'/projects/{project_id}', headers=headers).status_code == 404
+    assert client.get('/projects', headers=headers).json == []
+    deletion = client.get(f'/projects/{project_id}/deletion', headers=headers).json
+    assert deletion['status'] == 'PENDING'
+    assert deletion['deleted_rows'] == 0
+    # 2 notification rows, 5 submissions + 5 bodies + 5 chunks, 5 responsibles, 5 tasks + 5 links, 1 translator,
+    # the project
+    assert deletion['total_rows'] == 34
+
+    with app.app_context():
+        batches = 0
+        while purge_project_batch(project_id, batch_size=2):
+            batches += 1
+        assert batches > 3
+
+        assert ProjectModel.query.get(project_id) is None
+        assert TaskModel.query.count() == 0
+        assert TaskSubmissionModel.query.count() == 0
+        assert NotificationModel.query.count() == 0
+        assert NotificationUserModel.query.count() == 0
+
+    deletion = client.get(f'/projects/{project_id}/deletion', headers=headers).json
+    assert deletion['status'] == 'DONE'
+    assert deletion['deleted_rows'] == deletion['total_rows']
+
+
+def test_archive_finished_projects(client, access_token_manager, access_token_translator, app):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    translator_headers = {'Authorization': f'Bearer {access_token_translator}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        translator = UserModel.query.filter_by(username='translator123').first()
+        for code, (status, ended_at) in enumerate([('FINISHED', datetime(2020, 1, 1)), ('FINISHED', datetime.utcnow()),
+                                                   ('IN PROGRESS', None)], start=1):
+            project = ProjectModel(name=f'Project {code}', code=f'PRO-{code}', description='Test project description',
+                                   color='red', number_of_pages=60, deadline='2030-01-01', creator_id=manager.id,
+                                   status=status, started_at=datetime(2019, 1, 1), ended_at=ended_at)
+            db.session.add(project)
+            project.translators.append(translator)
+            task = TaskModel(name='Part 1', description='Test task', pages=60, code=1)
+            task.responsibles.append(translator)
+            task.submissions.append(TaskSubmissionModel(text='Text', translator_id=translator.id))
+            project.tasks.append(task)
+            db.session.flush()
+            notification = NotificationModel(project_id=project.id, project_name=project.name, status='NEW', msg='Hi')
+            notification.users.append(NotificationUserModel(user_id=translator.id))
+            db.session.add(notification)
+        db.session.commit()
+        archived_id = ProjectModel.query.filter_by(code='PRO-1').one().id
+
+        assert archive_finished_projects(older_than_days=30) == [archived_id]
+        assert ProjectModel.query.get(archived_id) is None
+        assert TaskModel.query.count() == 2
+        assert TaskSubmissionModel.query.count() == 2
+        assert NotificationModel.query.count() == 2
+
+    assert sorted(p['code'] for p in client.get('/projects', headers=headers).json) == ['PRO-2', 'PRO-3']
+    assert client.get(f'/projects/{archived_id}', headers=headers).status_code == 404
+
+    archived = client.get('/projects?archived=true', headers=translator_headers).json
+    assert [p['code'] for p in archived] == ['PRO-1']
+    assert archived[0]['tasks'][0]['submissions'][0]['text'] == 'Text'
+    assert [t['username'] for t in archived[0]['translators']] == ['translator123']
+    assert client.get('/projects?archived=true&view=summary', headers=headers).status_code == 400
+    assert client.get('/projects?archived=true&filter=project', headers=headers).json[0]['code'] == 'PRO-1'
+    # The archive is searched with ILIKE, where % and _ in the term are not wildcards
+    assert client.get('/projects?archived=true&filter=project_1', headers=headers).json == []
+    assert client.get('/projects?archived=true&filter=pro%1', headers=headers).json == []
+
+    response = client.get(f'/projects/{archived_id}?archived=true', headers=headers)
+    assert response.status_code == 200
+    assert response.json['tasks'][0]['responsibles'][0]['username'] == 'translator123'
+
+    notifications = client.get('/notifications?archived=true', headers=translator_headers).json
+    assert [n['project_id'] for n in notifications] == [archived_id]
+    assert len(client.get('/notifications', headers=translator_headers).json) == 2
+
+
+def test_sweep_project_statuses(app):
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        now = datetime(2030, 6, 1, 12, 0)
+        projects = {
+            'fresh': ('NEW', datetime(2030, 6, 1, 11, 58), 0, '2030-12-31'),
+            'started': ('NEW', datetime(2030, 6, 1, 11, 0), 0, '2030-12-31'),
+            'late': ('IN PROGRESS', datetime(2030, 1, 1), 50, '2030-05-31'),
+            'done': ('MAY BE DELAYED', datetime(2030, 1, 1), 100, '2030-05-31'),
+            'extended': ('MAY BE DELAYED', datetime(2030, 1, 1), 50, '2030-07-01'),
+        }
+        for code, (name, (status, started_at, progress, deadline)) in enumerate(projects.items(), start=1):
+            db.session.add(ProjectModel(name=name, code=f'PRO-{code}', description='Test project description',
+                                        color='red', number_of_pages=10, deadline=deadline, creator_id=manager.id,
+                                        status=status, started_at=started_at, progress=progress))
+        db.session.add(ProjectModel(name='template', code='TEM-9', description='Template', color='red',
+                                    number_of_pages=10, deadline='2030-12-31', creator_id=manager.id,
+                                    status='NEW', started_at=datetime(2030, 1, 1), is_template=True))
+        db.session.commit()
+
+        changed = sweep_project_statuses(now=now)
+        assert changed == {
+            'NEW -> IN PROGRESS': 1,
+            'IN PROGRESS/MAY BE DELAYED -> FINISHED': 1,
+            'IN PROGRESS -> MAY BE DELAYED': 1,
+            'MAY BE DELAYED -> IN PROGRESS': 1,
+        }
+
+        statuses = dict(db.session.query(ProjectModel.name, ProjectModel.status).all())
+        assert statuses == {'fresh': 'NEW', 'started': 'IN PROGRESS', 'late': 'MAY BE DELAYED',
+                            'done': 'FINISHED', 'extended': 'IN PROGRESS', 'template': 'NEW'}
+        assert ProjectModel.query.filter_by(name='done').one().ended_at == now
+
+        assert set(sweep_project_statuses(now=now).values()) == {0}
@@ -0,0 +1,236 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from flask_jwt_extended import create_access_token
+from db import db
+from models import UserModel, TaskModel, ProjectModel
+from models.notifications import NotificationUserModel
+from models.task import TaskSubmissionModel
+from app import create_app
+from stats import record_submission, rebuild_project_stats
+from forecast import forecast_active_projects, simulate_completion_days
+from reconcile import reconcile_counters
+
+
+@pytest.fixture
+def app():
+    app = create_app(db_url="sqlite:///:memory:")
+    with app.app_context():
+        db.create_all()
+        editor = UserModel(username='editor123', name='name', surname='surname', password='123456',
+                           email='edirjefjkds@example.com', role='editor')
+        manager = UserModel(username='manager123', name='name', surname='surname', password='123456',
+                            email='manager@example.com', role='manager')
+        translator = UserModel(username='translator123', name='name', surname='surname', password='123456',
+                               email='trans@example.com', role='translator')
+        db.session.add(manager)
+        db.session.add(translator)
+        db.session.add(editor)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def access_token_manager(app):
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        return create_access_token(identity=manager.id)
+
+
+@pytest.fixture
+def access_token_editor(app):
+    with app.app_context():
+        editor = UserModel.query.filter_by(username='editor123').first()
+        return create_access_token(identity=editor.id)
+
+
+@pytest.fixture
+def project(app):
+    # Project with two tasks, an editor and three submissions waiting for review
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = ProjectModel(name='Test Project', code='TES-1', description='Test project description', color='red',
+                               number_of_pages=20, deadline='2030-01-01', creator_id=manager.id)
+        db.session.add(project)
+        project.editors.append(UserModel.query.filter_by(username='editor123').first())
+        project.translators.append(translator)
+        for code in (1, 2):
+            task = TaskModel(name=f'Part {code}', description='Test task', pages=10, code=code)
+            task.responsibles.append(translator)
+            project.tasks.append(task)
+        db.session.flush()
+
+        submissions = []
+        for task, pages in ((project.tasks[0], 4), (project.tasks[0], 6), (project.tasks[1], 5)):
+            submission = TaskSubmissionModel(text='Text', pages_done=pages, translator_id=translator.id,
+                                             task_id=task.id, status='IN VERIFYING')
+            db.session.add(submission)
+            record_submission(project.id, task.id, pages, None, submission.status)
+            submissions.append(submission)
+        db.session.commit()
+
+        return project.id, [t.id for t in project.tasks], [s.id for s in submissions]
+
+
+def test_project_stats_follow_reviews(client, access_token_editor, access_token_manager, project):
+    project_id, task_ids, submission_ids = project
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+
+    response = client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[0]}/grade',
+                          json={'grade': 5}, headers=headers)
+    assert response.status_code == 200
+    response = client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[1]}/reject',
+                          json={'comment': 'Typos'}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.get(f'/projects/{project_id}/stats',
+                          headers={'Authorization': f'Bearer {access_token_manager}'})
+    assert response.status_code == 200
+    stats = response.json
+    assert stats['pages_submitted'] == 15
+    assert stats['pages_in_review'] == 5
+    assert stats['pages_approved'] == 4
+    assert stats['pages_rejected'] == 6
+    assert stats['rejection_rate'] == 0.5
+    assert [(t['code'], t['pages_approved'], t['pages_in_review']) for t in stats['tasks']] == [(1, 4, 0), (2, 0, 5)]
+    assert stats['burndown'] == [{'day': date.today().isoformat(), 'pages_approved': 4, 'remaining_pages': 16}]
+
+    # Approving a rejected submission moves its pages between the buckets
+    client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[1]}/grade',
+               json={'grade': 4}, headers=headers)
+    stats = client.get(f'/projects/{project_id}/stats', headers=headers).json
+    assert (stats['pages_approved'], stats['pages_rejected']) == (10, 0)
+    assert stats['burndown'][-1]['remaining_pages'] == 10
+
+
+def test_rebuild_project_stats(client, access_token_manager, app, project):
+    project_id, _, _ = project
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    before = client.get(f'/projects/{project_id}/stats', headers=headers).json
+
+    with app.app_context():
+        rebuild_project_stats(project_id)
+        db.session.commit()
+
+    assert client.get(f'/projects/{project_id}/stats', headers=headers).json == before
+
+
+def test_project_forecast(client, access_token_manager, app, project):
+    project_id, task_ids, _ = project
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        translator = UserModel.query.filter_by(username='translator123').first()
+        # 30 days of history at exactly 2 approved pages a day, dated by the review and not by when
+        # the work was sent
+        old = ProjectModel(name='Old Project', code='OLD-2', description='Old project', color='red',
+                           number_of_pages=60, deadline='2020-01-01', creator_id=manager.id, status='FINISHED')
+        old.tasks.append(TaskModel(name='Old', description='Old task', pages=60, code=1))
+        db.session.add(old)
+        db.session.flush()
+        for days_ago in range(1, 31):
+            db.session.add(TaskSubmissionModel(text='Text', pages_done=2, translator_id=translator.id,
+                                               task_id=old.tasks[0].id, status='APPROVED',
+                                               submitted_at=datetime.utcnow() - timedelta(days=31),
+                                               reviewed_at=datetime.utcnow() - timedelta(days=days_ago)))
+        ProjectModel.query.get(project_id).deadline = (date.today() + timedelta(days=5)).isoformat()
+        db.session.commit()
+
+        assert forecast_active_projects(simulations=200, seed=1) == [project_id]
+
+    forecast = client.get(f'/projects/{project_id}/forecast', headers=headers).json
+    # 20 pages left, nothing approved yet, at 2 pages a day
+    assert forecast['remaining_pages'] == 20
+    assert forecast['simulations'] == 200
+    assert forecast['p50_date'] == forecast['p90_date'] == (date.today() + timedelta(days=10)).isoformat()
+    assert forecast['on_time_probability'] == 0.0
+
+    with app.app_context():
+        ProjectModel.query.get(project_id).deadline = (date.today() + timedelta(days=10)).isoformat()
+        db.session.commit()
+
+    forecast = client.get(f'/projects/{project_id}/forecast?refresh=true', headers=headers).json
+    assert forecast['on_time_probability'] == 1.0
+
+
+def test_forecast_with_sparse_history():
+    # 10 pages on one day out of 90: slow and uneven, but every run finishes well within the horizon
+    samples = np.zeros(90, dtype=np.int32)
+    samples[40] = 10
+    days = simulate_completion_days({1: 5}, {1: samples}, simulations=2000, rng=np.random.default_rng(1))
+
+    assert np.isinf(days).mean() < 0.01
+    assert 150 < np.quantile(days, 0.9) < 260
+
+
+def test_notification_counts_follow_every_sender(client, access_token_editor, app, project):
+    project_id, task_ids, submission_ids = project
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+
+    client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[0]}/grade',
+               json={'grade': 5}, headers=headers)
+    client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[1]}/reject',
+               json={'comment': 'Typos'}, headers=headers)
+
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        unseen = NotificationUserModel.query.filter_by(user_id=translator.id, seen=False).count()
+        assert translator.notifications_count == unseen == 2
+
+        # Reconciling finds nothing to correct
+        reconcile_counters()
+        assert db.session.get(UserModel, translator.id).notifications_count == 2
+
+
+def test_reconcile_counters(client, access_token_editor, app, project):
+    project_id, task_ids, submission_ids = project
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+
+    # Grading the same submission twice adds its pages to the progress only once
+    for _ in range(2):
+        client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[0]}/grade',
+                   json={'grade': 5}, headers=headers)
+
+    with app.app_context():
+        task = TaskModel.query.get(task_ids[0])
+        assert task.progress == 40
+        task.progress = 80
+        ProjectModel.query.get(project_id).progress = 40
+        manager = UserModel.query.filter_by(username='manager123').first()
+        manager.notifications_count = 7
+        db.session.commit()
+
+        assert reconcile_counters() == {'tasks': 2, 'projects': 1, 'users': 3}
+        assert TaskModel.query.get(task_ids[0]).progress == 40
+        assert ProjectModel.query.get(project_id).progress == 20
+        translator = UserModel.query.filter_by(username='translator123').first()
+        editor = UserModel.query.filter_by(username='editor123').first()
+        assert (translator.notifications_count, translator.tasks_completed) == (2, 0)
+        assert editor.tasks_evaluated == 1
+        assert (manager.projects_created, manager.notifications_count) == (1, 0)
+
+        # Nothing changed since the last run: nothing is touched, not even drifted rows
+        manager.notifications_count = 7
+        db.session.commit()
+        assert reconcile_counters() == {'tasks': 0, 'projects': 0, 'users': 0}
+        assert UserModel.query.filter_by(username='manager123').first().notifications_count == 7
+
+    client.put(f'/task/{project_id}/{task_ids[0]}/submission/{submission_ids[1]}/grade',
+               json={'grade': 5}, headers=headers)
+
+    with app.app_context():
+        assert reconcile_counters() == {'tasks': 1, 'projects': 1, 'users': 3}
+        assert TaskModel.query.get(task_ids[0]).progress == 100
+        assert UserModel.query.filter_by(username='translator123').first().tasks_completed == 1
+        assert UserModel.query.filter_by(username='manager123').first().notifications_count == 0
@@ -1,12 +1,20 @@
-from datetime import datetime
+from datetime import date, datetime
+import io
+import json
 from unittest import mock
 
 import pytest
 from flask import Flask
+from sqlalchemy import event
 from flask_jwt_extended import create_access_token
 from db import db
-from models import UserModel, TaskModel
+from models import UserModel, TaskModel, ProjectModel, NotificationModel
+from models.notifications import NotificationUserModel
+from models.task import SegmentModel, SubmissionBodyModel, TaskSubmissionModel
 from app import create_app
+from counters import increment
+from deadlines import scan_overdue
+from reminders import send_weekly_reminders
 from unittest.mock import patch, MagicMock
 from resources.task import send_submission_reminder, submit_task
 
@@ -400,4 +408,621 @@ def mock_query():
     # Add any necessary behavior to the mock_query
     # For example:
     # mock_query.get_or_404.return_value = mock_submission
-    return mock_query
\ No newline at end of file
+    return mock_query
+
+def test_search_tasks(client, access_token_manager, access_token_translator, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    client.get('/projects', headers=headers)  # first request creates the search index
+
+    with app.app_context():
+        project = new_project()
+        project.tasks.append(TaskModel(name='Chapter one', description='The dragon wakes up', pages=5, code=1))
+        project.tasks.append(TaskModel(name='Chapter two', description='The knight rides', pages=5, code=2))
+        db.session.commit()
+
+    response = client.get('/tasks/search?q=dragon', headers=headers)
+    assert response.status_code == 200
+    assert [task['code'] for task in response.json] == [1]
+
+    response = client.get('/tasks/search?q=chapter&limit=1', headers=headers)
+    assert len(response.json) == 1
+    assert client.get('/tasks/search?q=chapter&limit=1&stream=true', headers=headers).status_code == 400
+
+    # The translator is not a member of the project
+    response = client.get('/tasks/search?q=chapter', headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.json == []
+
+
+def test_split_project_into_tasks(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        project = new_project()
+        project.tasks.append(TaskModel(name='Intro', description='Test task', pages=2, code=1))
+        db.session.commit()
+        project_id = project.id
+
+    response = client.post(f'/task/{project_id}/split', json={'chunk_size': 11}, headers=headers)
+    assert response.status_code == 400  # 11 pages is more than 1/6 of 60
+
+    response = client.post(f'/task/{project_id}/split', json={'page_ranges': []}, headers=headers)
+    assert response.status_code == 422
+
+    response = client.post(f'/task/{project_id}/split', json={'chunk_size': 8, 'name': 'Part'}, headers=headers)
+    assert response.status_code == 201
+    assert [task['code'] for task in response.json] == [2, 3, 4, 5, 6, 7, 8, 9]
+    assert response.json[0]['name'] == 'Part 1-8'
+    assert response.json[-1]['name'] == 'Part 57-60'
+    assert response.json[-1]['pages'] == 4
+
+    response = client.post(f'/task/{project_id}/split', json={'page_ranges': [[1, 5], [6, 10]]}, headers=headers)
+    assert response.status_code == 201
+    assert [task['code'] for task in response.json] == [10, 11]
+
+    response = client.post(f'/task/{project_id}', json={'name': 'Test', 'description': 'Test task', 'pages': 2},
+                           headers=headers)
+    assert response.json['code'] == 12
+
+    with app.app_context():
+        assert len(ProjectModel.query.get(project_id).tasks) == 12
+
+
+def test_assign_translators_in_bulk(client, access_token_manager, access_token_translator, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        editor = UserModel.query.filter_by(username='editor123').first()
+        project = new_project()
+        project.tasks.append(TaskModel(name='Intro', description='Test task', pages=2, code=1))
+        project.tasks.append(TaskModel(name='Outro', description='Test task', pages=2, code=2))
+        db.session.commit()
+        project_id, translator_id, editor_id = project.id, translator.id, editor.id
+        task_ids = [task.id for task in project.tasks]
+
+    assignments = [{'task_id': task_id, 'translator_id': translator_id} for task_id in task_ids]
+
+    response = client.post(f'/task/{project_id}/translators', headers=headers,
+                           json={'assignments': assignments + [{'task_id': task_ids[0], 'translator_id': editor_id}]})
+    assert response.status_code == 400
+
+    response = client.post(f'/task/{project_id}/translators', headers=headers,
+                           json={'assignments': [{'task_id': 9999, 'translator_id': translator_id}]})
+    assert response.status_code == 404
+
+    response = client.post(f'/task/{project_id}/translators', json={'assignments': assignments[:1]},
+                           headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.status_code == 403
+
+    response = client.post(f'/task/{project_id}/translators', json={'assignments': assignments}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json['assigned']) == 2
+
+    # Repeating the request only skips the existing pairs
+    response = client.post(f'/task/{project_id}/translators', json={'assignments': assignments}, headers=headers)
+    assert response.json['assigned'] == []
+    assert len(response.json['skipped']) == 2
+
+    with app.app_context():
+        project = ProjectModel.query.get(project_id)
+        assert [user.id for user in project.translators] == [translator_id]
+        assert all(translator_id in [user.id for user in task.responsibles] for task in project.tasks)
+        translator = UserModel.query.get(translator_id)
+        assert translator.notifications_count == 4
+        assert NotificationUserModel.query.filter_by(user_id=translator_id).count() == 4
+
+
+def test_filter_and_page_submissions(client, access_token_manager, app, new_project):
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project()
+        task = TaskModel(name='Intro', description='Test task', pages=10, code=1)
+        project.tasks.append(task)
+        for i, status in enumerate(['APPROVED', 'IN VERIFYING', 'IN VERIFYING', 'NOT APPROVED', 'IN VERIFYING']):
+            task.submissions.append(TaskSubmissionModel(text=f'Text {i}', pages_done=1, status=status,
+                                                        translator_id=translator.id,
+                                                        submitted_at=datetime(2024, 1, i + 1)))
+        db.session.commit()
+        project_id, task_id = project.id, task.id
+
+    url = f'/task/{project_id}/{task_id}/submissions'
+
+    response = client.get(url, headers=headers)
+    assert len(response.json) == 5
+    assert response.json[0]['text'] == 'Text 0'
+
+    response = client.get(f'{url}?status=IN VERIFYING&limit=2', headers=headers)
+    assert [s['text'] for s in response.json] == ['Text 1', 'Text 2']
+    cursor = json.loads(response.headers['X-Pagination'])['next_cursor']
+
+    response = client.get(f'{url}?status=IN VERIFYING&limit=2&cursor={cursor}&include_text=false', headers=headers)
+    assert len(response.json) == 1
+    assert 'text' not in response.json[0]
+    assert json.loads(response.headers['X-Pagination'])['next_cursor'] is None
+
+    response = client.get(f'{url}?submitted_from=2024-01-02T00:00:00&submitted_to=2024-01-04T00:00:00',
+                          headers=headers)
+    assert [s['text'] for s in response.json] == ['Text 1', 'Text 2']
+
+    # Bounds with an offset are compared in UTC
+    response = client.get(f'{url}?submitted_from=2024-01-02T03:00:00%2B03:00&submitted_to=2024-01-03T19:00:00-05:00',
+                          headers=headers)
+    assert [s['text'] for s in response.json] == ['Text 1', 'Text 2']
+
+
+def test_submission_text_is_stored_compressed(app):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        task = TaskModel(name='Intro', description='Test task', pages=10, code=1)
+        task.submissions.append(TaskSubmissionModel(text='Chapter one. ' * 1000, pages_done=1,
+                                                    translator_id=translator.id))
+        db.session.add(task)
+        db.session.commit()
+        submission_id = task.submissions[0].id
+        db.session.expunge_all()
+
+        body = SubmissionBodyModel.query.get(submission_id)
+        assert body.size == 13000
+        assert len(body.chunks) == 1
+        assert len(body.chunks[0].data) < 1000
+
+        submission = TaskSubmissionModel.query.get(submission_id)
+        assert 'body' not in submission.__dict__  # not loaded until the text is read
+        assert submission.text == 'Chapter one. ' * 1000
+
+
+def test_upload_and_download_submission_body(client, access_token_manager, access_token_translator, app):
+    with app.app_context():
+        manager = UserModel.query.filter_by(username='manager123').first()
+        translator = UserModel.query.filter_by(username='translator123').first()
+        task = TaskModel(name='Intro', description='Test task', pages=10, code=1)
+        task.submissions.append(TaskSubmissionModel(pages_done=1, status='IN VERIFYING', translator_id=translator.id))
+        db.session.add(task)
+        db.session.commit()
+        submission_id, task_id, translator_id = task.submissions[0].id, task.id, translator.id
+
+    text = ''.join(f'Line {i}\n' for i in range(100000)).encode()
+    url = f'/task/submissions/{submission_id}/body'
+
+    response = client.put(url, data=text, headers={'Authorization': f'Bearer {access_token_manager}'})
+    assert response.status_code == 403
+
+    response = client.put(url, data=io.BytesIO(text), headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.status_code == 204
+
+    headers = {'Authorization': f'Bearer {access_token_manager}'}
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.data == text
+
+    # Across the boundary of the first two chunks
+    response = client.get(url, headers={**headers, 'Range': 'bytes=262140-262150'})
+    assert response.status_code == 206
+    assert response.data == text[262140:262151]
+    assert response.headers['Content-Range'] == f'bytes 262140-262150/{len(text)}'
+
+    response = client.get(url, headers={**headers, 'Range': f'bytes={len(text)}-'})
+    assert response.status_code == 416
+
+    # Translators only see their own work and that of their projects
+    with app.app_context():
+        other = UserModel(username='other', name='name', surname='surname', password='123456',
+                          email='other@example.com', role='translator')
+        db.session.add(other)
+        db.session.commit()
+        other_token = create_access_token(identity=other.id)
+    assert client.get(url, headers={'Authorization': f'Bearer {other_token}'}).status_code == 403
+    assert client.get(url, headers={'Authorization': f'Bearer {access_token_translator}'}).status_code == 200
+
+    with app.app_context():
+        assert len(SubmissionBodyModel.query.get(submission_id).chunks) > 1
+        assert TaskSubmissionModel.query.get(submission_id).text == text.decode()
+
+        # Text stored inline, before bodies existed
+        legacy = TaskSubmissionModel(task_id=task_id, pages_done=1, status='APPROVED', translator_id=translator_id,
+                                     legacy_text='Legacy text')
+        db.session.add(legacy)
+        db.session.commit()
+        legacy_id = legacy.id
+
+    response = client.get(f'/task/submissions/{legacy_id}/body', headers={**headers, 'Range': 'bytes=7-'})
+    assert response.status_code == 206
+    assert response.data == b'text'
+
+
+def test_resubmit_changed_segments(client, access_token_manager, access_token_translator, access_token_editor,
+                                   app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project()
+        task = TaskModel(name='Intro', description='Test task', pages=10, code=1)
+        task.responsibles.append(translator)
+        project.tasks.append(task)
+        db.session.commit()
+        project_id, task_id = project.id, task.id
+
+    headers = {'Authorization': f'Bearer {access_token_translator}'}
+    url = f'/task/{project_id}/{task_id}/submissions/segments'
+    paragraphs = ['One.\n\n', 'Two.\n\n', 'Three.\n\n', 'Four.\n']
+
+    response = client.post(url, json={'pages_done': 2, 'segments': [{'text': p} for p in paragraphs]},
+                           headers=headers)
+    assert response.status_code == 201
+    first = response.json
+    hashes = first['segments']
+    assert len(hashes) == 4
+
+    response = client.post(url, json={'pages_done': 2, 'previous_id': first['id'],
+                                      'segments': [{'hash': 'f' * 64}]}, headers=headers)
+    assert response.status_code == 400
+
+    # Only the changed paragraph and the new one are sent
+    response = client.post(url, json={'pages_done': 2, 'previous_id': first['id'], 'segments': [
+        {'hash': hashes[0]}, {'text': 'Two, fixed.\n\n'}, {'hash': hashes[2]}, {'hash': hashes[3]}, {'text': 'Five.\n'},
+    ]}, headers=headers)
+    assert response.status_code == 201
+    second = response.json
+    assert second['segments'][0] == hashes[0]
+
+    response = client.get(f'/task/submissions/{second["id"]}/diff',
+                          headers={'Authorization': f'Bearer {access_token_manager}'})
+    assert response.status_code == 200
+    changes = [op for op in response.json['operations'] if op['op'] != 'equal']
+    assert changes == [
+        {'op': 'replace', 'old_start': 1, 'old_end': 2, 'new_start': 1, 'new_end': 2, 'segments': ['Two, fixed.\n\n']},
+        {'op': 'insert', 'old_start': 4, 'old_end': 4, 'new_start': 4, 'new_end': 5, 'segments': ['Five.\n']},
+    ]
+
+    # Editors of other projects cannot see it
+    response = client.get(f'/task/submissions/{second["id"]}/diff',
+                          headers={'Authorization': f'Bearer {access_token_editor}'})
+    assert response.status_code == 403
+
+    with app.app_context():
+        assert TaskSubmissionModel.query.get(second['id']).text == 'One.\n\nTwo, fixed.\n\nThree.\n\nFour.\nFive.\n'
+        assert SegmentModel.query.count() == 6
+
+        # A reused segment purged in the meantime has to be sent again
+        SegmentModel.query.filter_by(hash=hashes[0]).delete()
+        db.session.commit()
+
+    response = client.post(url, json={'pages_done': 2, 'previous_id': first['id'],
+                                      'segments': [{'hash': hashes[0]}]}, headers=headers)
+    assert response.status_code == 409
+    response = client.post(url, json={'pages_done': 2, 'previous_id': first['id'],
+                                      'segments': [{'text': paragraphs[0]}]}, headers=headers)
+    assert response.status_code == 201
+    assert response.json['segments'] == [hashes[0]]
+
+
+def test_grade_submissions_in_batch(client, access_token_editor, access_token_translator, app,
+                                    new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(editor=True, number_of_pages=40)
+        for code in (1, 2):
+            task = TaskModel(name=f'Part {code}', description='Test task', pages=20, code=code)
+            for pages in (5, 10):
+                task.submissions.append(TaskSubmissionModel(text='Text', pages_done=pages, status='IN VERIFYING',
+                                                            translator_id=translator.id))
+            project.tasks.append(task)
+        project.tasks[1].submissions.append(TaskSubmissionModel(text='Text', pages_done=4, status='NOT APPROVED',
+                                                                translator_id=translator.id))
+        db.session.commit()
+        project_id = project.id
+        submission_ids = [s.id for task in project.tasks for s in task.submissions]
+
+    url = f'/task/{project_id}/submissions/grade'
+    grades = [{'submission_id': submission_id, 'grade': 5} for submission_id in submission_ids[:3]]
+
+    response = client.put(url, json={'grades': grades}, headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.status_code == 403
+
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+    response = client.put(url, json={'grades': grades + [{'submission_id': 9999, 'grade': 5}]}, headers=headers)
+    assert response.status_code == 404
+
+    response = client.put(url, json={'grades': grades}, headers=headers)
+    assert response.status_code == 200
+    assert response.json == {'graded': submission_ids[:3], 'skipped': []}
+
+    # Grading again does not add the pages twice, and rejected work is not approved by a batch
+    response = client.put(url, json={'grades': grades + [{'submission_id': submission_ids[4], 'grade': 5}]},
+                          headers=headers)
+    assert response.json == {'graded': [], 'skipped': submission_ids[:3] + submission_ids[4:]}
+
+    with app.app_context():
+        project = ProjectModel.query.get(project_id)
+        assert [task.progress for task in project.tasks] == [75, 25]
+        assert project.progress == 50
+        assert [s.status for s in TaskSubmissionModel.query.order_by(TaskSubmissionModel.id)] == \
+               ['APPROVED', 'APPROVED', 'APPROVED', 'IN VERIFYING', 'NOT APPROVED']
+        assert UserModel.query.filter_by(username='translator123').first().notifications_count == 3
+        assert NotificationUserModel.query.count() == 3
+        task_id = project.tasks[1].id
+
+    # A rejection is only overturned by grading that submission on its own
+    response = client.put(f'/task/{project_id}/{task_id}/submission/{submission_ids[4]}/grade', json={'grade': 4},
+                          headers=headers)
+    assert response.json['status'] == 'APPROVED'
+
+
+def test_regrade_submission(client, access_token_editor, app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(editor=True, number_of_pages=40)
+        task = TaskModel(name='Part 1', description='Test task', pages=20, code=1)
+        task.submissions.append(TaskSubmissionModel(text='Text', pages_done=5, status='IN VERIFYING',
+                                                    translator_id=translator.id))
+        project.tasks.append(task)
+        db.session.commit()
+        project_id, task_id, submission_id = project.id, task.id, task.submissions[0].id
+
+    url = f'/task/{project_id}/{task_id}/submission/{submission_id}/grade'
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+    response = client.put(url, json={'grade': 5}, headers=headers)
+    assert response.status_code == 200
+    assert (response.json['grade'], response.json['status']) == (5, 'APPROVED')
+
+    # Grading again changes the grade without adding the pages twice
+    response = client.put(url, json={'grade': 4}, headers=headers)
+    assert response.status_code == 200
+    assert (response.json['grade'], response.json['status']) == (4, 'APPROVED')
+
+    with app.app_context():
+        project = ProjectModel.query.get(project_id)
+        assert (project.tasks[0].progress, project.progress) == (25, 12.5)
+
+
+def test_counters_are_applied_on_commit(app):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        task = TaskModel(name='Intro', description='Test task', pages=10, code=1, progress=90)
+        db.session.add(task)
+        db.session.commit()
+        task_id, translator_id = task.id, translator.id
+
+        increment(UserModel, translator_id, 'notifications_count')
+        increment(UserModel, translator_id, 'notifications_count', 2)
+        increment(TaskModel, task_id, 'progress', 30, maximum=100)
+        db.session.rollback()
+        db.session.commit()
+        assert UserModel.query.get(translator_id).notifications_count == 0
+
+        increment(UserModel, translator_id, 'notifications_count')
+        increment(UserModel, translator_id, 'notifications_count', 2)
+        increment(TaskModel, task_id, 'progress', 30, maximum=100)
+        increment(TaskModel, task_id, 'rejected')
+        db.session.commit()
+
+        assert UserModel.query.get(translator_id).notifications_count == 3
+        task = TaskModel.query.get(task_id)
+        assert (task.progress, task.rejected) == (100, 1)
+
+
+def test_review_queue(client, access_token_editor, access_token_translator, app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        projects = []
+        for code, edited in (('TES-1', True), ('OTH-2', False)):
+            project = new_project(editor=edited, name=f'Project {code}', code=code)
+            for task_code, deadline in ((1, '2030-05-01'), (2, None), (3, '2030-02-01')):
+                task = TaskModel(name=f'Part {task_code}', description='Test task', pages=10, code=task_code,
+                                 deadline=deadline)
+                for day, status in ((2, 'IN VERIFYING'), (1, 'IN VERIFYING'), (3, 'APPROVED')):
+                    task.submissions.append(TaskSubmissionModel(text='Text', pages_done=1, status=status,
+                                                                translator_id=translator.id,
+                                                                submitted_at=datetime(2024, 1, day)))
+                project.tasks.append(task)
+            projects.append(project)
+        db.session.commit()
+        project_id = projects[0].id
+
+    response = client.get('/review-queue', headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.status_code == 403
+
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+    response = client.get('/review-queue?limit=4', headers=headers)
+    assert response.status_code == 200
+    assert [(item['task_code'], item['submitted_at'][:10]) for item in response.json] == [
+        (3, '2024-01-01'), (3, '2024-01-02'), (1, '2024-01-01'), (1, '2024-01-02'),
+    ]
+    assert {item['project_id'] for item in response.json} == {project_id}
+
+    cursor = json.loads(response.headers['X-Pagination'])['next_cursor']
+    response = client.get(f'/review-queue?limit=4&cursor={cursor}', headers=headers)
+    assert [(item['task_code'], item['task_deadline']) for item in response.json] == [(2, None), (2, None)]
+    assert json.loads(response.headers['X-Pagination'])['next_cursor'] is None
+
+
+def test_review_queue_pages_through_undated_submissions(client, access_token_editor, app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(editor=True)
+        task = TaskModel(name='Part 1', description='Test task', pages=10, code=1, deadline='2030-05-01')
+        for _ in range(3):
+            task.submissions.append(TaskSubmissionModel(text='Text', pages_done=1, status='IN VERIFYING',
+                                                        translator_id=translator.id))
+        project.tasks.append(task)
+        db.session.commit()
+        submission_ids = [submission.id for submission in task.submissions]
+        # Sent before submissions were dated
+        TaskSubmissionModel.query.filter(TaskSubmissionModel.id.in_(submission_ids[1:])) \
+            .update({'submitted_at': None}, synchronize_session=False)
+        db.session.commit()
+
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+    seen, cursor = [], None
+    for _ in range(4):
+        response = client.get('/review-queue?limit=1' + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200
+        seen += [item['id'] for item in response.json]
+        cursor = json.loads(response.headers['X-Pagination'])['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == submission_ids[1:] + submission_ids[:1]
+
+
+def test_scan_overdue(app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(deadline='2030-12-31')
+        tasks = {
+            'late': ('IN PROGRESS', '2030-05-31T12:00:00Z', 50),
+            'at risk': ('IN PROGRESS', '2030-06-02T06:00:00+03:00', 50),
+            'done': ('IN PROGRESS', '2030-05-31', 100),
+            'on time': ('IN PROGRESS', '2030-06-10', 50),
+            'extended': ('MAY BE DELAYED', '2030-07-01', 50),
+            'no deadline': ('IN PROGRESS', None, 0),
+        }
+        for code, (name, (status, deadline, progress)) in enumerate(tasks.items(), start=1):
+            task = TaskModel(name=name, description='Test task', pages=10, code=code, status=status,
+                             deadline=deadline, progress=progress)
+            for submission_status in ('IN PROGRESS', 'IN VERIFYING'):
+                task.submissions.append(TaskSubmissionModel(text='Text', pages_done=1, status=submission_status,
+                                                            translator_id=translator.id))
+            project.tasks.append(task)
+        db.session.commit()
+
+        now = datetime(2030, 6, 1, 12, 0)
+        assert scan_overdue(now=now) == {
+            'tasks IN PROGRESS -> MAY BE DELAYED': 2,
+            'tasks MAY BE DELAYED -> IN PROGRESS': 1,
+            'submissions IN VERIFYING -> MAY BE DELAYED': 2,
+        }
+
+        statuses = dict(db.session.query(TaskModel.name, TaskModel.status).all())
+        assert statuses == {'late': 'MAY BE DELAYED', 'at risk': 'MAY BE DELAYED', 'done': 'IN PROGRESS',
+                            'on time': 'IN PROGRESS', 'extended': 'IN PROGRESS', 'no deadline': 'IN PROGRESS'}
+        delayed = TaskSubmissionModel.query.filter_by(status='MAY BE DELAYED').all()
+        assert sorted(submission.task.name for submission in delayed) == ['done', 'late']
+        assert db.session.get(UserModel, translator.id).notifications_count == 2
+        assert TaskModel.query.filter_by(name='at risk').one().deadline.isoformat() == '2030-06-02T03:00:00+00:00'
+
+        assert set(scan_overdue(now=now).values()) == {0}
+
+
+def test_scan_overdue_flags_submissions_sent_through_the_api(client, access_token_translator, access_token_editor,
+                                                             app, new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        project = new_project(editor=True, translator=True, deadline='2030-12-31')
+        task = TaskModel(name='Part 1', description='Test task', pages=10, code=1, deadline='2020-01-01')
+        task.responsibles.append(translator)
+        project.tasks.append(task)
+        db.session.commit()
+        project_id, task_id = project.id, task.id
+
+    response = client.post(f'/task/{project_id}/{task_id}/submissions', json={'text': 'Text', 'pages_done': 2},
+                           headers={'Authorization': f'Bearer {access_token_translator}'})
+    assert response.status_code == 201
+    submission_id = response.json['id']
+
+    with app.app_context():
+        assert scan_overdue()['submissions IN VERIFYING -> MAY BE DELAYED'] == 1
+        assert db.session.get(TaskSubmissionModel, submission_id).status == 'MAY BE DELAYED'
+
+    # A flagged submission is still waiting for review
+    response = client.get('/review-queue', headers={'Authorization': f'Bearer {access_token_editor}'})
+    assert [item['id'] for item in response.json] == [submission_id]
+
+    # A submission approved between the scan's select and its update is neither flagged nor notified
+    response = client.post(f'/task/{project_id}/{task_id}/submissions', json={'text': 'Text', 'pages_done': 2},
+                           headers={'Authorization': f'Bearer {access_token_translator}'})
+    approved_id = response.json['id']
+
+    def approve_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE task_submissions'):
+            cursor.execute("UPDATE task_submissions SET status = 'APPROVED' WHERE id = ?", (approved_id,))
+
+    with app.app_context():
+        notified = NotificationUserModel.query.count()
+        event.listen(db.engine, 'before_cursor_execute', approve_first)
+        try:
+            assert scan_overdue()['submissions IN VERIFYING -> MAY BE DELAYED'] == 0
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', approve_first)
+        assert db.session.get(TaskSubmissionModel, approved_id).status == 'APPROVED'
+        assert NotificationUserModel.query.count() == notified
+
+
+def test_send_weekly_reminders(app, new_project):
+    with app.app_context():
+        translators = [UserModel.query.filter_by(username='translator123').first()]
+        for name in ('second', 'third'):
+            translators.append(UserModel(username=name, name='name', surname='surname', password='123456',
+                                         email=f'{name}@example.com', role='translator'))
+        first, second, third = translators
+
+        # first: open work in two projects, second: only finished work, third: open work in a finished project
+        projects = {
+            'TES-1': ('IN PROGRESS', [(first, 50), (first, 0), (second, 100)]),
+            'OTH-2': ('IN PROGRESS', [(first, 10)]),
+            'FIN-3': ('FINISHED', [(third, 50)]),
+        }
+        for project_code, (status, tasks) in projects.items():
+            project = new_project(name=f'Project {project_code}', code=project_code, deadline='2030-12-31',
+                                  status=status)
+            for code, (translator, progress) in enumerate(tasks, start=1):
+                task = TaskModel(name=f'Part {code}', description='Test task', pages=10, code=code, progress=progress)
+                task.responsibles.append(translator)
+                project.tasks.append(task)
+        db.session.commit()
+
+        assert send_weekly_reminders(today=date(2030, 5, 31)) == 1
+        reminders = NotificationModel.query.filter_by(status='REQUIRES_REMINDER').all()
+        assert [(reminder.project_name, [user.user_id for user in reminder.users]) for reminder in reminders] == [
+            ('Project TES-1', [first.id]),
+        ]
+        assert db.session.get(UserModel, first.id).notifications_count == 1
+
+        # Once per week however often the job runs
+        assert send_weekly_reminders(today=date(2030, 6, 1)) == 0
+        assert send_weekly_reminders(today=date(2030, 6, 7)) == 1
+        assert NotificationModel.query.filter_by(status='REQUIRES_REMINDER').count() == 2
+
+
+def test_tasks_are_scoped_to_their_project(client, access_token_editor, access_token_translator, app,
+                                           new_project):
+    with app.app_context():
+        translator = UserModel.query.filter_by(username='translator123').first()
+        other = UserModel(username='other', name='name', surname='surname', password='123456',
+                          email='other@example.com', role='translator')
+        ids = {}
+        for code, member in (('OWN-1', True), ('OTH-2', False)):
+            project = new_project(editor=member, translator=member, name=f'Project {code}', code=code)
+            task = TaskModel(name='Part', description='Test task', pages=10, code=1)
+            submission = TaskSubmissionModel(text='Text', pages_done=1, status='IN VERIFYING',
+                                             translator_id=(translator if member else other).id)
+            task.submissions.append(submission)
+            project.tasks.append(task)
+            if member:
+                task.responsibles.append(translator)
+            db.session.commit()
+            ids[code] = (project.id, task.id, submission.id)
+    (own_project, own_task, own_submission), (_, other_task, other_submission) = ids['OWN-1'], ids['OTH-2']
+
+    headers = {'Authorization': f'Bearer {access_token_translator}'}
+    assert client.get(f'/task/{own_project}/{own_task}', headers=headers).status_code == 200
+    assert client.get(f'/task/{own_project}/{other_task}', headers=headers).status_code == 404
+    assert client.get(f'/task/{own_project}/{other_task}/submissions', headers=headers).status_code == 404
+    assert client.get(f'/task/submissions/{own_submission}', headers=headers).status_code == 200
+    assert client.get(f'/task/submissions/{other_submission}', headers=headers).status_code == 403
+    response = client.put(f'/task/{own_project}/{other_task}/translator/deadline', json={'deadline': '2030-02-01'},
+                          headers=headers)
+    assert response.status_code == 404
+
+    headers = {'Authorization': f'Bearer {access_token_editor}'}
+    for url, body in ((f'submission/{other_submission}/grade', {'grade': 5}),
+                      (f'submission/{other_submission}/reject', {'comment': 'No'}),
+                      (f'submission/{other_submission}/send-for-correction', None)):
+        response = client.open(f'/task/{own_project}/{own_task}/{url}', json=body, headers=headers,
+                               method='POST' if body is None else 'PUT')
+        assert response.status_code == 404
+
+    with app.app_context():
+        assert db.session.get(ProjectModel, own_project).progress == 0
+        assert db.session.get(TaskSubmissionModel, other_submission).status == 'IN VERIFYING'